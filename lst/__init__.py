@@ -4,6 +4,10 @@ import os
 from lst.parser import ConfigParser, SecretParser
 from lst.models import AppContainer
 from lst.errors import NotFoundError
+from lst.remote import Remote, JiraRemote, ZebraRemote
+from lst.cache import ResponseCache
+from lst.cassette import Cassette
+from lst.sync import SyncStore
 from lst.commands import *
 from lst.commands.result_per_story import ResultPerStoryCommand
 from lst.commands.check_hours import CheckHoursCommand
@@ -85,6 +89,25 @@ available commands:
         AppContainer.secret = secret
         AppContainer.user_args = args
         AppContainer.dev_mode = args.dev_mode
+        Remote.debug = args.dev_mode
+
+        # recorded exchanges (see --record and --replay), the cache would hide requests from the cassette
+        if args.record is not None:
+            Remote.cassette = Cassette(args.record, Cassette.RECORD)
+        elif args.replay is not None:
+            Remote.cassette = Cassette(args.replay, Cassette.REPLAY, args.replay_latency)
+
+        # http cache (see --no-cache and --refresh)
+        if not args.no_cache and Remote.cassette is None:
+            Remote.cache = ResponseCache(secret.get_cache_dir(), secret.get_cache_max_size())
+            Remote.cache_refresh = args.refresh
+            AppContainer.sync_store = SyncStore(os.path.join(secret.get_cache_dir(), 'sync'), args.refresh)
+        JiraRemote.cache_ttl = secret.get_jira('cache_ttl', JiraRemote.cache_ttl)
+        ZebraRemote.cache_ttl = secret.get_zebra('cache_ttl', ZebraRemote.cache_ttl)
+
+        # keep the zebra session between runs
+        if secret.get_zebra('persist_session', False) is True and Remote.cassette is None:
+            ZebraRemote.session_directory = os.path.join(secret.get_cache_dir(), 'sessions')
 
         # read config
         print 'Reading config'
@@ -0,0 +1,113 @@
+import array
+import bisect
+import itertools
+from collections import OrderedDict
+
+from lst.helpers import MathHelper
+from lst.models import SprintBurnupSeries
+
+
+class BurnupEngine(object):
+    """
+    Computes the cumulative burnup series (md, sp, bv, planned) of any date range at once,
+    from arrays holding one value per day. The work only depends on the nb of days, be it a sprint or a release
+    """
+    def __init__(self, days, hours, total_hours=None, planned=None, story_points=None, business_values=None,
+                 closed=None):
+        """
+        All arrays have one value per day
+
+        :param days:list of date(s), in ascending order
+        :param hours:list of float zebra hours
+        :param total_hours:list of float hours including forced ones, defaults to the zebra hours
+        :param planned:list of None|float planned hours
+        :param story_points:list of float story points of the stories closed on that day
+        :param business_values:list of float business value of the stories closed on that day
+        :param closed:list of bool whether some story was closed on that day
+        """
+        nb_days = len(days)
+        self.days = list(days)
+        self.hours = array.array('d', hours)
+        self.planned = [None] * nb_days if planned is None else list(planned)
+        self.story_points = array.array('d', [0] * nb_days if story_points is None else story_points)
+        self.business_values = array.array('d', [0] * nb_days if business_values is None else business_values)
+        self.closed = [False] * nb_days if closed is None else list(closed)
+        # a list rather than an array, so that forced values keep their type (ie. when printed)
+        self.total_hours = list(self.hours) if total_hours is None else list(total_hours)
+
+    @classmethod
+    def from_sprint(cls, sprint, days, timesheet_index, stories):
+        """
+        :param sprint:Sprint (forced and planned data)
+        :param days:list of date(s), in ascending order
+        :param timesheet_index:TimeSheetIndex
+        :param stories:StoryCollection
+        :return:BurnupEngine
+        """
+        readable_days = [str(day) for day in days]
+        hours = [timesheet_index.hours_per_day.get(day, 0) for day in readable_days]
+        achievements = [stories.get_achievement_for_day(day) for day in readable_days]
+
+        return cls(
+            days,
+            hours,
+            [sprint.get_forced_data(day, day_hours) for day, day_hours in itertools.izip(readable_days, hours)],
+            [sprint.get_planned_data(day) for day in readable_days],
+            [0 if achievement is None else achievement['sp'] for achievement in achievements],
+            [0 if achievement is None else achievement['bv'] for achievement in achievements],
+            [achievement is not None for achievement in achievements]
+        )
+
+    def get_positions(self):
+        """
+        :return:list positions of the days shown on the graph (days with hours, closed stories or planned hours)
+        """
+        return [
+            position for position, (total, planned, closed)
+            in enumerate(itertools.izip(self.total_hours, self.planned, self.closed))
+            if closed or total != 0 or planned is not None
+        ]
+
+    def get_series(self, end_date, series=None):
+        """
+        Compute the cumulative series. Planned hours are cumulated up to the last day,
+        the other series stop at end_date
+
+        :param end_date:date
+        :param series:SprintBurnupSeries to fill, defaults to a new one
+        :return:tuple (list of date(s) shown on the graph, SprintBurnupSeries)
+        """
+        series = SprintBurnupSeries() if series is None else series
+        positions = self.get_positions()
+        dates = [self.days[p] for p in positions]
+        # days are sorted, so the days up to end_date are the first ones
+        until_end = positions[:bisect.bisect_right(dates, end_date)]
+
+        series['planned'].extend(MathHelper.cumulate([self.planned[p] or 0 for p in positions]))
+        series['md'].extend(MathHelper.cumulate([self.total_hours[p] for p in until_end]))
+        series['sp'].extend(MathHelper.cumulate([self.story_points[p] for p in until_end]))
+        series['bv'].extend(MathHelper.cumulate([self.business_values[p] for p in until_end]))
+
+        return dates, series
+
+    def get_percent_series(self, end_date, series):
+        """
+        Compute the cumulative series, then scale the ones worth a chart to percents of their commited value
+
+        :param end_date:date
+        :param series:SprintBurnupSeries to fill, with its ideal values set
+        :return:tuple (list of date(s) shown on the graph, OrderedDict of serie name => list of percents)
+        """
+        dates = self.get_series(end_date, series)[0]
+        percent_series = OrderedDict(
+            (name, serie.get_values_as_percent()) for name, serie in series.get_series_for_chart().items()
+        )
+        return dates, percent_series
+
+    def iter_days(self):
+        """
+        Per day values, ie. to print them
+
+        :return:generator of tuples (date, zebra hours, hours including forced ones, planned hours)
+        """
+        return itertools.izip(self.days, self.hours, self.total_hours, self.planned)
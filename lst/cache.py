@@ -0,0 +1,282 @@
+import hashlib
+import json
+import mimetools
+import os
+import tempfile
+import threading
+import time
+import urllib
+import urlparse
+from StringIO import StringIO
+
+
+class ResponseCache(object):
+    """
+    On-disk cache of http responses, keyed by url (credentials stripped)
+
+    Each entry is stored as two files: [key].body (raw response body) and [key].json (metadata).
+    The total size of the cache directory is capped, least recently used entries being evicted first
+    """
+    # url parameters never used as part of the cache key
+    ignored_parameters = ['os_username', 'os_password']
+    # temporary files older than this (in seconds) are left overs of interrupted downloads
+    temporary_ttl = 60 * 60
+
+    def __init__(self, directory, max_size=100 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    @classmethod
+    def normalize_url(cls, url):
+        """
+        Normalize an url (lower case host, sorted parameters) and strip its credentials
+
+        :param url:string
+        :return:string
+        """
+        parts = urlparse.urlsplit(url)
+        parameters = [
+            (k, v) for k, v in urlparse.parse_qsl(parts.query, keep_blank_values=True)
+            if k not in cls.ignored_parameters
+        ]
+        query = urllib.urlencode(sorted(parameters))
+        path = parts.path.replace('//', '/')
+
+        return urlparse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+    @classmethod
+    def get_key(cls, url):
+        return hashlib.sha1(cls.normalize_url(url)).hexdigest()
+
+    def get(self, key):
+        """
+        Get a cache entry
+
+        :param key:string see get_key
+        :return:CacheEntry|None
+        """
+        try:
+            with open(self._get_path(key, 'json')) as f:
+                meta = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        if not os.path.exists(self._get_path(key, 'body')):
+            return None
+
+        return CacheEntry(self, key, meta)
+
+    def store(self, key, url, response):
+        """
+        Store a response while it is being read: the returned file-like object must be read
+        until the end for the entry to be committed to the cache
+
+        :param key:string see get_key
+        :param url:string requested url (stored for debugging purpose, without credentials)
+        :param response:file-like http response
+        :return:file-like object to read the response from
+        """
+        info = response.info()
+        meta = {
+            'url': self.normalize_url(url),
+            'stored_at': time.time(),
+            'etag': info.getheader('ETag'),
+            'last_modified': info.getheader('Last-Modified'),
+            'content_type': info.getheader('Content-Type'),
+        }
+
+        return CachingResponse(response, self, key, meta)
+
+    def refresh(self, entry):
+        """
+        Mark an entry as fresh again (after a successful revalidation)
+
+        :param entry:CacheEntry
+        """
+        entry.meta['stored_at'] = time.time()
+        self._write_meta(entry.key, entry.meta)
+
+    def touch(self, key):
+        """Mark an entry as recently used"""
+        try:
+            os.utime(self._get_path(key, 'body'), None)
+        except OSError:
+            pass
+
+    def commit(self, key, meta, body_path):
+        """
+        Move a completely downloaded body into the cache, then evict old entries if needed
+
+        :param key:string see get_key
+        :param meta:dict entry metadata
+        :param body_path:string path to the temporary body file
+        """
+        os.rename(body_path, self._get_path(key, 'body'))
+        self._write_meta(key, meta)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove left over temporary files, then least recently used entries
+        until the cache directory fits in max_size
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            now = time.time()
+            for name in os.listdir(self.directory):
+                if name.endswith('.tmp'):
+                    total += self._evict_temporary_file(os.path.join(self.directory, name), now)
+                    continue
+                if not name.endswith('.body'):
+                    continue
+                key = name[:-5]
+                try:
+                    body_stat = os.stat(self._get_path(key, 'body'))
+                    size = body_stat.st_size + os.path.getsize(self._get_path(key, 'json'))
+                except OSError:
+                    continue
+                entries.append((body_stat.st_mtime, key, size))
+                total += size
+
+            for mtime, key, size in sorted(entries):
+                if total <= self.max_size:
+                    break
+                self.delete(key)
+                total -= size
+
+    def delete(self, key):
+        for extension in ['body', 'json']:
+            try:
+                os.remove(self._get_path(key, extension))
+            except OSError:
+                pass
+
+    def get_temporary_file(self):
+        """
+        :return:tuple (file, path)
+        """
+        fd, path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        return os.fdopen(fd, 'wb'), path
+
+    def _evict_temporary_file(self, path, now):
+        """
+        :param path:string
+        :param now:float timestamp
+        :return:int size still used by the file (downloads in progress are kept)
+        """
+        try:
+            stat = os.stat(path)
+            if now - stat.st_mtime < self.temporary_ttl:
+                return stat.st_size
+            os.remove(path)
+        except OSError:
+            pass
+        return 0
+
+    def _write_meta(self, key, meta):
+        f, path = self.get_temporary_file()
+        with f:
+            json.dump(meta, f)
+        os.rename(path, self._get_path(key, 'json'))
+
+    def _get_path(self, key, extension):
+        return os.path.join(self.directory, '%s.%s' % (key, extension))
+
+
+class CacheEntry(object):
+    def __init__(self, cache, key, meta):
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+
+    def is_fresh(self, ttl):
+        return time.time() - self.meta['stored_at'] < ttl
+
+    def get_validators(self):
+        """
+        Get the headers needed to revalidate this entry (conditional request)
+
+        :return:dict
+        """
+        headers = {}
+        if self.meta.get('etag') is not None:
+            headers['If-None-Match'] = self.meta['etag']
+        if self.meta.get('last_modified') is not None:
+            headers['If-Modified-Since'] = self.meta['last_modified']
+        return headers
+
+    def open(self):
+        """
+        Open the cached body as an http response
+
+        :return:urllib.addinfourl
+        """
+        self.cache.touch(self.key)
+
+        headers = ''
+        if self.meta.get('content_type') is not None:
+            headers = 'Content-Type: %s\r\n' % self.meta['content_type']
+
+        return urllib.addinfourl(
+            open(self.cache._get_path(self.key, 'body'), 'rb'),
+            mimetools.Message(StringIO(headers)),
+            self.meta['url'],
+            200
+        )
+
+
+class CachingResponse(object):
+    """
+    File-like wrapper around an http response that copies everything read to the cache.
+    The entry is committed once the response has been read until the end
+    """
+    def __init__(self, response, cache, key, meta):
+        self.response = response
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+        self.file, self.path = cache.get_temporary_file()
+
+    def read(self, size=-1):
+        data = self.response.read() if size < 0 else self.response.read(size)
+        self._write(data)
+        if size < 0 or len(data) == 0:
+            self._commit()
+        return data
+
+    def readline(self, size=-1):
+        data = self.response.readline(size)
+        self._write(data)
+        if len(data) == 0:
+            self._commit()
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, '')
+
+    def close(self):
+        # not read until the end: discard the partial copy
+        if self.file is not None:
+            self.file.close()
+            os.remove(self.path)
+            self.file = None
+        self.response.close()
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def _write(self, data):
+        if self.file is not None:
+            self.file.write(data)
+
+    def _commit(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        self.cache.commit(self.key, self.meta, self.path)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import mimetools
+import os
+import tempfile
+import threading
+import time
+import urllib
+import urllib2
+import urlparse
+from StringIO import StringIO
+
+from lst.cache import ResponseCache
+
+
+class Cassette(object):
+    """
+    Recorded http exchanges, used by Remote._request in place of the network:
+
+    - record mode: every request is sent to the backend and its response written to the cassette directory
+    - replay mode: responses are served from the cassette directory, nothing is sent over the network
+
+    Each exchange is stored as two files: [key].body (raw response body) and [key].json (status, headers...)
+    """
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    # request body parameters never used as part of the key (credentials)
+    ignored_parameters = ['username', 'password']
+    # response headers never recorded (live sessions)
+    ignored_headers = ['set-cookie', 'cookie']
+
+    def __init__(self, directory, mode, latency=None):
+        """
+        :param directory:string where exchanges are stored
+        :param mode:string Cassette.RECORD or Cassette.REPLAY
+        :param latency:float|string replay only: nb of seconds added to each response,
+            or 'recorded' to wait as long as the backend took when the exchange was recorded
+        """
+        if mode not in [self.RECORD, self.REPLAY]:
+            raise ValueError('Unknown cassette mode %s' % mode)
+
+        self.directory = directory
+        self.mode = mode
+        self.latency = latency if latency in [None, 'recorded'] else float(latency)
+        self._lock = threading.Lock()
+
+        if mode == self.RECORD and not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    @classmethod
+    def get_key(cls, request):
+        """
+        Get the key of a request (method, normalized url and body, credentials stripped)
+
+        :param request:urllib2.Request
+        :return:string
+        """
+        body = ''
+        if request.get_data() is not None:
+            body = cls._get_key_body(request.get_data())
+
+        return hashlib.sha1('%s %s %s' % (
+            request.get_method(),
+            ResponseCache.normalize_url(request.get_full_url()),
+            body
+        )).hexdigest()
+
+    @classmethod
+    def _get_key_body(cls, data):
+        """
+        :param data:string request body, form encoded or json
+        :return:string normalized body, credentials stripped
+        """
+        try:
+            document = json.loads(data)
+        except ValueError:
+            document = None
+        if isinstance(document, dict):
+            return json.dumps(
+                dict([(k, v) for k, v in document.items() if k not in cls.ignored_parameters]),
+                sort_keys=True
+            )
+
+        parameters = [
+            (k, v) for k, v in urlparse.parse_qsl(data, keep_blank_values=True)
+            if k not in cls.ignored_parameters
+        ]
+        return urllib.urlencode(sorted(parameters))
+
+    def open(self, opener, request):
+        """
+        Get the response to a request, recording it or replaying it depending on the mode
+
+        :param opener:urllib2.OpenerDirector used to send the request in record mode
+        :param request:urllib2.Request
+        :return:file-like response
+        :raise urllib2.HTTPError: for error (and not modified) statuses, like urllib2 does
+        """
+        if self.mode == self.REPLAY:
+            return self.replay(request)
+        return self.record(opener, request)
+
+    def record(self, opener, request):
+        start = time.time()
+        try:
+            response = opener.open(request)
+        except urllib2.HTTPError as e:
+            response = e
+        body = response.read()
+        response.close()
+
+        meta = {
+            'method': request.get_method(),
+            'url': ResponseCache.normalize_url(request.get_full_url()),
+            'status': response.code,
+            'reason': response.msg,
+            'headers': [
+                header for header in response.info().headers
+                if header.split(':', 1)[0].strip().lower() not in self.ignored_headers
+            ],
+            'duration': time.time() - start,
+        }
+        self._write(self.get_key(request), meta, body)
+
+        return self._get_response(request, meta, body)
+
+    def replay(self, request):
+        key = self.get_key(request)
+        try:
+            with open(self._get_path(key, 'json')) as f:
+                meta = json.load(f)
+            with open(self._get_path(key, 'body'), 'rb') as f:
+                body = f.read()
+        except (IOError, ValueError):
+            raise urllib2.URLError('No recorded response for %s %s in %s' % (
+                request.get_method(),
+                ResponseCache.normalize_url(request.get_full_url()),
+                self.directory
+            ))
+
+        latency = meta['duration'] if self.latency == 'recorded' else self.latency
+        if latency:
+            time.sleep(latency)
+
+        return self._get_response(request, meta, body)
+
+    def _get_response(self, request, meta, body):
+        headers = mimetools.Message(StringIO(''.join(meta['headers'])))
+        if meta['status'] >= 300:
+            raise urllib2.HTTPError(request.get_full_url(), meta['status'], meta['reason'], headers, StringIO(body))
+
+        response = urllib.addinfourl(StringIO(body), headers, request.get_full_url(), meta['status'])
+        response.msg = meta['reason']
+        return response
+
+    def _write(self, key, meta, body):
+        # files are written atomically, so that concurrent requests never see partial exchanges
+        with self._lock:
+            for extension, content in [('body', body), ('json', json.dumps(meta))]:
+                fd, path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                os.rename(path, self._get_path(key, extension))
+
+    def _get_path(self, key, extension):
+        return os.path.join(self.directory, '%s.%s' % (key, extension))
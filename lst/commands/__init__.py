@@ -16,6 +16,8 @@ from lst.helpers import *
 from lst.parser import ConfigParser
 from lst.managers.jiraManager import JiraManager
 from lst.managers.zebraManager import ZebraManager
+from lst.fetch import FetchOrchestrator
+from lst.burnup import BurnupEngine
 
 
 class BaseCommand(object):
@@ -26,6 +28,11 @@ class BaseCommand(object):
 
     def add_common_arguments(self, parser):
         parser.add_argument("--dev-mode", action="store_true", help="development mode")
+        parser.add_argument("--no-cache", action="store_true", help="don't use (nor fill) the http cache")
+        parser.add_argument("--refresh", action="store_true", help="download everything again (refreshes the http cache)")
+        parser.add_argument("--record", metavar="DIR", help="record all jira/zebra exchanges to DIR (disables the cache)")
+        parser.add_argument("--replay", metavar="DIR", help="replay jira/zebra exchanges recorded with --record, offline")
+        parser.add_argument("--replay-latency", metavar="SECONDS", help="delay added to replayed responses, or 'recorded' to reproduce the recorded delays")
         return parser
 
     def add_command_arguments(self, subparsers):
@@ -137,25 +144,21 @@ class SprintBurnUpCommand(BaseCommand):
         except:
             graph_end_date = datetime.date.today() - datetime.timedelta(days=1)
 
-        # start fetching zebra data
-        print 'Start fetching Zebra'
+        # fetch zebra and jira data at the same time
+        Story.closed_status_ids = sprint.get_closed_status_codes()
         zebra_manager = self.get_zebra_manager()
-        timesheets = zebra_manager.get_timesheets_for_sprint(sprint)
+        jira_manager = self.get_jira_manager()
+        results = FetchOrchestrator() \
+            .add('Zebra', zebra_manager.get_timesheets_for_sprint, sprint) \
+            .add('Jira', jira_manager.get_stories_for_sprint_with_end_date, sprint) \
+            .run()
+
+        timesheets = results['Zebra']
         sprint.timesheet_collection = timesheets
-        if len(timesheets) > 0:
-            zebra_days = timesheets.group_by_day()
-        print 'End Zebra'
+        timesheet_index = timesheets.get_index()
 
-        # start fetching jira data
-        print 'Start fetching Jira'
-        Story.closed_status_ids = sprint.get_closed_status_codes()
-        jira_manager = self.get_jira_manager()
-        stories = jira_manager.get_stories_for_sprint_with_end_date(sprint)
+        stories = results['Jira']
         sprint.story_collection = stories
-        print 'End Jira'
-
-        # define x serie
-        dates = []
 
         # define all y series
         serie_collection = SprintBurnupSeries()
@@ -166,69 +169,49 @@ class SprintBurnUpCommand(BaseCommand):
         serie_collection.get('sp').ideal_value = stories.get_commited('sp')
         serie_collection.get('bv').ideal_value = stories.get_commited('bv')
 
-        # loop through all sprint days and gather values
+        # compute all series at once, for all sprint days
         days = DateHelper.get_all_days(sprint.get_zebra_data('start_date'), sprint.get_zebra_data('end_date'), True)
-        for date in days:
-            time_without_forced = 0
-
-            zebra_day = zebra_days.get(str(date))
-
-            if zebra_day is not None:
-                time_without_forced = zebra_day.time
-
-            # check for forced zebra values
-            total_time = sprint.get_forced_data(str(date), time_without_forced)
+        engine = BurnupEngine.from_sprint(sprint, days, timesheet_index, stories)
 
-            planned_time = sprint.get_planned_data(str(date))
+        # output data for each day to the console (useful but not necessary for this command)
+        self._print_days(engine, timesheet_index)
 
-            # output data for this day to the console (useful but not necessary for this command
-            if total_time != 0:
-                print date
+        # md, sp and bv series stop at graph_end_date, planned goes on until the end of the sprint
+        dates, percent_series = engine.get_percent_series(graph_end_date, serie_collection)
 
-                entries_per_user = zebra_day.get_entries_per_user()
-                for user, time in entries_per_user.items():
-                    print "%s : %s" % (user, time)
-
-                planned_str = '' if planned_time is None else '(Planned: ' + str(planned_time) + ')'
+        # get only meaningfull series (ie. don't use BV if the team doesnt use it)
+        graph_series = serie_collection.get_series_for_chart()
 
-                # print total time per day (with and/or without forced values)
-                if time_without_forced == total_time:
-                    print 'Total: %s %s' % (total_time, planned_str)
-                else:
-                    print 'Total (without forced data): %s' % time_without_forced
-                    print 'Total including forced data: %s %s' % (total_time, planned_str)
-                print ''
-            # end of output
+        self._output(sprint, dates, graph_series, percent_series, graph_end_date)
 
-            # get jira achievement for this day (bv/sp done)
-            jira_data = stories.get_achievement_for_day(str(date))
+    def _print_days(self, engine, timesheet_index):
+        """
+        Print hours per user and total hours of each day with some time
 
-            # if we have some time, story closed for this day or planned time, add it to graph data
-            if jira_data is not None or total_time != 0 or planned_time is not None:
-                dates.append(date)
+        :param engine:BurnupEngine
+        :param timesheet_index:TimeSheetIndex
+        """
+        for date, time_without_forced, total_time, planned_time in engine.iter_days():
+            if total_time == 0:
+                continue
 
-                for serie in serie_collection.values():
-                    # only add data for dates > graph_end_date for "planned" (not md, sp, bv...)
-                    if serie.name == 'planned':
-                        serie.cumulate(planned_time)
-                    elif serie.name == 'md':
-                        if date <= graph_end_date:  # for md, sp, bv dont add data if date is after graph_end_date
-                            serie.cumulate(total_time)
-                    else:
-                        if date <= graph_end_date:  # for md, sp, bv dont add data if date is after graph_end_date
-                            serie.cumulate(None if jira_data is None else jira_data[serie.name])
+            print date
 
-        # get only meaningfull series (ie. don't use BV if the team doesnt use it)
-        graph_series = serie_collection.get_series_for_chart()
+            entries_per_user = timesheet_index.hours_per_user_per_day.get(str(date), {})
+            for user, time in entries_per_user.items():
+                print "%s : %s" % (user, time)
 
-        self._output(sprint, dates, graph_series, graph_end_date)
+            planned_str = '' if planned_time is None else '(Planned: ' + str(planned_time) + ')'
 
-    def _output(self, sprint, dates, graph_series, graph_end_date):
-        # convert all y series to percents
-        percent_series = OrderedDict()
-        for name, serie in graph_series.items():
-            percent_series[name] = serie.get_values_as_percent()
+            # print total time per day (with and/or without forced values)
+            if time_without_forced == total_time:
+                print 'Total: %s %s' % (total_time, planned_str)
+            else:
+                print 'Total (without forced data): %s' % time_without_forced
+                print 'Total including forced data: %s %s' % (total_time, planned_str)
+            print ''
 
+    def _output(self, sprint, dates, graph_series, percent_series, graph_end_date):
         # add future days (up to graph_end_date) so that the graph looks more realistic
         if sprint.get_zebra_data('end_date') > dates[-1]:
             today = datetime.date.today()
@@ -43,7 +43,7 @@ class CheckHoursCommand(BaseCommand):
             return
 
         return self._sort_groups_alphabetically(
-            zebra_entries.group_by_project()
+            zebra_entries.get_index().get_projects()
         )
 
     def _sort_groups_alphabetically(self, projects):
@@ -6,6 +6,7 @@ from lst.helpers import ArgParseHelper, UrlHelper
 from lst.models import ResultPerStorySeries
 from lst.output import ResultPerStoryChart, HtmlOutput, OutputHelper
 from lst.errors import SyntaxError
+from lst.fetch import FetchOrchestrator
 
 
 class ResultPerStoryCommand(BaseCommand):
@@ -30,10 +31,15 @@ class ResultPerStoryCommand(BaseCommand):
         except:
             raise SyntaxError("No commit prefix found in config. Make sure it's defined in your settings file")
 
-        # retrieve jira data
-        # to compare estimated story_points to actual MD consumption
+        # retrieve jira data (to compare estimated story_points to actual MD consumption) and zebra data at the same time
         jira_manager = self.get_jira_manager()
-        jira_entries = jira_manager.get_stories_for_sprint(sprint)
+        zebra_manager = self.get_zebra_manager()
+        results = FetchOrchestrator() \
+            .add('Jira', jira_manager.get_stories_for_sprint, sprint) \
+            .add('Zebra', zebra_manager.get_timesheets_for_sprint, sprint) \
+            .run()
+
+        jira_entries = results['Jira']
         sprint.story_collection = jira_entries
 
         # extract the integer from the story id
@@ -43,9 +49,7 @@ class ResultPerStoryCommand(BaseCommand):
             story_id = jira_id_only_regex.findall(entry.id)[0]
             jira_values[story_id] = entry.story_points
 
-        # retrieve zebra data
-        zebra_manager = self.get_zebra_manager()
-        zebra_entries = zebra_manager.get_timesheets_for_sprint(sprint)
+        zebra_entries = results['Zebra']
         if len(zebra_entries) == 0:
             return
 
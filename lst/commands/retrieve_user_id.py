@@ -1,3 +1,5 @@
+import sys
+
 from lst.commands import BaseCommand
 from lst.errors import IOError
 
@@ -13,31 +15,42 @@ class RetrieveUserIdCommand(BaseCommand):
         return parser
 
     def run(self, args):
-        names = [x.lower() for x in args.lastname]
+        # command line arguments are byte strings, zebra names are unicode
+        encoding = sys.stdin.encoding or 'utf-8'
+        names = [(x.decode(encoding) if isinstance(x, str) else x).lower() for x in args.lastname]
 
         zebra_manager = self.get_zebra_manager()
-        all_users = zebra_manager.get_all_users()
-        from pprint import pprint
-        pprint(all_users)
-        if len(all_users) == 0:
+        directory = zebra_manager.get_user_directory()
+        if len(directory) == 0:
             raise IOError(
                 "No user found at all! (check that you are connected to internet)"
             )
 
         users = []
-        for user in all_users:
-            if user['employee_lastname'].lower() in names:
-                users.append(user)
+        for name in names:
+            found = directory.find_by_lastname(name)
+            if len(found) == 0:
+                self._output_suggestions(name, directory.find_by_prefix(name) or directory.find_similar(name))
+            users += [user for user in found if user not in users]
 
         self._output(users, names)
 
+    def _output_suggestions(self, name, users):
+        if len(users) == 0:
+            return
+
+        print u'No user found with lastname {}, did you mean: {}'.format(
+            name,
+            ', '.join([u'{} ({})'.format(user['employee_lastname'], user['employee_firstname']) for user in users])
+        )
+
     def _output(self, users, names):
         if len(users) == 0:
-            print 'No user found with lastname {}'.format(', '.join(names))
+            print u'No user found with lastname {}'.format(', '.join(names))
             return
 
         for user in users:
-            print 'found {} ({}) with id {}'.format(
+            print u'found {} ({}) with id {}'.format(
                 user['employee_lastname'],
                 user['employee_firstname'],
                 user['id']
@@ -0,0 +1,208 @@
+import collections
+import sys
+import threading
+
+
+class TaskQueue(object):
+    """
+    Runs calls in the background, each in its own thread, with at most max_concurrency calls at the same time.
+    Calls scheduled while all slots are taken wait in the queue, so that hundreds of calls can be scheduled at once
+    """
+    def __init__(self, max_concurrency=1, initializers=None):
+        """
+        :param max_concurrency:int max nb of calls running at the same time
+        :param initializers:list of callables run before each call in its thread, with the ident of the thread
+            which scheduled it (ie. see ConcurrencyHelper.worker_initializers)
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.initializers = [] if initializers is None else initializers
+
+        self._queue = collections.deque()
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def set_max_concurrency(self, max_concurrency):
+        """
+        :param max_concurrency:int max nb of calls running at the same time
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._dispatch()
+
+    def schedule(self, function, *args):
+        """
+        Queue a call, run as soon as a slot is available
+
+        :param function:callable
+        :param args:list function arguments
+        :return:Future
+        """
+        future = Future()
+        with self._lock:
+            self._queue.append((future, function, args, threading.current_thread().ident))
+        self._dispatch()
+
+        return future
+
+    def _dispatch(self):
+        """Start queued calls while there are free slots"""
+        while True:
+            with self._lock:
+                if len(self._queue) == 0 or self._running >= self.max_concurrency:
+                    return
+                self._running += 1
+                task = self._queue.popleft()
+            thread = threading.Thread(target=self._run, args=task)
+            thread.daemon = True
+            thread.start()
+
+    def _run(self, future, function, args, parent_ident):
+        value = None
+        exc_info = None
+        try:
+            for initializer in self.initializers:
+                initializer(parent_ident)
+            value = function(*args)
+        except Exception:
+            exc_info = sys.exc_info()
+
+        # the slot is freed before the future is resolved: callbacks can wait for calls scheduled on this queue
+        with self._lock:
+            self._running -= 1
+        self._dispatch()
+
+        future._set_done(value, exc_info)
+
+
+class Future(object):
+    """
+    Result of a call running in the background (see TaskQueue), available once the call is done
+    """
+    def __init__(self):
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._value = None
+        self._exc_info = None
+        self._callbacks = []
+
+    @classmethod
+    def gather(cls, futures, combine=None):
+        """
+        Get a future resolved once all the given futures are done
+
+        :param futures:list of Future
+        :param combine:callable called with the list of results (in order), defaults to returning the list
+        :return:Future failing with the first error if any of the futures fails
+        """
+        gathered = Future()
+        futures = list(futures)
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(future):
+            if gathered.ready():
+                return
+            if future._exc_info is not None:
+                gathered.set_exception(future._exc_info)
+                return
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] != 0:
+                    return
+            gathered._resolve(lambda: [f._value for f in futures] if combine is None else combine([f._value for f in futures]))
+
+        if len(futures) == 0:
+            gathered._resolve(lambda: [] if combine is None else combine([]))
+        for future in futures:
+            future.add_done_callback(done)
+
+        return gathered
+
+    def then(self, function):
+        """
+        Get a future resolved with function(result) once this one is done.
+        If function returns a Future (ie. to schedule more calls), the chained future is resolved with its result
+
+        :param function:callable
+        :return:Future
+        """
+        chained = Future()
+
+        def done(future):
+            if future._exc_info is not None:
+                chained.set_exception(future._exc_info)
+                return
+            try:
+                value = function(future._value)
+            except Exception:
+                chained.set_exception(sys.exc_info())
+                return
+            if isinstance(value, Future):
+                value.add_done_callback(lambda inner: chained._set_done(inner._value, inner._exc_info))
+            else:
+                chained.set_result(value)
+
+        self.add_done_callback(done)
+        return chained
+
+    def add_done_callback(self, callback):
+        """
+        Call callback(future) once the future is done (right now if it is already done)
+
+        :param callback:callable
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def set_result(self, value):
+        self._set_done(value, None)
+
+    def set_exception(self, exc_info):
+        """
+        :param exc_info:tuple as returned by sys.exc_info()
+        """
+        self._set_done(None, exc_info)
+
+    def ready(self):
+        return self._done.is_set()
+
+    def get(self, timeout=None):
+        """
+        Wait for the result
+
+        :param timeout:float max nb of seconds to wait, None to wait until the call is done
+        :return:mixed the call result
+        :raise: the call error (with its original traceback)
+        """
+        # wait with a timeout, so that ctrl-c still works
+        waited = 0
+        while not self._done.wait(0.1):
+            waited += 0.1
+            if timeout is not None and waited >= timeout:
+                raise RuntimeError('Timeout while waiting for result')
+
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._value
+
+    def _resolve(self, function):
+        try:
+            self.set_result(function())
+        except Exception:
+            self.set_exception(sys.exc_info())
+
+    def _set_done(self, value, exc_info):
+        # only the first result counts
+        with self._lock:
+            if self._done.is_set():
+                return
+            self._value = value
+            self._exc_info = exc_info
+            self._done.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+
+        for callback in callbacks:
+            callback(self)
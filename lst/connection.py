@@ -0,0 +1,310 @@
+import httplib
+import socket
+import threading
+import urllib2
+import zlib
+
+
+class ConnectionPool(object):
+    """
+    Keeps idle keep-alive connections per host so that subsequent requests don't pay
+    the tcp/tls handshake again. Safe to share between threads
+    """
+    def __init__(self, max_idle_per_host=10):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, scheme, host, timeout, tunnel=None):
+        """
+        Get an idle connection to host, or a new one if none is available
+
+        :param scheme:string http or https
+        :param host:string host[:port] (the proxy when tunnelling)
+        :param timeout:float socket timeout for new connections
+        :param tunnel:tuple (tunnel host, tunnel headers) to go through a proxy, None to connect directly
+        :return:tuple (connection, reused)
+        """
+        with self._lock:
+            idle = self._idle.get(self._get_key(scheme, host, tunnel))
+            if idle:
+                return idle.pop(), True
+
+        return self.connect(scheme, host, timeout, tunnel), False
+
+    def connect(self, scheme, host, timeout, tunnel=None):
+        """
+        Get a new (not pooled yet) connection to host
+
+        :return:HTTPConnection
+        """
+        connection_class = httplib.HTTPSConnection if scheme == 'https' else httplib.HTTPConnection
+        connection = connection_class(host, timeout=timeout)
+        if tunnel is not None:
+            connection.set_tunnel(tunnel[0], headers=tunnel[1])
+        return connection
+
+    def release(self, scheme, host, connection, tunnel=None):
+        """
+        Give a connection back to the pool, once its response has been completely read
+
+        :param connection:HTTPConnection
+        """
+        with self._lock:
+            idle = self._idle.setdefault(self._get_key(scheme, host, tunnel), [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    def close_all(self):
+        with self._lock:
+            connections = [c for idle in self._idle.values() for c in idle]
+            self._idle = {}
+
+        for connection in connections:
+            connection.close()
+
+    def _get_key(self, scheme, host, tunnel):
+        # tunnelled connections are only reused for the same target host
+        return scheme, host, None if tunnel is None else tunnel[0]
+
+
+class PooledResponse(object):
+    """
+    Socket-like wrapper around an httplib response, which gives its connection back to the pool
+    as soon as the response body has been read entirely
+    """
+    # when closed before the end, a remaining body up to this size is read so that the connection can be reused
+    max_drain_size = 64 * 1024
+
+    def __init__(self, response, pool, scheme, host, connection, tunnel=None):
+        self.response = response
+        self.pool = pool
+        self.scheme = scheme
+        self.host = host
+        self.connection = connection
+        self.tunnel = tunnel
+
+    def recv(self, size=-1):
+        data = self.response.read(size) if size >= 0 else self.response.read()
+        if self.response.isclosed():
+            self._release()
+        return data
+
+    def close(self):
+        if self.connection is None:
+            return
+
+        if not self.response.isclosed() and self._is_drainable():
+            try:
+                self.response.read()
+            except (socket.error, httplib.HTTPException):
+                self._discard()
+                return
+
+        if self.response.isclosed():
+            self._release()
+        else:
+            # too much left to read: the connection can't be reused
+            self._discard()
+
+    def _is_drainable(self):
+        # chunked or unknown size bodies are not drained, they can be of any size
+        return not self.response.will_close and self.response.length is not None and \
+            self.response.length <= self.max_drain_size
+
+    def _discard(self):
+        self.response.close()
+        self.connection.close()
+        self.connection = None
+
+    def _release(self):
+        if self.connection is None:
+            return
+        if self.response.will_close:
+            self.connection.close()
+        else:
+            self.pool.release(self.scheme, self.host, self.connection, self.tunnel)
+        self.connection = None
+
+
+class KeepAliveHandler(urllib2.HTTPHandler, urllib2.HTTPSHandler):
+    """
+    urllib2 handler opening http(s) requests on pooled keep-alive connections
+    """
+    def __init__(self, pool):
+        urllib2.HTTPHandler.__init__(self)
+        self.pool = pool
+
+    def http_open(self, request):
+        return self._open('http', request)
+
+    def https_open(self, request):
+        return self._open('https', request)
+
+    def _open(self, scheme, request):
+        host = request.get_host()
+        if not host:
+            raise urllib2.URLError('no host given')
+
+        headers = dict(request.unredirected_hdrs)
+        headers.update(dict((k, v) for k, v in request.headers.items() if k not in headers))
+        headers['Connection'] = 'keep-alive'
+        headers = dict((name.title(), value) for name, value in headers.items())
+
+        # https through a proxy (see urllib2.ProxyHandler): connect to the proxy and tunnel to the target host,
+        # proxy credentials go to the CONNECT request only, like urllib2.AbstractHTTPHandler.do_open does
+        tunnel = None
+        if request._tunnel_host:
+            tunnel_headers = {}
+            if 'Proxy-Authorization' in headers:
+                tunnel_headers['Proxy-Authorization'] = headers.pop('Proxy-Authorization')
+            tunnel = (request._tunnel_host, tunnel_headers)
+
+        connection, reused = self.pool.get(scheme, host, request.timeout, tunnel)
+        try:
+            response = self._send(connection, request, headers)
+        except (socket.error, httplib.HTTPException) as e:
+            connection.close()
+            if not reused:
+                raise urllib2.URLError(e)
+
+            # the server closed the idle connection in the meantime: retry once on a fresh one
+            connection = self.pool.connect(scheme, host, request.timeout, tunnel)
+            try:
+                response = self._send(connection, request, headers)
+            except (socket.error, httplib.HTTPException) as e:
+                connection.close()
+                raise urllib2.URLError(e)
+
+        fp = socket._fileobject(PooledResponse(response, self.pool, scheme, host, connection, tunnel), close=True)
+
+        resp = urllib2.addinfourl(fp, response.msg, request.get_full_url())
+        resp.code = response.status
+        resp.msg = response.reason
+
+        return resp
+
+    def _send(self, connection, request, headers):
+        connection.request(request.get_method(), request.get_selector(), request.data, headers)
+        return connection.getresponse(buffering=True)
+
+
+class DecompressingResponse(object):
+    """
+    File-like wrapper decompressing a gzip or deflate encoded response while it is being read
+    """
+    def __init__(self, response, encoding, on_end=None, chunk_size=16 * 1024):
+        """
+        :param response:file-like compressed response
+        :param encoding:string gzip or deflate
+        :param on_end:callable called with (compressed size, decompressed size) once the response has been read
+        """
+        self.response = response
+        self.encoding = encoding
+        self.on_end = on_end
+        self.chunk_size = chunk_size
+        # 16 + MAX_WBITS: gzip header, MAX_WBITS: zlib header
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS)
+        self.buffer = ''
+        self.eof = False
+        self.compressed_size = 0
+        self.decompressed_size = 0
+
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            self._fill()
+
+        if size < 0:
+            data, self.buffer = self.buffer, ''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self, size=-1):
+        while not self.eof and '\n' not in self.buffer and (size < 0 or len(self.buffer) < size):
+            self._fill()
+
+        end = self.buffer.find('\n') + 1 or len(self.buffer)
+        if size >= 0:
+            end = min(end, size)
+        data, self.buffer = self.buffer[:end], self.buffer[end:]
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, '')
+
+    def close(self):
+        self.response.close()
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def _fill(self):
+        data = self.response.read(self.chunk_size)
+        self.compressed_size += len(data)
+        if len(data) == 0:
+            decompressed = self.decompressor.flush()
+            self.eof = True
+        else:
+            try:
+                decompressed = self.decompressor.decompress(data)
+            except zlib.error:
+                if self.encoding != 'deflate' or self.compressed_size != len(data):
+                    raise
+                # some servers send raw deflate data, without zlib header
+                self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                decompressed = self.decompressor.decompress(data)
+
+        self.decompressed_size += len(decompressed)
+        self.buffer += decompressed
+
+        if self.eof and self.on_end is not None:
+            self.on_end(self.compressed_size, self.decompressed_size)
+
+
+class CompressionHandler(urllib2.BaseHandler):
+    """
+    urllib2 handler asking for compressed responses and decompressing them transparently
+    (responses keep being read as a stream)
+    """
+    encodings = ['gzip', 'deflate']
+
+    def __init__(self, on_end=None):
+        """
+        :param on_end:callable called with (url, encoding, compressed size, decompressed size)
+            once a compressed response has been read
+        """
+        self.on_end = on_end
+
+    def http_request(self, request):
+        if not request.has_header('Accept-encoding'):
+            request.add_unredirected_header('Accept-Encoding', ', '.join(self.encodings))
+        return request
+
+    def http_response(self, request, response):
+        headers = response.info()
+        encoding = (headers.getheader('Content-Encoding') or '').strip().lower()
+        if encoding not in self.encodings:
+            return response
+
+        url = request.get_full_url()
+        on_end = None
+        if self.on_end is not None:
+            on_end = lambda compressed, decompressed: self.on_end(url, encoding, compressed, decompressed)
+
+        # the body is given decoded to the next readers (cache, parsers)
+        for name in ['Content-Encoding', 'Content-Length']:
+            if name in headers:
+                del headers[name]
+
+        decoded = urllib2.addinfourl(DecompressingResponse(response, encoding, on_end), headers, response.geturl())
+        decoded.code = response.code
+        decoded.msg = response.msg
+
+        return decoded
+
+    https_request = http_request
+    https_response = http_response
@@ -5,3 +5,5 @@ class SyntaxError(LstError): pass
 class InputParametersError(LstError): pass
 class DevelopmentError(LstError): pass
 class IOError(LstError): pass
+class FetchError(LstError): pass
+class AuthenticationError(LstError): pass
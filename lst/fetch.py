@@ -0,0 +1,138 @@
+import sys
+import threading
+from StringIO import StringIO
+
+from lst.concurrency import TaskQueue
+from lst.errors import FetchError
+from lst.helpers import ConcurrencyHelper
+
+
+class ThreadOutput(object):
+    """
+    sys.stdout replacement which redirects what registered threads print to their own buffer
+    (other threads keep printing directly to the console)
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    def register(self, ident=None):
+        """
+        Start buffering the output of a thread
+
+        :param ident:int thread ident, defaults to the current thread
+        :return:StringIO the thread buffer
+        """
+        ident = threading.current_thread().ident if ident is None else ident
+        with self.lock:
+            self.buffers[ident] = StringIO()
+            return self.buffers[ident]
+
+    def inherit(self, parent_ident):
+        """
+        Make the current thread write to the same buffer as its parent thread (ie. for worker pools)
+
+        :param parent_ident:int ident of the thread which started the current one
+        """
+        ident = threading.current_thread().ident
+        with self.lock:
+            if parent_ident in self.buffers:
+                self.buffers[ident] = self.buffers[parent_ident]
+            else:
+                # thread idents are reused: forget the buffer of a previous thread
+                self.buffers.pop(ident, None)
+
+    @staticmethod
+    def init_worker(parent_ident):
+        """
+        Worker initializer: workers print to the same output as the thread that started them
+
+        :param parent_ident:int ident of the thread which started the pool
+        """
+        if isinstance(sys.stdout, ThreadOutput):
+            sys.stdout.inherit(parent_ident)
+
+    def write(self, data):
+        buffer = self.buffers.get(threading.current_thread().ident)
+        if buffer is None:
+            self.stream.write(data)
+        else:
+            with self.lock:
+                buffer.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+ConcurrencyHelper.worker_initializers.append(ThreadOutput.init_worker)
+
+
+class FetchOrchestrator(object):
+    """
+    Runs independent fetch tasks (ie. Zebra and Jira) at the same time, each in its own thread.
+    What a task prints is printed as one block once it is done, in the order tasks were added,
+    so that the console output reads as if tasks were run one after the other
+    """
+    def __init__(self):
+        self.tasks = []
+
+    def add(self, name, function, *args):
+        """
+        Add a task
+
+        :param name:string task name (used in console output, and as key in the results)
+        :param function:callable
+        :param args:list function arguments
+        :return:FetchOrchestrator
+        """
+        self.tasks.append((name, function, args))
+        return self
+
+    def run(self):
+        """
+        Run all tasks and wait for them to finish
+
+        :return:dict {task name: result}
+        :raise: the task error if a single task failed, a FetchError describing all errors otherwise
+        """
+        buffers = {}
+
+        output = sys.stdout
+        if not isinstance(output, ThreadOutput):
+            sys.stdout = ThreadOutput(output)
+
+        try:
+            tasks = TaskQueue(len(self.tasks), ConcurrencyHelper.worker_initializers)
+            futures = [
+                (name, tasks.schedule(self._run_task, name, function, args, buffers))
+                for name, function, args in self.tasks
+            ]
+
+            results = {}
+            errors = []
+            for name, future in futures:
+                try:
+                    results[name] = future.get()
+                except Exception:
+                    errors.append((name, sys.exc_info()))
+                output.write(buffers[name].getvalue())
+        finally:
+            sys.stdout = output
+
+        if len(errors) == 1:
+            name, exc_info = errors[0]
+            raise exc_info[0], exc_info[1], exc_info[2]
+        if len(errors) > 1:
+            raise FetchError('; '.join(['%s: %s' % (name, exc_info[1]) for name, exc_info in errors]))
+
+        return results
+
+    def _run_task(self, name, function, args, buffers):
+        buffers[name] = sys.stdout.register()
+
+        print 'Start fetching %s' % name
+        result = function(*args)
+        print 'End %s' % name
+
+        return result
@@ -1,11 +1,13 @@
 import datetime
-import dateutil
+import dateutil.parser
+import dateutil.tz
 import os
 import shlex
 import subprocess
 import unicodedata
 import re
 
+from lst.concurrency import Future, TaskQueue
 from lst.errors import *
 
 
@@ -91,6 +93,34 @@ class DateHelper(object):
 
 
 class ZebraHelper(object):
+    # dates already decoded by parse_date, by raw string (a report only has a few distinct dates)
+    _parsed_dates = {}
+    max_parsed_dates = 10000
+
+    @classmethod
+    def parse_date(cls, date_string):
+        """
+        Decode a date as sent by Zebra (2013-05-24 00:00:00). Other formats are parsed by dateutil (day first)
+
+        :param date_string:string
+        :return:date
+        """
+        date = cls._parsed_dates.get(date_string)
+        if date is not None:
+            return date
+
+        try:
+            if date_string[4] != '-' or date_string[7] != '-' or date_string[10:11] not in ['', ' ', 'T']:
+                raise ValueError
+            date = datetime.date(int(date_string[0:4]), int(date_string[5:7]), int(date_string[8:10]))
+        except (ValueError, IndexError):
+            date = dateutil.parser.parse(date_string, dayfirst=True).date()
+
+        if len(cls._parsed_dates) >= cls.max_parsed_dates:
+            cls._parsed_dates.clear()
+        cls._parsed_dates[date_string] = date
+
+        return date
 
     @classmethod
     def zebra_date(cls, date_object):
@@ -126,6 +156,29 @@ class JiraHelper(object):
         """
         return sprint_name.replace(' ', '+')
 
+    @classmethod
+    def parse_date(cls, date_string):
+        """
+        Decode a date as sent by Jira activity streams (2013-05-04T09:15:46.000Z, iso 8601, year first).
+        Other formats are parsed by dateutil (never day first)
+
+        :param date_string:string
+        :return:datetime with its time zone
+        """
+        try:
+            date = datetime.datetime.strptime(date_string[:19], '%Y-%m-%dT%H:%M:%S')
+            # skip the fraction of seconds, if any
+            zone = date_string[19:].lstrip('.0123456789')
+            if zone == 'Z':
+                return date.replace(tzinfo=dateutil.tz.tzutc())
+            if len(zone) in [5, 6] and zone[0] in '+-':
+                offset = int(zone[1:3]) * 3600 + int(zone[-2:]) * 60
+                return date.replace(tzinfo=dateutil.tz.tzoffset(None, offset if zone[0] == '+' else -offset))
+        except ValueError:
+            pass
+
+        return dateutil.parser.parse(date_string)
+
 
 class FileHelper(object):
 
@@ -187,14 +240,53 @@ class MathHelper(object):
     @classmethod
     def get_values_as_percent(cls, values, old_range):
         new_range = (0, 100)
-        ranged = []
+        return [
+            ((value - old_range[0]) * (new_range[1] - new_range[0]) / (old_range[1] - old_range[0])) + new_range[0]
+            for value in values if value is not None
+        ]
+
+    @classmethod
+    def cumulate(cls, values):
+        """
+        Cumulative sums of values
+
+        :param values:iterable of numbers
+        :return:list [values[0], values[0] + values[1], ...]
+        """
+        total = 0
+        sums = []
         for value in values:
-            if value is not None:
-                ranged.append(
-                    ((value - old_range[0]) * (new_range[1] - new_range[0]) / (old_range[1] - old_range[0]))
-                    + new_range[0]
-                )
-        return ranged
+            total += value
+            sums.append(total)
+        return sums
+
+
+class ConcurrencyHelper(object):
+    # callables run in the worker thread before each call, with the ident of the thread which scheduled it
+    # (ie. see lst.fetch.ThreadOutput.init_worker)
+    worker_initializers = []
+
+    @classmethod
+    def map(cls, function, items, workers=1, initializer=None):
+        """
+        Apply function to all items using a bounded pool of threads
+
+        :param function: callable taking a single item
+        :param items: list of items
+        :param workers: int maximum number of concurrent calls
+        :param initializer: callable run in the worker thread before each call (after worker_initializers),
+            with the ident of the calling thread
+        :return: list of results, in the same order as items
+        """
+        items = list(items)
+        workers = min(int(workers), len(items))
+        if workers <= 1:
+            return [function(item) for item in items]
+
+        initializers = cls.worker_initializers + ([] if initializer is None else [initializer])
+        tasks = TaskQueue(workers, initializers)
+
+        return Future.gather([tasks.schedule(function, item) for item in items]).get()
 
 
 class UrlHelper(object):
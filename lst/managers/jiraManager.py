@@ -1,16 +1,39 @@
-import pickle
+import datetime
+import xml.etree.ElementTree as ET
 
 from lst.models.jiraModels import StoryCollection, Story
-from lst.remote import JiraRemote
+from lst.remote import JiraRemote, AsyncJiraRemote
 from lst.processors import CloseDateProcessor
+from lst.concurrency import Future
+from lst.helpers import ConcurrencyHelper, UrlHelper
 
 
 class JiraManager:
     """
     Responsible for interfacing the application with JiraRemote
     """
+    # max number of concurrent requests made to jira (can be overriden in .lst-secret.yml)
+    default_workers = 8
+    # extra minutes queried on incremental syncs (covers requests running while jira is being updated)
+    sync_overlap = 5
+    # xml elements of an <item> read by the parser, with the jira field they come from (requested to jira,
+    # see get_fields) and the method parsing them (see _parse_item). Custom fields come from the configuration
+    item_fields = [
+        ('key', 'key', '_parse_key'),
+        ('title', 'summary', '_parse_title'),
+        ('summary', 'summary', '_parse_summary'),
+        ('status', 'status', '_parse_status'),
+        ('project', 'project', '_parse_project'),
+        ('fixVersion', 'fixVersions', '_parse_fix_version'),
+        ('customfields', None, '_parse_custom_fields'),
+    ]
+    # custom fields holding story points and business value (can be overriden in .lst-secret.yml)
+    default_story_points_field = 'customfield_10040'
+    default_business_value_field = 'customfield_10064'
+
     def __init__(self, app_container):
         self.app_container = app_container
+        self._item_parsers = dict([(tag, getattr(self, method)) for tag, field, method in self.item_fields])
 
     def get_stories_for_sprint_with_end_date(self, sprint):
         """
@@ -20,7 +43,11 @@ class JiraManager:
         :return:StoryCollection
         """
         closed_status_names = sprint.get_closed_status_names()
-        post_processor = CloseDateProcessor(closed_status_names, self)
+        post_processor = CloseDateProcessor(
+            closed_status_names,
+            self,
+            workers=self.app_container.secret.get_jira('workers', self.default_workers)
+        )
 
         return self._get_stories_for_sprint(sprint, post_processor)
 
@@ -52,28 +79,170 @@ class JiraManager:
 
     def get_stories_by_url(self, url, nice_identifier=None, ignored=None, post_processor=None):
         """
-        Get stories by specifying a jira url
+        Get stories by specifying a jira url (see get_stories_by_url_async)
+
+        :param url:string jira url
+        :param nice_identifier:string part of story title which enables to identify "nice to have" stories
+        :param ignored:list list of story ids that should be discarded
+        :param post_processor:JiraStoryPostProcessor last action called on each story after parsing
+        :return:StoryCollection
+        """
+        return self.get_stories_by_url_async(url, nice_identifier, ignored, post_processor).get()
+
+    def get_stories_by_url_async(self, url, nice_identifier=None, ignored=None, post_processor=None):
+        """
+        Non-blocking version of get_stories_by_url. Results bigger than one page (see tempMax) are paginated:
+        the first page gives the total, then all remaining pages are fetched in parallel
+        (concurrency is limited by the jira workers setting)
 
         :param url:string jira url
         :param nice_identifier:string part of story title which enables to identify "nice to have" stories
         :param ignored:list list of story ids that should be discarded
         :param post_processor:JiraStoryPostProcessor last action called on each story after parsing
+        :return:Future resolved with a StoryCollection
+        """
+        remote = self._get_async_jira_remote()
+        url += self._get_field_projection()
+        pager = {}
+
+        def get_page(page_url, pager=None):
+            return self._get_page(remote.get_stream(page_url), nice_identifier, ignored, pager)
+
+        def get_next_pages(first_page):
+            page_starts = self._get_next_page_starts(pager)
+            if len(page_starts) > 0:
+                print 'Fetching %d more pages of Jira stories' % len(page_starts)
+            return Future.gather(
+                [remote.schedule(get_page, self._get_page_url(url, start)) for start in page_starts],
+                lambda pages: [first_page] + pages
+            )
+
+        return remote.schedule(get_page, url, pager) \
+            .then(get_next_pages) \
+            .then(lambda pages: self._merge_pages(pages, post_processor))
+
+    def _merge_pages(self, pages, post_processor=None):
+        """
+        :param pages:list of tuples (list of Story(s), dict warnings), see _get_page
+        :param post_processor:JiraStoryPostProcessor last action called on each story after parsing
         :return:StoryCollection
         """
+        # a story can show up twice if jira was updated while paginating
+        parsed = []
+        ids = set()
+        warnings = {}
+        for page, page_warnings in pages:
+            for story in page:
+                if story.id not in ids:
+                    ids.add(story.id)
+                    parsed.append(story)
+            self._merge_warnings(warnings, page_warnings)
+
+        self._print_warnings(warnings)
+
+        return self._get_collection(parsed, post_processor)
+
+    def get_story_ids_by_url(self, url):
+        """
+        Get the ids of all stories matching a jira url, only asking jira for their key
+
+        :param url:string jira url
+        :return:set of story ids
+        """
         remote = self._get_jira_remote()
-        result = remote.get_data(url)
-        stories = self.parse_stories(
-            result,
-            nice_identifier,
-            ignored,
-            post_processor
+        url += '&field=key'
+        pager = {}
+        ids = [story.id for story in self.iter_stories(remote.get_stream(url), pager=pager, warnings={})]
+
+        pages = ConcurrencyHelper.map(
+            lambda start: [
+                story.id for story in self.iter_stories(remote.get_stream(self._get_page_url(url, start)), warnings={})
+            ],
+            self._get_next_page_starts(pager),
+            self.app_container.secret.get_jira('workers', self.default_workers)
         )
-        # pickle.dump(stories, open("jira_entries.p", "wb"))
-        # stories = pickle.load(open("jira_entries.p", "rb"))
+        for page in pages:
+            ids.extend(page)
 
-        return stories
+        return set(ids)
+
+    def _get_page(self, response, nice_identifier=None, ignored=None, pager=None):
+        """
+        Parse a single page of results. Warnings are kept per page (pages are parsed concurrently)
+
+        :param response:file file-like xml result from remote call
+        :return:tuple (list of Story(s), dict warnings)
+        """
+        warnings = {}
+        stories = list(self.iter_stories(response, nice_identifier, ignored, pager, warnings))
+
+        return stories, warnings
+
+    def _merge_warnings(self, warnings, page_warnings):
+        """
+        :param warnings:dict warnings of all pages so far, updated
+        :param page_warnings:dict warnings of a single page
+        """
+        for key, ids in page_warnings.items():
+            merged = warnings.setdefault(key, [])
+            seen = set(merged)
+            merged.extend([id for id in ids if id not in seen])
+
+    def _get_next_page_starts(self, pager):
+        """
+        Get the start index of all pages following the first one
+
+        :param pager:dict attributes of the first page <issue> element (start, end, total)
+        :return:list of int
+        """
+        try:
+            start = int(pager['start'])
+            end = int(pager['end'])
+            total = int(pager['total'])
+        except (KeyError, ValueError):
+            return []
+
+        if end <= start:
+            return []
+
+        return range(end, total, end - start)
+
+    def _get_page_url(self, url, start):
+        return url + '&pager/start=' + str(start)
+
+    def get_fields(self):
+        """
+        Get the jira fields needed to parse stories
+
+        :return:list of field names
+        """
+        fields = []
+        for tag, field, method in self.item_fields:
+            if field is not None and field not in fields:
+                fields.append(field)
+
+        return fields + list(self.get_custom_fields())
+
+    def get_custom_fields(self):
+        """
+        Get the custom field ids used for story points and business value
+
+        :return:tuple (story points field, business value field)
+        """
+        fields = (
+            self.app_container.secret.get_jira('story_points_field', self.default_story_points_field),
+            self.app_container.secret.get_jira('business_value_field', self.default_business_value_field),
+        )
+        return tuple([f if str(f).startswith('customfield_') else 'customfield_' + str(f) for f in fields])
+
+    def _get_field_projection(self):
+        """Url parameters asking jira to only return the fields needed by the parser"""
+        return ''.join(['&field=' + field for field in self.get_fields()])
 
     def _get_stories_for_sprint(self, sprint, post_processor=None):
+        if self._is_incremental():
+            return self._sync_stories_for_sprint(sprint, post_processor)
+
         url = self._get_url_for_sprint_burnup(sprint)
         return self.get_stories_by_url(url,
                                        nice_identifier=sprint.get_jira_data('nice_identifier'),
@@ -81,12 +250,139 @@ class JiraManager:
                                        post_processor=post_processor
                                        )
 
+    def _is_incremental(self):
+        return self.app_container.sync_store is not None and \
+            self.app_container.secret.get_jira('incremental', False) is True
+
+    def _sync_stories_for_sprint(self, sprint, post_processor=None):
+        """
+        Incremental version of _get_stories_for_sprint: stories are stored locally and only the ones
+        updated since the last sync are fetched again, along with the ids of all the sprint stories
+        (to drop the ones that left the sprint). The post processor only runs on stories whose
+        status changed (or that were never post processed)
+
+        :param sprint:Sprint
+        :param post_processor:JiraStoryProcessor
+        :return:StoryCollection
+        """
+        store = self.app_container.sync_store
+        store_name = 'jira-' + UrlHelper.slugify(unicode(sprint.name))
+        nice_identifier = sprint.get_jira_data('nice_identifier')
+        ignored = sprint.get_jira_data('ignored')
+        # closed statuses are part of the query: stories have to be post processed again when they change
+        closed_statuses = tuple(sorted(sprint.get_closed_statuses().items()))
+        query = (self._get_url_for_sprint_burnup(sprint), nice_identifier, ignored, closed_statuses)
+        now = datetime.datetime.now()
+
+        # a change in the sprint definition requires a full sync
+        stored = store.load(store_name)
+        if stored is None or stored['query'] != query:
+            stored = {'query': query, 'synced_at': None, 'stories': [], 'pending': set(), 'discarded': set()}
+
+        updated_within = None
+        if stored['synced_at'] is not None:
+            updated_within = int((now - stored['synced_at']).total_seconds() / 60) + 1 + self.sync_overlap
+            print 'Fetching Jira stories updated in the last %d minutes' % updated_within
+
+        url = self._get_url_for_sprint_burnup(sprint, updated_within)
+        updated = self.get_stories_by_url(url, nice_identifier=nice_identifier, ignored=ignored)
+
+        stories = stored['stories']
+        pending = stored['pending']
+        discarded = stored['discarded']
+
+        # stories moved to another sprint (or deleted) don't show up as updated: drop the stored stories
+        # that are not part of the sprint anymore
+        if updated_within is not None:
+            current_ids = self.get_story_ids_by_url(self._get_url_for_sprint_burnup(sprint))
+            current_ids.update([story.id for story in updated])
+            stories = [story for story in stories if story.id in current_ids]
+            pending &= current_ids
+            discarded &= current_ids
+
+        # merge updated stories, keeping the close date of stories whose status didn't change
+        positions = dict([(story.id, index) for index, story in enumerate(stories)])
+        for story in updated:
+            if story.id not in positions:
+                positions[story.id] = len(stories)
+                stories.append(story)
+                pending.add(story.id)
+                continue
+
+            previous = stories[positions[story.id]]
+            if previous.status == story.status:
+                story.close_date = previous.close_date
+            else:
+                pending.add(story.id)
+            stories[positions[story.id]] = story
+
+        if post_processor is not None:
+            processed = post_processor.post_process_all([story for story in stories if story.id in pending])
+            discarded = (discarded - pending) | (pending - set([story.id for story in processed]))
+            pending = set()
+
+        store.save(store_name, {
+            'query': query,
+            'synced_at': now,
+            'stories': stories,
+            'pending': pending,
+            'discarded': discarded,
+        })
+
+        collection = StoryCollection()
+        if post_processor is None:
+            collection.extend(stories)
+        else:
+            collection.extend([story for story in stories if story.id not in discarded])
+
+        return collection
+
     def get_story_close_date(self, id, closed_status_names):
         return self._get_jira_remote().get_story_close_date(id, closed_status_names)
 
+    def get_stories_close_date(self, ids, closed_status_names, workers=1):
+        """
+        Get close dates for multiple stories, using as few activity stream requests as possible
+
+        :param ids:list of story ids
+        :param closed_status_names:list of status names considered as closed
+        :param workers:int max number of concurrent requests
+        :return:dict {story_id: close date}
+        """
+        remote = self._get_jira_remote()
+        results = ConcurrencyHelper.map(
+            lambda chunk: remote.get_stories_close_date(chunk, closed_status_names),
+            remote.get_activity_chunks(ids),
+            workers
+        )
+
+        close_dates = {}
+        for result in results:
+            close_dates.update(result)
+
+        return close_dates
+
+    def get_story_close_date_async(self, id, closed_status_names):
+        """
+        Non-blocking version of get_story_close_date
+
+        :return:Future resolved with the story close date (None if not found)
+        """
+        return self._get_async_jira_remote().get_story_close_date_async(id, closed_status_names)
+
+    def get_stories_close_date_async(self, ids, closed_status_names):
+        """
+        Non-blocking version of get_stories_close_date (concurrency is limited by the jira workers setting)
+
+        :param ids:list of story ids
+        :param closed_status_names:list of status names considered as closed
+        :return:Future resolved with a dict {story_id: close date}
+        """
+        return self._get_async_jira_remote().get_stories_close_date_async(ids, closed_status_names)
+
     def parse_stories(
             self,
-            response_xml,
+            response,
             nice_identifier=None,
             ignored=None,
             post_processor=None
@@ -94,75 +390,218 @@ class JiraManager:
         """
         Parse xml result into list of stories
 
-        :param response_xml:xml xml result from remote call
+        :param response:file file-like xml result from remote call
         :param nice_identifier:string story title substring
         :param ignored:list list of story ids to be ignored
         :param post_processor:JiraStoryProcessor Subclass of JiraStoryProcessor
         :return:StoryCollection list of Story(s)
         """
+        parsed = list(self.iter_stories(response, nice_identifier, ignored))
+
+        return self._get_collection(parsed, post_processor)
+
+    def _get_collection(self, parsed, post_processor=None):
+        """
+        :param parsed:list of Story(s)
+        :param post_processor:JiraStoryProcessor Subclass of JiraStoryProcessor
+        :return:StoryCollection
+        """
         stories = StoryCollection()
 
-        xml_stories = response_xml[0].findall('item')
+        # post processor (run on all stories at once so that it can parallelize its work)
+        if post_processor is not None:
+            parsed = post_processor.post_process_all(parsed)
+
+        stories.extend(parsed)
+
+        return stories
 
-        for s in xml_stories:
-            story = Story()
-            story.id = s.find('key').text
+    def iter_stories(self, response, nice_identifier=None, ignored=None, pager=None, warnings=None):
+        """
+        Parse xml result while it is being read, yielding stories one by one.
+        Each <item> element is freed once parsed so that memory doesn't grow with the result size
 
-            # check if the story should be ignored (see ignore in config)
-            if ignored is not None and story.id in ignored:
-                print 'story {} is ignored'.format(story.id)
+        :param response:file file-like xml result from remote call
+        :param nice_identifier:string story title substring
+        :param ignored:list list of story ids to be ignored
+        :param pager:dict if given, filled with the pagination attributes of the result (start, end, total)
+        :param warnings:dict if given, filled with the ids of ignored and incomplete stories (see _print_warnings),
+            otherwise they are printed once the whole result is parsed
+        :return:generator of Story(s)
+        """
+        custom_fields = self._get_custom_field_attributes()
+        ignored = None if not ignored else set(ignored)
+        print_warnings = warnings is None
+        warnings = {} if warnings is None else warnings
+
+        # items are the children of rss > channel
+        item_depth = 3
+        depth = 0
+        channel = None
+
+        for event, element in ET.iterparse(response, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == item_depth - 1:
+                    channel = element
                 continue
 
-            # check if the story is a 'nice to have'
-            if nice_identifier is not None:
-                story.is_nice = s.find('title').text.find(nice_identifier) != -1
-
-            # status
-            story.status = int(s.find('status').get('id'))
-
-            # business value
-            try:
-                story.business_value = float(
-                    s.find(
-                        './customfields/customfield/[@id="customfield_10064"]/customfieldvalues/customfieldvalue'
-                    ).text
-                )
-            except AttributeError:
-                print 'Story {} has no business value defined, 0 taken as default'.format(story.id)
-
-            # story points
-            try:
-                story.story_points = float(
-                    s.find(
-                        './customfields/customfield/[@id="customfield_10040"]/customfieldvalues/customfieldvalue'
-                    ).text
-                )
-            except AttributeError:
-                print 'Story {} has no story points defined, 0 taken as default'.format(story.id)
-
-            # post processor
-            if post_processor is not None:
-                story = post_processor.post_process(story)
-                if story is None:
-                    continue
-
-            # other attributes
-            if s.find('project') is not None and s.find('project').get('id') is not None:
-                story.project_id = s.find('project').get('id')
-                story.project_name = s.find('project').text
-            if s.find('fixVersion') is not None:
-                story.sprint_name = s.find('fixVersion').text
-
-            stories.append(story)
+            depth -= 1
+            if depth != item_depth - 1:
+                continue
 
-        return stories
+            if element.tag == 'issue' and pager is not None:
+                pager.update(element.attrib)
+            if element.tag != 'item':
+                continue
+
+            story = self._parse_item(element, nice_identifier, ignored, custom_fields, warnings)
+
+            element.clear()
+            channel.remove(element)
+
+            if story is not None:
+                yield story
+
+        if print_warnings:
+            self._print_warnings(warnings)
+
+    def _get_custom_field_attributes(self):
+        """
+        :return:dict {custom field id: Story attribute}
+        """
+        story_points_field, business_value_field = self.get_custom_fields()
+        return {
+            story_points_field: 'story_points',
+            business_value_field: 'business_value',
+        }
+
+    def _parse_item(self, s, nice_identifier=None, ignored=None, custom_fields=None, warnings=None):
+        """
+        Parse a single xml <item> to a Story, in a single walk over its children.
+        Each child is parsed by the method given for its tag in item_fields
+
+        :param s:Element xml item
+        :param nice_identifier:string story title substring
+        :param ignored:set story ids to be ignored
+        :param custom_fields:dict custom field ids mapped to story attributes (see _get_custom_field_attributes)
+        :param warnings:dict filled with the ids of ignored and incomplete stories
+        :return:Story|None None if the story is ignored
+        """
+        custom_fields = self._get_custom_field_attributes() if custom_fields is None else custom_fields
+        warnings = {} if warnings is None else warnings
+
+        story = Story()
+        # values only needed while parsing the item
+        item = {'title': None, 'summary': None, 'custom_fields': custom_fields, 'missing': set(custom_fields.values())}
+
+        parsers = self._item_parsers
+        for child in s:
+            parser = parsers.get(child.tag)
+            if parser is not None:
+                parser(story, child, item)
+
+        # check if the story should be ignored (see ignore in config)
+        if ignored is not None and story.id in ignored:
+            warnings.setdefault('ignored', []).append(story.id)
+            return None
+
+        # check if the story is a 'nice to have'
+        if nice_identifier is not None:
+            title = item['title'] if item['title'] is not None else item['summary']
+            story.is_nice = title is not None and title.find(nice_identifier) != -1
+
+        for attribute in sorted(item['missing']):
+            warnings.setdefault(attribute, []).append(story.id)
+
+        return story
+
+    def _parse_key(self, story, element, item):
+        story.id = element.text
+
+    def _parse_title(self, story, element, item):
+        item['title'] = element.text
+
+    def _parse_summary(self, story, element, item):
+        item['summary'] = element.text
+
+    def _parse_status(self, story, element, item):
+        story.status = int(element.get('id'))
+
+    def _parse_project(self, story, element, item):
+        if element.get('id') is not None:
+            story.project_id = element.get('id')
+            story.project_name = element.text
+
+    def _parse_fix_version(self, story, element, item):
+        if story.sprint_name is None:
+            story.sprint_name = element.text
+
+    def _parse_custom_fields(self, story, element, item):
+        for field in element:
+            attribute = item['custom_fields'].get(field.get('id'))
+            if attribute is None:
+                continue
+            value = field.find('customfieldvalues/customfieldvalue')
+            if value is not None and value.text is not None:
+                setattr(story, attribute, float(value.text))
+                item['missing'].discard(attribute)
+
+    def _print_warnings(self, warnings):
+        """
+        Print a single summary line about ignored and incomplete stories
+
+        :param warnings:dict {'ignored'|Story attribute: list of story ids}
+        """
+        messages = [
+            ('ignored', '%d ignored (%s)'),
+            ('story_points', '%d without story points (%s)'),
+            ('business_value', '%d without business value (%s)'),
+        ]
+        parts = []
+        for key, message in messages:
+            ids = warnings.get(key, [])
+            if len(ids) > 0:
+                parts.append(message % (len(ids), self._format_ids(ids)))
+
+        if len(parts) == 0:
+            return
+
+        missing = len(warnings.get('story_points', [])) + len(warnings.get('business_value', []))
+        print 'Stories: %s%s' % (', '.join(parts), '. Missing values are taken as 0' if missing > 0 else '')
+
+    def _format_ids(self, ids, limit=10):
+        if len(ids) <= limit:
+            return ', '.join(ids)
+        return '%s and %d more' % (', '.join(ids[:limit]), len(ids) - limit)
 
     def _get_jira_remote(self):
-        return JiraRemote(
+        return JiraRemote.get_shared_instance(
             self.app_container.secret.get_jira('url'),
             self.app_container.secret.get_jira('username'),
             self.app_container.secret.get_jira('password')
         )
 
-    def _get_url_for_sprint_burnup(self, sprint):
-        return "/sr/jira.issueviews:searchrequest-xml/temp/SearchRequest.xml?jqlQuery=project+%3D+'" + str(sprint.get_jira_data('project_id')) + "'+and+fixVersion+%3D+'" + sprint.get_jira_data('sprint_name') + "'&tempMax=1000"
+    def _get_async_jira_remote(self):
+        remote = AsyncJiraRemote.get_shared_instance(
+            self.app_container.secret.get_jira('url'),
+            self.app_container.secret.get_jira('username'),
+            self.app_container.secret.get_jira('password')
+        )
+        remote.set_max_concurrency(self.app_container.secret.get_jira('workers', self.default_workers))
+
+        return remote
+
+    def _get_url_for_sprint_burnup(self, sprint, updated_within=None):
+        """
+        Get jira url to retrieve the sprint stories
+
+        :param sprint:Sprint
+        :param updated_within:int only get stories updated in the last x minutes (optional)
+        :return:string jira url
+        """
+        jql = "project+%3D+'" + str(sprint.get_jira_data('project_id')) + "'+and+fixVersion+%3D+'" + sprint.get_jira_data('sprint_name') + "'"
+        if updated_within is not None:
+            jql += "+and+updated+%3E%3D+'-" + str(updated_within) + "m'"
+
+        return "/sr/jira.issueviews:searchrequest-xml/temp/SearchRequest.xml?jqlQuery=" + jql + "&tempMax=1000"
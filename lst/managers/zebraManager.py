@@ -1,19 +1,27 @@
-import dateutil.parser
-import pickle
+import datetime
 
-from lst.remote import ZebraRemote
-from lst.helpers import ZebraHelper
-from lst.models.zebraModels import TimeSheetCollection, TimeSheet
+from lst.remote import ZebraRemote, AsyncZebraRemote
+from lst.helpers import ZebraHelper, UrlHelper
+from lst.models.zebraModels import TimeSheetCollection, TimeSheet, UserDirectory
+from lst.stream import JsonArrayStream
 
 
 class ZebraManager:
     """
     Responsible for interfacing the application with ZebraRemote
     """
+    # nb of past days fetched again on incremental syncs (can be overriden in .lst-secret.yml)
+    default_sync_window = 3
+    # nb of seconds the stored user directory is used before being downloaded again (can be overriden in .lst-secret.yml)
+    default_users_ttl = 24 * 3600
+
     def __init__(self, app_container):
         self.app_container = app_container
 
     def get_timesheets_for_sprint(self, sprint):
+        if self._is_incremental():
+            return self._sync_timesheets_for_sprint(sprint)
+
         report_url = self._get_url_for_activities_by_sprint(sprint)
 
         return self.get_timesheets_by_url(report_url)
@@ -36,13 +44,132 @@ class ZebraManager:
 
         return users
 
+    def get_user_directory(self):
+        """
+        Get all zebra users, indexed for fast lookups. The directory is stored locally (see sync_store)
+        and only downloaded again once expired (see users_ttl)
+
+        :return:UserDirectory
+        """
+        store = self.app_container.sync_store
+        ttl = self.app_container.secret.get_zebra('users_ttl', self.default_users_ttl)
+
+        if store is not None:
+            directory = store.load('zebra-users')
+            if directory is not None and not directory.is_expired(ttl):
+                return directory
+
+        directory = UserDirectory(self.get_all_users())
+        if store is not None and len(directory) > 0:
+            store.save('zebra-users', directory)
+
+        return directory
+
+    def get_all_users_async(self):
+        """
+        Non-blocking version of get_all_users
+
+        :return:Future resolved with the list of users
+        """
+        return self._get_async_zebra_remote().get_data_async('user/.json').then(self._parse_users)
+
     def get_timesheets_by_url(self, url):
         remote = self._get_zebra_remote()
-        zebra_json_result = remote.get_data(url)
-        timesheets = self._parse_timesheets(zebra_json_result)
+        response = remote.get_stream(url)
+        timesheets = self._parse_timesheet_stream(response)
 
         return timesheets
 
+    def get_timesheets_by_url_async(self, url):
+        """
+        Non-blocking version of get_timesheets_by_url (the report is parsed while it is downloaded)
+
+        :param url:string
+        :return:Future resolved with a TimeSheetCollection
+        """
+        remote = self._get_async_zebra_remote()
+        return remote.schedule(lambda: self._parse_timesheet_stream(remote.get_stream(url)))
+
+    def _is_incremental(self):
+        return self.app_container.sync_store is not None and \
+            self.app_container.secret.get_zebra('incremental', False) is True
+
+    def _sync_timesheets_for_sprint(self, sprint):
+        """
+        Incremental version of get_timesheets_for_sprint: entries are stored locally and only
+        the last days (see sync_window) are fetched again from Zebra
+
+        :param sprint:Sprint
+        :return:TimeSheetCollection
+        """
+        store = self.app_container.sync_store
+        store_name = 'zebra-' + UrlHelper.slugify(unicode(sprint.name))
+        sprint_url = self._get_url_for_activities_by_sprint(sprint)
+        start_date = sprint.get_zebra_data('start_date')
+        end_date = sprint.get_zebra_data('end_date')
+        today = datetime.date.today()
+
+        # a change in the sprint definition (dates, users...) requires a full sync
+        stored = store.load(store_name)
+        if stored is None or stored['url'] != sprint_url:
+            stored = {'url': sprint_url, 'synced_on': None, 'entries': []}
+
+        fetch_start = start_date
+        if stored['synced_on'] is not None:
+            window = datetime.timedelta(days=self.app_container.secret.get_zebra('sync_window', self.default_sync_window))
+            fetch_start = max(start_date, min(stored['synced_on'], today) - window)
+
+        entries = [e for e in stored['entries'] if self._get_entry_date(e) < fetch_start]
+        if fetch_start <= end_date:
+            print 'Fetching Zebra entries from %s (older entries were already synchronized)' % fetch_start
+            url = self._get_zebra_url_for_activities(
+                fetch_start,
+                end_date,
+                sprint.get_zebra_data('client_id'),
+                sprint.get_zebra_data('users'),
+                sprint.get_zebra_data('activities')
+            )
+            fetched = self._get_report_entries(url)
+
+            # an entry can have moved to another day: the fetched version wins
+            fetched_ids = set([e['tid'] for e in fetched])
+            entries = [e for e in entries if e['tid'] not in fetched_ids] + fetched
+
+        store.save(store_name, {'url': sprint_url, 'synced_on': today, 'entries': entries})
+
+        return self._parse_entries(entries)
+
+    def _get_report_entries(self, url):
+        """
+        Get the raw timesheet entries of a Zebra report (without the total rows)
+
+        :param url:string Zebra report url
+        :return:list of json nodes
+        """
+        response = self._get_zebra_remote().get_stream(url)
+
+        return list(self._iter_report_entries(response))
+
+    def _iter_report_entries(self, response):
+        """
+        Iterate over the raw timesheet entries of a Zebra report while it is being read (without the total rows).
+        The response is closed once iterated over
+
+        :param response:file file-like json response
+        :return:generator of json nodes
+        """
+        try:
+            # entries are in command > reports > report
+            for entry in JsonArrayStream(response, 'report'):
+                # zebra last entries are totals, and dont have a tid
+                if entry['tid'] != '':
+                    yield entry
+        finally:
+            response.close()
+
+    def _get_entry_date(self, entry):
+        return ZebraHelper.parse_date(entry['date'])
+
     def _parse_users(self, response_json):
         users = response_json['command']['users']['user']
 
@@ -64,15 +191,35 @@ class ZebraManager:
             print 'No entries found in Zebra'
             return zebra_entries
 
-        for entry in entries:
-            # zebra last entries are totals, and dont have a tid
-            if entry['tid'] == '':
-                continue
+        # zebra last entries are totals, and dont have a tid
+        return self._parse_entries([entry for entry in entries if entry['tid'] != ''])
+
+    def _parse_timesheet_stream(self, response):
+        """
+        Parse json response received from ZebraRemote to application data, one entry at a time
+
+        :param response:file file-like json response
+        :return:TimeSheetCollection list of TimeSheet(s)
+        """
+        timesheets = TimeSheetCollection()
+        for entry in self._iter_report_entries(response):
+            timesheets.append(self._parse_entry(entry))
+
+        if len(timesheets) == 0:
+            print 'No entries found in Zebra'
+        else:
+            print 'Parsed %d entries found in Zebra' % len(timesheets)
 
-            zebra_entry = self._parse_entry(entry)
-            zebra_entries.append(zebra_entry)
+        return timesheets
 
-        return TimeSheetCollection(zebra_entries)
+    def _parse_entries(self, entries):
+        """
+        Parse timesheet json nodes to application data
+
+        :param entries:list of json nodes
+        :return:TimeSheetCollection list of TimeSheet(s)
+        """
+        return TimeSheetCollection([self._parse_entry(entry) for entry in entries])
 
     def _parse_entry(self, entry):
         """
@@ -82,17 +229,25 @@ class ZebraManager:
         :return:TimeSheet
         """
         timesheet = TimeSheet()
-        timesheet.username = str(entry['username'].encode('utf-8'))
+        # usernames and projects are repeated in every entry, a single copy of each is kept
+        timesheet.username = intern(str(entry['username'].encode('utf-8')))
         timesheet.time = float(entry['time'])
-        timesheet.project = (entry['project'].encode('utf-8'))
-        timesheet.date = dateutil.parser.parse(entry['date'], dayfirst=True)
+        timesheet.project = intern(entry['project'].encode('utf-8'))
+        timesheet.date = ZebraHelper.parse_date(entry['date'])
         timesheet.id = int(entry['tid'])
         timesheet.description = str(entry['description'].encode('utf-8'))
 
         return timesheet
 
     def _get_zebra_remote(self):
-        return ZebraRemote(
+        return ZebraRemote.get_shared_instance(
+            self.app_container.secret.get_zebra('url'),
+            self.app_container.secret.get_zebra('username'),
+            self.app_container.secret.get_zebra('password')
+        )
+
+    def _get_async_zebra_remote(self):
+        return AsyncZebraRemote.get_shared_instance(
             self.app_container.secret.get_zebra('url'),
             self.app_container.secret.get_zebra('username'),
             self.app_container.secret.get_zebra('password')
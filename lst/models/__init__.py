@@ -9,6 +9,7 @@ class AppContainer(object):
     secret = None
     dev_mode = False
     user_args = None
+    sync_store = None  # SyncStore, None if incremental syncs are disabled
     pass
 
 
@@ -1,4 +1,9 @@
-class Story:
+class Story(object):
+    __slots__ = (
+        'story_points', 'business_value', 'id', 'status', 'close_date', 'is_nice', 'is_ignored',
+        'project_id', 'project_name', 'sprint_name'
+    )
+
     # status codes considered as closed
     closed_status_ids = set()
 
@@ -22,27 +27,125 @@ class Story:
 
 
 class StoryCollection(list):
-    def __init__(self):
-        list.__init__([])
+    """
+    List of stories keeping its committed and achieved totals (overall and per close day) up to date
+    as stories are added, replaced or removed, so that reading them doesn't go through the stories again.
+
+    Stories changed in place once added must be passed to refresh
+    """
+    def __init__(self, stories=None):
+        """
+        :param stories:list of Story(s)
+        """
+        list.__init__(self)
         self.total_story_points = 0
         self.total_business_value = 0
         self.achieved_story_points = 0
         self.achieved_business_value = 0
         self.achieved_by_date = {}
+        # nb of closed stories per close day (days without stories anymore are removed from achieved_by_date)
+        self._closed_by_date = {}
+        # what each story adds to the totals (see _get_contribution), in the same order as the stories
+        self._contributions = []
+        # closed statuses the totals were computed with (see _check_closed_status_ids)
+        self._closed_status_ids = frozenset(Story.closed_status_ids)
+
+        if stories is not None:
+            self.extend(stories)
+
+    def __reduce__(self):
+        # totals are computed again when unpickled
+        return self.__class__, (list(self),)
+
+    def append(self, story):
+        contribution = self._get_contribution(story)
+        list.append(self, story)
+        self._contributions.append(contribution)
+        self._apply(contribution, 1)
+
+    def extend(self, stories):
+        for story in stories:
+            self.append(story)
+
+    def __iadd__(self, stories):
+        self.extend(stories)
+        return self
+
+    def insert(self, index, story):
+        contribution = self._get_contribution(story)
+        list.insert(self, index, story)
+        self._contributions.insert(index, contribution)
+        self._apply(contribution, 1)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = list(value)
+            contributions = [self._get_contribution(story) for story in value]
+            removed = self._contributions[index]
+            list.__setitem__(self, index, value)
+            self._contributions[index] = contributions
+        else:
+            contributions = [self._get_contribution(value)]
+            removed = [self._contributions[index]]
+            list.__setitem__(self, index, value)
+            self._contributions[index] = contributions[0]
+
+        for contribution in removed:
+            self._apply(contribution, -1)
+        for contribution in contributions:
+            self._apply(contribution, 1)
+
+    def __setslice__(self, i, j, stories):
+        self.__setitem__(slice(i, j), stories)
+
+    def __delitem__(self, index):
+        removed = self._contributions[index] if isinstance(index, slice) else [self._contributions[index]]
+        list.__delitem__(self, index)
+        del self._contributions[index]
+
+        for contribution in removed:
+            self._apply(contribution, -1)
+
+    def __delslice__(self, i, j):
+        self.__delitem__(slice(i, j))
+
+    def pop(self, index=-1):
+        story = self[index]
+        del self[index]
+        return story
+
+    def remove(self, story):
+        del self[self.index(story)]
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self.refresh()
+
+    def reverse(self):
+        list.reverse(self)
+        self._contributions.reverse()
+
+    def refresh(self, story=None):
+        """
+        Count a story again after it was changed in place (ie. its status or close date)
+
+        :param story:Story None to count all stories again
+        """
+        if story is None:
+            self._count_all()
+            return
+
+        for index, s in enumerate(self):
+            if s is story:
+                self._apply(self._contributions[index], -1)
+                self._contributions[index] = self._get_contribution(story)
+                self._apply(self._contributions[index], 1)
 
     def close_story_filter(self, x):
         return x.is_over() and x.close_date is not None
 
     def get_achievement_by_day(self):
-        if len(self.achieved_by_date) == 0:
-            for story in filter(self.close_story_filter, self):
-                day = story.get_close_day()
-                if day in self.achieved_by_date:
-                    self.achieved_by_date[day]['sp'] += story.story_points
-                    self.achieved_by_date[day]['bv'] += story.business_value
-                else:
-                    o = {'sp': story.story_points, 'bv': story.business_value}
-                    self.achieved_by_date[day] = o
+        self._check_closed_status_ids()
         return self.achieved_by_date
 
     def get_achievement_for_day(self, day):
@@ -59,29 +162,64 @@ class StoryCollection(list):
             return self.get_commited_story_points()
 
     def get_commited_story_points(self):
-        total = 0
-        for s in self:
-            if s.is_nice:
-                continue
-            total += s.story_points
-        return total
+        return self.total_story_points
 
     def get_achieved_story_points(self):
-        for s in self:
-            if s.is_over():
-                self.achieved_story_points += s.story_points
+        self._check_closed_status_ids()
         return self.achieved_story_points
 
     def get_commited_business_value(self):
-        total = 0
-        for s in self:
-            if s.is_nice:
-                continue
-            total += s.business_value
-        return total
+        return self.total_business_value
 
     def get_achieved_business_value(self):
-        for s in self:
-            if s.is_over():
-                self.achieved_business_value += s.business_value
+        self._check_closed_status_ids()
         return self.achieved_business_value
+
+    def _get_contribution(self, story):
+        """
+        :param story:Story
+        :return:tuple (committed sp, committed bv, achieved sp, achieved bv, close day or None)
+        """
+        committed = (0, 0) if story.is_nice else (story.story_points, story.business_value)
+        achieved = (story.story_points, story.business_value) if story.is_over() else (0, 0)
+        day = story.get_close_day() if self.close_story_filter(story) else None
+        return committed + achieved + (day,)
+
+    def _apply(self, contribution, sign):
+        """
+        Add (sign 1) or remove (sign -1) a story contribution to the totals
+        """
+        committed_sp, committed_bv, achieved_sp, achieved_bv, day = contribution
+        self.total_story_points += sign * committed_sp
+        self.total_business_value += sign * committed_bv
+        self.achieved_story_points += sign * achieved_sp
+        self.achieved_business_value += sign * achieved_bv
+
+        if day is None:
+            return
+        self._closed_by_date[day] = self._closed_by_date.get(day, 0) + sign
+        if self._closed_by_date[day] == 0:
+            del self._closed_by_date[day]
+            del self.achieved_by_date[day]
+        elif day in self.achieved_by_date:
+            self.achieved_by_date[day]['sp'] += sign * achieved_sp
+            self.achieved_by_date[day]['bv'] += sign * achieved_bv
+        else:
+            self.achieved_by_date[day] = {'sp': achieved_sp, 'bv': achieved_bv}
+
+    def _count_all(self):
+        self.total_story_points = 0
+        self.total_business_value = 0
+        self.achieved_story_points = 0
+        self.achieved_business_value = 0
+        self.achieved_by_date = {}
+        self._closed_by_date = {}
+        self._closed_status_ids = frozenset(Story.closed_status_ids)
+        self._contributions = [self._get_contribution(story) for story in self]
+        for contribution in self._contributions:
+            self._apply(contribution, 1)
+
+    def _check_closed_status_ids(self):
+        # which stories are achieved depends on the closed statuses, which can be changed after stories were added
+        if frozenset(Story.closed_status_ids) != self._closed_status_ids:
+            self._count_all()
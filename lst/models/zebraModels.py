@@ -1,52 +1,178 @@
+import array
+import bisect
 import collections
+import datetime
+import itertools
+import time
 
 
-class TimeSheet:
+class TimeSheet(object):
+    """
+    A Zebra entry. There can be millions of them, so instances have no __dict__
+    and the date is stored as a day ordinal (see the date property)
+    """
+    __slots__ = ('username', 'time', 'ordinal', 'project', 'id', 'description')
+
+    # readable dates by ordinal, shared by all timesheets of the same day
+    _readable_dates = {}
+
     def __init__(self):
         self.username = None
         self.time = 0
-        self.date = None
+        self.ordinal = 0
         self.project = None
         self.id = 0
         self.description = None
 
+    @property
+    def date(self):
+        """
+        :return:datetime.date|None
+        """
+        return None if self.ordinal == 0 else datetime.date.fromordinal(self.ordinal)
+
+    @date.setter
+    def date(self, date):
+        """
+        :param date:datetime.date|datetime.datetime|None (time of day is dropped)
+        """
+        self.ordinal = 0 if date is None else date.toordinal()
+
     def readable_date(self):
-        return self.date.strftime('%Y-%m-%d')
+        return TimeSheet.get_readable_date(self.ordinal)
 
+    @staticmethod
+    def get_readable_date(ordinal):
+        """
+        :param ordinal:int day ordinal
+        :return:string 2012-07-31
+        """
+        readable_date = TimeSheet._readable_dates.get(ordinal)
+        if readable_date is None:
+            readable_date = datetime.date.fromordinal(ordinal).strftime('%Y-%m-%d')
+            TimeSheet._readable_dates[ordinal] = readable_date
+        return readable_date
 
-class TimeSheetCollection(list):
-    def group_by_day(self):
+
+class TimeSheetCollection(object):
+    """
+    Zebra timesheets stored column by column: one array per numeric attribute, usernames and projects
+    encoded as codes (see users and projects) and all descriptions in a single character table.
+    Groupings are single passes over the columns.
+
+    The list api still works: items are TimeSheet views built on access (changing them doesn't change the collection)
+    """
+    def __init__(self, timesheets=None):
         """
-        Group zebra timesheets by date
-        :rtype : collections.OrderedDict
-        :return: orderedDict of ZebraDay(s)
+        :param timesheets:list of TimeSheet(s)
         """
-        zebra_days = collections.OrderedDict()
+        self.ordinals = array.array('i')
+        self.times = array.array('d')
+        self.ids = array.array('l')
+        self.user_codes = array.array('i')
+        self.project_codes = array.array('i')
+        # descriptions are stored one after the other, description n ends at description_ends[n]
+        self.descriptions = array.array('c')
+        self.description_ends = array.array('l')
 
-        for timesheet in self:
-            readable_date = timesheet.readable_date()
+        # code => value, and value => code
+        self.users = []
+        self.projects = []
+        self._user_codes = {}
+        self._project_codes = {}
 
-            zebra_day = zebra_days.get(readable_date, ZebraDay())
-            zebra_day.add_entry(timesheet)
-            zebra_days[readable_date] = zebra_day
+        if timesheets is not None:
+            self.extend(timesheets)
 
-        return zebra_days
+    def add(self, username, time, ordinal, project, id, description):
+        """
+        Add a timesheet without building a TimeSheet object
 
-    def group_by_project(self):
+        :param username:string
+        :param time:float
+        :param ordinal:int day ordinal (see datetime.date.toordinal)
+        :param project:string
+        :param id:int
+        :param description:string
         """
-        Group zebra timesheets by project id
-        :rtype : dict
-        :return: dictionary of projects (key=project name, values=list of timesheets)
+        self.ordinals.append(ordinal)
+        self.times.append(time)
+        self.ids.append(id)
+        self.user_codes.append(self._encode(username, self.users, self._user_codes))
+        self.project_codes.append(self._encode(project, self.projects, self._project_codes))
+        self.descriptions.fromstring(description or '')
+        self.description_ends.append(len(self.descriptions))
+
+    def append(self, timesheet):
+        self.add(
+            timesheet.username,
+            timesheet.time,
+            timesheet.ordinal,
+            timesheet.project,
+            timesheet.id,
+            timesheet.description
+        )
+
+    def extend(self, timesheets):
+        for timesheet in timesheets:
+            self.append(timesheet)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TimeSheetCollection([self[i] for i in xrange(*index.indices(len(self)))])
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('timesheet index out of range')
+
+        return self._get_timesheet(index, self.get_description(index))
+
+    def __iter__(self):
+        table = self.descriptions.tostring()
+        start = 0
+        for index, end in enumerate(self.description_ends):
+            yield self._get_timesheet(index, table[start:end])
+            start = end
+
+    def get_description(self, index):
+        start = 0 if index == 0 else self.description_ends[index - 1]
+        return self.descriptions[start:self.description_ends[index]].tostring()
+
+    def iter_descriptions(self):
+        table = self.descriptions.tostring()
+        start = 0
+        for end in self.description_ends:
+            yield table[start:end]
+            start = end
+
+    def get_index(self, story_regex=None):
         """
-        projects = {}
+        Index the timesheets by day, user, project and story (each grouping is computed when first used)
 
-        for timesheet in self:
-            if timesheet.project not in projects:
-                projects[timesheet.project] = []
+        :param story_regex:re regular expression to identify story id from timesheet comment, None to skip stories
+        :return:TimeSheetIndex
+        """
+        return TimeSheetIndex(self, story_regex)
 
-            projects[timesheet.project].append(timesheet)
+    def group_by_day(self):
+        """
+        Group zebra timesheets by date
+        :rtype : collections.OrderedDict
+        :return: orderedDict of ZebraDay(s)
+        """
+        return self.get_index().get_days()
 
-        return projects
+    def group_by_project(self):
+        """
+        Group zebra timesheets by project id
+        :rtype : collections.OrderedDict
+        :return: dictionary of projects (key=project name, values=TimeSheetView of the project timesheets)
+        """
+        return self.get_index().get_projects()
 
     def group_by_story_id(self, regex):
         """
@@ -54,31 +180,266 @@ class TimeSheetCollection(list):
 
         :param regex:re regular expression to identify story id from timesheet comment
         """
+        # descriptions are often repeated (same story, same task): hours are summed per description first,
+        # so that each distinct description is only matched once
+        hours_per_description = {}
+        for description, time in itertools.izip(self.iter_descriptions(), self.times):
+            hours_per_description[description] = hours_per_description.get(description, 0) + time
+
         stories = {}
+        for description, hours in hours_per_description.iteritems():
+            story_id = 'other' if regex.match(description) is None else str(regex.findall(description)[0])
+            stories[story_id] = stories.get(story_id, 0) + hours
+
+        return stories
+
+    def _get_timesheet(self, index, description):
+        timesheet = TimeSheet()
+        timesheet.username = self.users[self.user_codes[index]]
+        timesheet.time = self.times[index]
+        timesheet.ordinal = self.ordinals[index]
+        timesheet.project = self.projects[self.project_codes[index]]
+        timesheet.id = self.ids[index]
+        timesheet.description = description
+        return timesheet
+
+    def _encode(self, value, values, codes):
+        code = codes.get(value)
+        if code is None:
+            code = len(values)
+            values.append(value)
+            codes[value] = code
+        return code
+
+
+class TimeSheetView(object):
+    """
+    Timesheets of a TimeSheetCollection at given positions (ie. a group), TimeSheet objects are built on access
+    """
+    __slots__ = ('collection', 'positions')
+
+    def __init__(self, collection, positions):
+        """
+        :param collection:TimeSheetCollection
+        :param positions:array positions of the timesheets in the collection
+        """
+        self.collection = collection
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TimeSheetView(self.collection, self.positions[index])
+        return self.collection[self.positions[index]]
+
+    def __iter__(self):
+        for position in self.positions:
+            yield self.collection[position]
+
+
+class TimeSheetIndex(object):
+    """
+    Hours of a TimeSheetCollection grouped by day, user, project and story.
+    Each kind of grouping is computed in a single pass, the first time one of its attributes is used
+    (ie. grouping by project doesn't decode days nor match stories).
+    Days are readable dates (2012-07-31), groups are in order of first appearance
+    """
+    def __init__(self, collection, story_regex=None):
+        """
+        :param collection:TimeSheetCollection
+        :param story_regex:re regular expression to identify story id from timesheet comment, None to skip stories
+        """
+        self.collection = collection
+        self.story_regex = story_regex
+
+        self._days = None  # tuple (hours_per_day, hours_per_user_per_day, positions_per_day)
+        self._projects = None  # tuple (hours_per_project, positions_per_project)
+        self._stories = None  # tuple (hours_per_story, hours_per_story_per_day)
+
+    @property
+    def hours_per_day(self):
+        return self._get_days_groups()[0]
+
+    @property
+    def hours_per_user_per_day(self):
+        """{day: {username: hours}}"""
+        return self._get_days_groups()[1]
+
+    @property
+    def positions_per_day(self):
+        """{day: array of positions in the collection}"""
+        return self._get_days_groups()[2]
+
+    @property
+    def hours_per_project(self):
+        return self._get_projects_groups()[0]
 
-        for timesheet in self:
-            story_id = None if regex.match(timesheet.description) is None else regex.findall(timesheet.description)[0]
+    @property
+    def positions_per_project(self):
+        return self._get_projects_groups()[1]
+
+    @property
+    def hours_per_story(self):
+        """only if story_regex is given"""
+        return self._get_stories_groups()[0]
+
+    @property
+    def hours_per_story_per_day(self):
+        """{day: {story id: hours}}, only if story_regex is given"""
+        return self._get_stories_groups()[1]
+
+    def get_days(self):
+        """
+        :return:collections.OrderedDict {day: ZebraDay}
+        """
+        zebra_days = collections.OrderedDict()
+        for day, hours in self.hours_per_day.iteritems():
+            zebra_day = ZebraDay()
+            zebra_day.day = day
+            zebra_day.time = hours
+            zebra_day.entries_per_user = self.hours_per_user_per_day[day]
+            zebra_day.set_entries(self.collection, self.positions_per_day[day])
+            zebra_days[day] = zebra_day
+        return zebra_days
+
+    def get_projects(self):
+        """
+        :return:collections.OrderedDict {project name: TimeSheetView}
+        """
+        return collections.OrderedDict([
+            (project, TimeSheetView(self.collection, positions))
+            for project, positions in self.positions_per_project.iteritems()
+        ])
+
+    def _get_days_groups(self):
+        if self._days is not None:
+            return self._days
+
+        collection = self.collection
+        # everything is grouped by code first, and decoded once at the end
+        days = collections.OrderedDict()
+        users_per_day = {}
+        positions_per_day = {}
+
+        rows = itertools.izip(itertools.count(), collection.ordinals, collection.times, collection.user_codes)
+        for position, ordinal, time, user_code in rows:
+            if ordinal in days:
+                days[ordinal] += time
+                day_users = users_per_day[ordinal]
+                day_users[user_code] = day_users.get(user_code, 0) + time
+            else:
+                days[ordinal] = time
+                users_per_day[ordinal] = collections.OrderedDict([(user_code, time)])
+                positions_per_day[ordinal] = array.array('l')
+            positions_per_day[ordinal].append(position)
+
+        self._days = (collections.OrderedDict(), collections.OrderedDict(), collections.OrderedDict())
+        hours_per_day, hours_per_user_per_day, readable_positions_per_day = self._days
+        for ordinal, hours in days.iteritems():
+            day = TimeSheet.get_readable_date(ordinal)
+            hours_per_day[day] = hours
+            hours_per_user_per_day[day] = collections.OrderedDict([
+                (collection.users[code], user_hours) for code, user_hours in users_per_day[ordinal].iteritems()
+            ])
+            readable_positions_per_day[day] = positions_per_day[ordinal]
+
+        return self._days
+
+    def _get_projects_groups(self):
+        if self._projects is not None:
+            return self._projects
+
+        collection = self.collection
+        projects = collections.OrderedDict()
+        positions_per_project = {}
+
+        rows = itertools.izip(itertools.count(), collection.times, collection.project_codes)
+        for position, time, project_code in rows:
+            if project_code in projects:
+                projects[project_code] += time
+            else:
+                projects[project_code] = time
+                positions_per_project[project_code] = array.array('l')
+            positions_per_project[project_code].append(position)
+
+        self._projects = (collections.OrderedDict(), collections.OrderedDict())
+        hours_per_project, named_positions_per_project = self._projects
+        for code, hours in projects.iteritems():
+            hours_per_project[collection.projects[code]] = hours
+            named_positions_per_project[collection.projects[code]] = positions_per_project[code]
+
+        return self._projects
+
+    def _get_stories_groups(self):
+        if self._stories is not None:
+            return self._stories
+
+        stories = collections.OrderedDict()
+        stories_per_day = collections.OrderedDict()
+        self._stories = (stories, stories_per_day)
+        if self.story_regex is None:
+            return self._stories
+
+        collection = self.collection
+        readable_dates = {}
+        story_ids = {}
+        rows = itertools.izip(collection.ordinals, collection.times, collection.iter_descriptions())
+        for ordinal, time, description in rows:
+            day = readable_dates.get(ordinal)
+            if day is None:
+                day = readable_dates[ordinal] = TimeSheet.get_readable_date(ordinal)
+                stories_per_day[day] = collections.OrderedDict()
+
+            # descriptions are often repeated (same story, same task), each one is only matched once
+            story_id = story_ids.get(description)
             if story_id is None:
-                story_id = 'other'
-            try:
-                stories[str(story_id)] += timesheet.time
-            except KeyError:
-                stories[str(story_id)] = timesheet.time
+                story_id = 'other' if self.story_regex.match(description) is None \
+                    else str(self.story_regex.findall(description)[0])
+                story_ids[description] = story_id
+            stories[story_id] = stories.get(story_id, 0) + time
+            day_stories = stories_per_day[day]
+            day_stories[story_id] = day_stories.get(story_id, 0) + time
+
+        return self._stories
 
-        return stories
 
+class ZebraDay(object):
+    __slots__ = ('time', '_entries', 'day', 'entries_per_user', '_collection', '_positions')
 
-class ZebraDay:
     def __init__(self):
         self.time = 0
-        self.entries = list()  # list of timesheets
+        self._entries = list()  # list of timesheets
         self.day = ''  # readable day (2012-07-31)
         self.entries_per_user = None
+        # set when the day was grouped from a TimeSheetCollection (see set_entries)
+        self._collection = None
+        self._positions = None
+
+    @property
+    def entries(self):
+        if self._collection is not None:
+            self._entries = [self._collection[p] for p in self._positions]
+            self._collection = None
+            self._positions = None
+        return self._entries
+
+    def set_entries(self, collection, positions):
+        """
+        Set the entries of the day, built from the collection only if they are needed
+
+        :param collection:TimeSheetCollection
+        :param positions:list positions of the entries in the collection
+        """
+        self._collection = collection
+        self._positions = positions
 
     def add_entry(self, entry):
         self.entries.append(entry)
         self.time += entry.time
         self.day = entry.readable_date()
+        self.entries_per_user = None
 
     def get_entries_per_user(self):
         if self.entries_per_user is None:
@@ -89,3 +450,125 @@ class ZebraDay:
                 except KeyError:
                     self.entries_per_user[entry.username] = entry.time
         return self.entries_per_user
+
+
+class UserDirectory:
+    """
+    Zebra users indexed by last name, first name, username and id, with prefix and fuzzy (trigram) lookups
+    """
+    def __init__(self, users, created_at=None):
+        """
+        :param users:list of user dicts as returned by zebra (employee_lastname, employee_firstname, id)
+        :param created_at:float timestamp of the download, defaults to now
+        """
+        self.users = list(users)
+        self.created_at = time.time() if created_at is None else created_at
+
+        self.by_lastname = {}
+        self.by_firstname = {}
+        self.by_username = {}
+        self.by_id = {}
+        self.trigrams = {}
+        self.sorted_lastnames = []
+
+        for position, user in enumerate(self.users):
+            lastname = self._normalize(user.get('employee_lastname'))
+            firstname = self._normalize(user.get('employee_firstname'))
+            self.by_lastname.setdefault(lastname, []).append(position)
+            self.by_firstname.setdefault(firstname, []).append(position)
+            if user.get('username') is not None:
+                self.by_username[self._normalize(user['username'])] = position
+            self.by_id[str(user.get('id'))] = position
+            self.sorted_lastnames.append((lastname, position))
+
+            for name in set([lastname, firstname]):
+                for trigram in self._get_trigrams(name):
+                    self.trigrams.setdefault(trigram, set()).add(position)
+
+        self.sorted_lastnames.sort()
+
+    def __len__(self):
+        return len(self.users)
+
+    def is_expired(self, ttl):
+        """
+        :param ttl:int nb of seconds the directory is valid
+        :return:bool
+        """
+        return time.time() - self.created_at >= ttl
+
+    def find_by_lastname(self, lastname):
+        return [self.users[p] for p in self.by_lastname.get(self._normalize(lastname), [])]
+
+    def find_by_firstname(self, firstname):
+        return [self.users[p] for p in self.by_firstname.get(self._normalize(firstname), [])]
+
+    def get_by_id(self, id):
+        """
+        :param id:int|string
+        :return:dict|None
+        """
+        position = self.by_id.get(str(id))
+        return None if position is None else self.users[position]
+
+    def get_by_username(self, username):
+        """
+        Get a user by zebra username (as found in timesheets), falling back to a unique first name
+
+        :param username:string
+        :return:dict|None
+        """
+        username = self._normalize(username)
+        if username in self.by_username:
+            return self.users[self.by_username[username]]
+        positions = self.by_firstname.get(username, [])
+        return self.users[positions[0]] if len(positions) == 1 else None
+
+    def find_by_prefix(self, prefix):
+        """
+        :param prefix:string beginning of the last name
+        :return:list of users sorted by last name
+        """
+        prefix = self._normalize(prefix)
+        users = []
+        for lastname, position in self.sorted_lastnames[bisect.bisect_left(self.sorted_lastnames, (prefix,)):]:
+            if not lastname.startswith(prefix):
+                break
+            users.append(self.users[position])
+        return users
+
+    def find_similar(self, name, limit=5, min_similarity=0.3):
+        """
+        Fuzzy lookup on last and first names (ie. for typos)
+
+        :param name:string
+        :param limit:int max nb of users returned
+        :param min_similarity:float between 0 and 1 (share of trigrams in common)
+        :return:list of users, most similar first
+        """
+        trigrams = self._get_trigrams(self._normalize(name))
+        candidates = set()
+        for trigram in trigrams:
+            candidates.update(self.trigrams.get(trigram, ()))
+
+        scores = []
+        for position in candidates:
+            user = self.users[position]
+            similarity = 0
+            for key in ['employee_lastname', 'employee_firstname']:
+                user_trigrams = self._get_trigrams(self._normalize(user.get(key)))
+                similarity = max(similarity, float(len(trigrams & user_trigrams)) / len(trigrams | user_trigrams))
+            if similarity >= min_similarity:
+                scores.append((-similarity, position))
+
+        return [self.users[position] for score, position in sorted(scores)[:limit]]
+
+    def _normalize(self, name):
+        # names given on the command line are utf-8 byte strings, zebra ones are unicode
+        if isinstance(name, str):
+            name = name.decode('utf-8', 'replace')
+        return unicode(name if name is not None else '').strip().lower()
+
+    def _get_trigrams(self, name):
+        padded = '  %s ' % name
+        return set([padded[i:i + 3] for i in range(len(padded) - 2)])
@@ -13,6 +13,8 @@ class SecretParser:
         self.zebra_data = None
         self.jira_data = None
         self.output_dir = None
+        self.cache_dir = None
+        self.cache_max_size = None
 
     def parse(self, url):
         try:
@@ -29,13 +31,19 @@ class SecretParser:
             self.zebra_data = settings['zebra']
             self.jira_data = settings['jira']
             self.output_dir = settings['output_dir']
+            self.cache_dir = settings.get('cache_dir')
+            self.cache_max_size = settings.get('cache_max_size')
         except KeyError as e:
             raise SyntaxError('Your .lst-secret.yml does not contain all necessary information (key problem: %s)' % (e))
 
-    def get_zebra(self, key):
+    def get_zebra(self, key, default=None):
+        if default is not None:
+            return self.zebra_data.get(key, default)
         return self.zebra_data[key]
 
-    def get_jira(self, key):
+    def get_jira(self, key, default=None):
+        if default is not None:
+            return self.jira_data.get(key, default)
         return self.jira_data[key]
 
     def get_output_dir(self):
@@ -43,6 +51,17 @@ class SecretParser:
             return self.output_dir + '/'
         return self.output_dir
 
+    def get_cache_dir(self):
+        if self.cache_dir is None:
+            return os.path.expanduser('~/.lst-cache')
+        return os.path.expanduser(self.cache_dir)
+
+    def get_cache_max_size(self):
+        """Max size of the http cache, in bytes (defined in MB in .lst-secret.yml)"""
+        if self.cache_max_size is None:
+            return 100 * 1024 * 1024
+        return int(self.cache_max_size * 1024 * 1024)
+
 class ConfigParser:
     def __init__(self):
         self.data = None
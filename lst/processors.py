@@ -10,11 +10,22 @@ class JiraStoryProcessor(object):
         """
         pass
 
+    def post_process_all(self, stories):
+        """
+        Post process a list of stories. Calls post_process on each story by default
+
+        :param stories: list of Story
+        :return list of modified stories (discarded ones are removed), in the original order
+        """
+        processed = [self.post_process(story) for story in stories]
+        return [story for story in processed if story is not None]
+
 
 class CloseDateProcessor(JiraStoryProcessor):
-    def __init__(self, closed_status_names, jira_manager):
+    def __init__(self, closed_status_names, jira_manager, workers=1):
         self.closed_status_names = closed_status_names
         self.jira_manager = jira_manager
+        self.workers = workers
 
     def post_process(self, story):
         # check on what day the story was closed
@@ -24,9 +35,36 @@ class CloseDateProcessor(JiraStoryProcessor):
                 self.closed_status_names
             )
             if story.close_date is None:
-                print 'Story %s seems to be over, but i can\'t find a closing date for it (looking for statuses \'%s\' in its activity logs). Story will be discarded for sprint graph' % (
-                    story.id,
-                    self.closed_status_names
-                )
+                self._print_discarded(story)
                 return None
         return story
+
+    def post_process_all(self, stories):
+        """
+        Retrieve close dates of all closed stories at once (batched and concurrent activity stream requests)
+
+        :param stories: list of Story
+        :return list of modified stories (discarded ones are removed), in the original order
+        """
+        close_dates = self.jira_manager.get_stories_close_date(
+            [story.id for story in stories if story.is_over()],
+            self.closed_status_names,
+            self.workers
+        )
+
+        processed = []
+        for story in stories:
+            if story.is_over():
+                story.close_date = close_dates.get(story.id)
+                if story.close_date is None:
+                    self._print_discarded(story)
+                    continue
+            processed.append(story)
+
+        return processed
+
+    def _print_discarded(self, story):
+        print 'Story %s seems to be over, but i can\'t find a closing date for it (looking for statuses \'%s\' in its activity logs). Story will be discarded for sprint graph' % (
+            story.id,
+            self.closed_status_names
+        )
@@ -1,22 +1,130 @@
 import json
-import urllib, urllib2, urlparse, cookielib
+import threading
+import urllib, urllib2, urlparse
 import xml.etree.ElementTree as ET
-import dateutil.parser
+
+from lst.concurrency import Future, TaskQueue
+from lst.connection import ConnectionPool, KeepAliveHandler, CompressionHandler
+from lst.errors import AuthenticationError
+from lst.helpers import ConcurrencyHelper, JiraHelper
+from lst.session import Session
 
 
 class Remote(object):
+    # backend name, used in error messages
+    name = 'remote'
+
+    # keep-alive connections shared by all remotes (and threads)
+    connection_pool = ConnectionPool()
+
+    # on-disk http cache (ResponseCache) shared by all remotes, None to disable caching
+    cache = None
+    # ignore fresh cache entries (always download again)
+    cache_refresh = False
+    # nb of seconds a cached response is considered fresh
+    cache_ttl = 300
+
+    # recorded exchanges (Cassette) used in place of the network, None to use the network
+    cassette = None
+
+    # print debug information (ie. transfer sizes)
+    debug = False
+
+    # shared remote instances (see get_shared_instance)
+    _instances = {}
+    _instances_lock = threading.Lock()
+
     def __init__(self, base_url):
         self.base_url = base_url
+        self.opener = self._build_opener()
+
+    @classmethod
+    def get_shared_instance(cls, base_url, *args):
+        """
+        Get the remote shared by the whole process for this backend (created on first call)
+
+        :param base_url:string backend base url
+        :param args:list other constructor arguments (credentials)
+        :return:Remote
+        """
+        key = (cls, base_url) + args
+        with Remote._instances_lock:
+            if key not in Remote._instances:
+                Remote._instances[key] = cls(base_url, *args)
+            return Remote._instances[key]
+
+    def _build_opener(self, *handlers):
+        return urllib2.build_opener(
+            KeepAliveHandler(self.connection_pool),
+            CompressionHandler(self._report_compression),
+            *handlers
+        )
+
+    def _report_compression(self, url, encoding, compressed_size, decompressed_size):
+        if self.debug:
+            print '%s response: %d bytes received (%s), %d bytes decompressed' % (
+                self.name, compressed_size, encoding, decompressed_size
+            )
 
-    def _get_request(self, url, body = None, headers = {}):
+    def _get_request(self, url, body = None, headers = None):
+        headers = {} if headers is None else dict(headers)
         return urllib2.Request('%s/%s' % (self.base_url, url), body, headers)
 
-    def _request(self, url, body = None, headers = {}):
+    def _request(self, url, body = None, headers = None):
         request = self._get_request(url, body, headers)
-        opener = urllib2.build_opener()
-        response = opener.open(request)
+
+        try:
+            if self.cassette is None:
+                response = self.opener.open(request)
+            else:
+                response = self.cassette.open(self.opener, request)
+        except urllib2.HTTPError as e:
+            # not modified (conditional request), the caller will use its cached version
+            if e.code == 304:
+                return e
+            if e.code == 401:
+                raise AuthenticationError('Unable to authenticate on %s. Check your credentials.' % self.name)
+            raise Exception('Unable to connect to %s. Check your connection status and try again.' % self.name)
+        except urllib2.URLError:
+            raise Exception('Unable to connect to %s. Check your connection status and try again.' % self.name)
+
         return response
 
+    def _open(self, url):
+        """
+        Get a response for url, going through the http cache if it is enabled
+
+        :param url:string
+        :return:file-like response
+        """
+        if self.cache is None:
+            return self._fetch(url)
+
+        full_url = self._get_request(url).get_full_url()
+        key = self.cache.get_key(full_url)
+        entry = None if self.cache_refresh else self.cache.get(key)
+
+        if entry is not None and entry.is_fresh(self.cache_ttl):
+            return entry.open()
+
+        response = self._fetch(url, None if entry is None else entry.get_validators())
+        if entry is not None and getattr(response, 'code', None) == 304:
+            response.close()
+            self.cache.refresh(entry)
+            return entry.open()
+
+        return self.cache.store(key, full_url, response)
+
+    def _fetch(self, url, headers=None):
+        """
+        Download url (called on cache misses)
+
+        :param url:string
+        :param headers:dict additional headers (ie. conditional request headers)
+        :return:file-like response
+        """
+        return self._request(url, headers=headers)
+
     def login(self):
         pass
 
@@ -24,68 +132,207 @@ class Remote(object):
         pass
 
 class JiraRemote(Remote):
-    def __init__(self, base_url, username, password):
-        super(JiraRemote, self).__init__(base_url)
+    name = 'Jira'
+    cache_ttl = 300
 
+    # nb of activity entries requested per story (activity stream)
+    activity_results_per_story = 50
+    # limits for batched activity stream requests (stay far from usual url length limits)
+    activity_max_stories = 20
+    activity_max_ids_length = 1000
+
+    def __init__(self, base_url, username, password):
+        self.session = Session.get_shared_session(self.name, base_url, username)
         self.username = username
         self.password = password
 
-    def _get_request(self, url, body = None, headers = {}):
+        super(JiraRemote, self).__init__(base_url)
+
+    def _build_opener(self, *handlers):
+        return super(JiraRemote, self)._build_opener(urllib2.HTTPCookieProcessor(self.session.cookiejar), *handlers)
+
+    def _get_request(self, url, body = None, headers = None):
+        headers = {} if headers is None else dict(headers)
         if 'User-Agent' not in headers:
             headers['User-Agent'] = 'LST Jira Client';
         return super(JiraRemote, self)._get_request(url, body, headers)
 
-    def _request(self, url, body = None, headers = {}):
-        request = self._get_request(url, body, headers)
-        opener = urllib2.build_opener()
-
-        try:
-            response = opener.open(request)
-        except urllib2.URLError:
-            raise Exception('Unable to connect to Jira. Check your connection status and try again.')
-
-        return response
-
     def login(self):
         pass
 
-    def get_data(self, url):
-        url = '%s&os_username=%s&os_password=%s' % (
+    def _login(self):
+        """Open a jira session (its JSESSIONID cookie is then sent with all requests)"""
+        body = json.dumps({'username': str(self.username), 'password': str(self.password)})
+        try:
+            response = self._request('/rest/auth/1/session', body, {'Content-Type': 'application/json'})
+            response.read()
+        except AuthenticationError:
+            raise
+        except Exception:
+            raise AuthenticationError('Unable to open a Jira session')
+
+    def _is_authenticated(self, response):
+        # jira answers anonymous requests (ie. once the session expired) as the anonymous user
+        if getattr(response, 'code', None) == 304:
+            return True
+        return response.info().getheader('X-AUSERNAME') != 'anonymous'
+
+    def _fetch(self, url, headers=None):
+        """
+        Download url using the shared jira session (opened on first call, opened again if it expired).
+        If jira doesn't accept the session, credentials are sent with each request instead
+        """
+        if not self.session.disabled:
+            # the second attempt uses a new session, in case the first one expired
+            for attempt in range(2):
+                try:
+                    generation = self.session.login(self._login)
+                except AuthenticationError:
+                    break
+                try:
+                    response = super(JiraRemote, self)._fetch(url, headers)
+                    if self._is_authenticated(response):
+                        return response
+                    response.close()
+                except AuthenticationError:
+                    pass
+                self.session.invalidate(generation)
+
+            if not self.session.disabled:
+                print 'Jira session was rejected, credentials will be sent with each request'
+            self.session.disabled = True
+
+        return super(JiraRemote, self)._fetch(self._add_credentials(url), headers)
+
+    def _add_credentials(self, url):
+        return '%s%sos_username=%s&os_password=%s' % (
             url,
-            str(self.username),
-            str(self.password)
+            '&' if '?' in url else '?',
+            urllib.quote(str(self.username)),
+            urllib.quote(str(self.password))
         )
 
-        response = self._request(url)
-        response_body = response.read()
+    def get_data(self, url):
+        response_body = self.get_stream(url).read()
 
         response_xml = ET.fromstring(response_body)
         return response_xml
 
-    def get_story_close_date(self, id, closed_status_names):
-        url = "/activity?maxResults=50&streams=issue-key+IS+"
-        url += str(id)
-        url += '&os_username=' + str(self.username)
-        url += '&os_password=' + str(self.password)
+    def get_stream(self, url):
+        """
+        Get the (not yet read) response for url, to be parsed while it is downloaded
 
-        response = self._request(url)
+        :param url:string
+        :return:file-like response
+        """
+        return self._open(url)
+
+    def get_story_close_date(self, id, closed_status_names):
+        return self.get_stories_close_date([id], closed_status_names).get(id)
+
+    def get_stories_close_date(self, ids, closed_status_names):
+        """
+        Get the close date of multiple stories with a single activity stream request
+        (use get_activity_chunks to make sure the ids fit in one request)
+
+        :param ids:list of story ids
+        :param closed_status_names:list of status names considered as closed
+        :return:dict {story_id: close date} (stories without close date are left out)
+        """
+        max_results = self.activity_results_per_story * len(ids)
+        url = "/activity?maxResults=" + str(max_results)
+        url += "&streams=issue-key+IS+" + '+'.join([str(id) for id in ids])
+
+        response = self._open(url)
         response_body = response.read()
 
         response_xml = ET.fromstring(response_body)
-        xmlns = {"atom": "http://www.w3.org/2005/Atom"}
-
-        close_dates = []
-
-        # loop through all statuses considered as closed and check if it is used
-        for name in closed_status_names:
-            try:
-                close_dates.append(response_xml.find("./atom:entry/atom:category/[@term='" + name + "']/../atom:published", namespaces=xmlns).text)
-            except:
-                pass
-        if len(close_dates) == 0:
-            return None
-
-        return dateutil.parser.parse(min(close_dates), dayfirst=True)
+        xmlns = {
+            "atom": "http://www.w3.org/2005/Atom",
+            "activity": "http://activitystrea.ms/spec/1.0/",
+        }
+
+        # group activity entries by story id
+        entries = dict([(str(id).upper(), []) for id in ids])
+        feed = response_xml.findall('./atom:entry', namespaces=xmlns)
+        for entry in feed:
+            if len(ids) == 1:
+                entries[str(ids[0]).upper()].append(entry)
+                continue
+            for id in self._get_entry_story_ids(entry, xmlns):
+                if id in entries:
+                    entries[id].append(entry)
+                    break
+
+        close_dates = {}
+        for id in ids:
+            story_close_dates = []
+
+            # loop through all statuses considered as closed and check if it is used
+            for name in closed_status_names:
+                for entry in entries[str(id).upper()]:
+                    published = entry.find("./atom:category/[@term='" + name + "']/../atom:published", namespaces=xmlns)
+                    if published is not None:
+                        story_close_dates.append(published.text)
+                        break
+
+            if len(story_close_dates) != 0:
+                close_dates[id] = JiraHelper.parse_date(min(story_close_dates))
+
+        # the feed is sorted newest first across all stories: when it is full, a busy story may have pushed
+        # the closing entry of another one out of it. Those stories are queried alone
+        if len(ids) > 1 and len(feed) >= max_results:
+            for id in ids:
+                if id not in close_dates:
+                    close_date = self.get_story_close_date(id, closed_status_names)
+                    if close_date is not None:
+                        close_dates[id] = close_date
+
+        return close_dates
+
+    def _get_entry_story_ids(self, entry, xmlns):
+        """
+        Get the ids of the stories an activity entry could be about (object first, then target)
+
+        :param entry:Element atom entry
+        :param xmlns:dict namespaces
+        :return:list of upper cased story ids
+        """
+        ids = []
+        for node_name in ['activity:object', 'activity:target']:
+            for node in entry.findall(node_name, namespaces=xmlns):
+                title = node.find('atom:title', namespaces=xmlns)
+                if title is not None and title.text is not None:
+                    ids.append(title.text.strip().upper())
+                for link in node.findall('atom:link', namespaces=xmlns):
+                    href = link.get('href', '')
+                    if '/browse/' in href:
+                        ids.append(href[href.rfind('/browse/') + 8:].split('?')[0].upper())
+        return ids
+
+    @classmethod
+    def get_activity_chunks(cls, ids):
+        """
+        Split story ids in groups small enough to be queried in one activity stream request
+
+        :param ids:list of story ids
+        :return:list of lists of story ids
+        """
+        chunks = []
+        chunk = []
+        length = 0
+        for id in ids:
+            id_length = len(str(id)) + 1
+            if len(chunk) == cls.activity_max_stories or length + id_length > cls.activity_max_ids_length:
+                chunks.append(chunk)
+                chunk = []
+                length = 0
+            chunk.append(id)
+            length += id_length
+        if len(chunk) != 0:
+            chunks.append(chunk)
+
+        return chunks
 
     def get_url_for_project_lookup_by_story_id(cls, story_id):
         return "/sr/jira.issueviews:searchrequest-xml/temp/SearchRequest.xml" \
@@ -94,36 +341,29 @@ class JiraRemote(Remote):
 
 
 class ZebraRemote(Remote):
-    def __init__(self, base_url, username, password):
-        super(ZebraRemote, self).__init__(base_url)
+    name = 'Zebra'
+    cache_ttl = 900
 
-        self.cookiejar = cookielib.CookieJar()
-        self.logged_in = False
+    # where to persist the session cookies between runs, None to log in on each run
+    session_directory = None
+
+    def __init__(self, base_url, username, password):
+        self.session = Session.get_shared_session(self.name, base_url, username, self.session_directory)
         self.username = username
         self.password = password
 
-    def _get_request(self, url, body = None, headers = {}):
+        super(ZebraRemote, self).__init__(base_url)
+
+    def _build_opener(self, *handlers):
+        return super(ZebraRemote, self)._build_opener(urllib2.HTTPCookieProcessor(self.session.cookiejar), *handlers)
+
+    def _get_request(self, url, body = None, headers = None):
+        headers = {} if headers is None else dict(headers)
         if 'User-Agent' not in headers:
             headers['User-Agent'] = 'LST Zebra Client';
         return super(ZebraRemote, self)._get_request(url, body, headers)
 
-    def _request(self, url, body = None, headers = {}):
-        request = self._get_request(url, body, headers)
-        opener = urllib2.build_opener(urllib2.HTTPCookieProcessor(self.cookiejar))
-
-        try:
-            response = opener.open(request)
-        except urllib2.URLError:
-            raise Exception('Unable to connect to Zebra. Check your connection status and try again.')
-
-        self.cookiejar.extract_cookies(response, request)
-
-        return response
-
     def _login(self):
-        if self.logged_in:
-            return
-
         login_url = '/login/user/%s.json' % self.username
         parameters = urllib.urlencode({
             'username': self.username,
@@ -133,17 +373,118 @@ class ZebraRemote(Remote):
         response = self._request(login_url, parameters)
         response_body = response.read()
 
-        if not response.info().getheader('Content-Type').startswith('application/json'):
-            self.logged_in = False
-            raise Exception('Unable to login')
-        else:
-            self.logged_in = True
+        if not self._is_json(response):
+            raise AuthenticationError('Unable to login')
 
-    def get_data(self, url):
-        self._login()
+    def _is_json(self, response):
+        content_type = response.info().getheader('Content-Type')
+        return content_type is not None and content_type.startswith('application/json')
 
-        response = self._request(url)
-        response_body = response.read()
+    def _fetch(self, url, headers=None):
+        """
+        Download url, logging in first if needed. An expired session (401 or login page instead
+        of json) is noticed and the request sent again after logging in again
+        """
+        generation = self.session.login(self._login)
+        try:
+            response = super(ZebraRemote, self)._fetch(url, headers)
+            if getattr(response, 'code', None) == 304 or self._is_json(response):
+                return response
+            response.close()
+        except AuthenticationError:
+            pass
+
+        self.session.invalidate(generation)
+        self.session.login(self._login)
+
+        response = super(ZebraRemote, self)._fetch(url, headers)
+        if getattr(response, 'code', None) != 304 and not self._is_json(response):
+            response.close()
+            raise AuthenticationError('Unable to login')
+
+        return response
+
+    def get_data(self, url):
+        response_body = self.get_stream(url).read()
 
         response_json = json.loads(response_body)
         return response_json
+
+    def get_stream(self, url):
+        """
+        Get the (not yet read) response for url, to be parsed while it is downloaded
+
+        :param url:string
+        :return:file-like response
+        """
+        return self._open(url)
+
+
+class AsyncRemote(object):
+    """
+    Non-blocking variant of a remote (to be mixed with a Remote class): calls are queued and each returns a Future.
+    At most max_concurrency requests run at the same time per remote, so that hundreds of calls
+    can be scheduled at once without flooding the backend
+    """
+    # max nb of requests running at the same time on one remote (see set_max_concurrency)
+    max_concurrency = 8
+
+    def __init__(self, *args):
+        super(AsyncRemote, self).__init__(*args)
+
+        self.tasks = TaskQueue(self.max_concurrency, ConcurrencyHelper.worker_initializers)
+
+    def set_max_concurrency(self, max_concurrency):
+        """
+        :param max_concurrency:int max nb of requests running at the same time
+        """
+        self.tasks.set_max_concurrency(max_concurrency)
+
+    def schedule(self, function, *args):
+        """
+        Queue a call, run as soon as a slot is available
+
+        :param function:callable
+        :param args:list function arguments
+        :return:Future
+        """
+        return self.tasks.schedule(function, *args)
+
+    def get_data_async(self, url):
+        """
+        :param url:string
+        :return:Future resolved with the parsed response (see get_data)
+        """
+        return self.schedule(self.get_data, url)
+
+
+class AsyncJiraRemote(AsyncRemote, JiraRemote):
+
+    def get_story_close_date_async(self, id, closed_status_names):
+        """
+        :return:Future resolved with the story close date (None if not found)
+        """
+        return self.schedule(self.get_story_close_date, id, closed_status_names)
+
+    def get_stories_close_date_async(self, ids, closed_status_names):
+        """
+        Get the close date of multiple stories, with one request per chunk of ids (see get_activity_chunks)
+
+        :param ids:list of story ids
+        :param closed_status_names:list of status names considered as closed
+        :return:Future resolved with a dict {story_id: close date}
+        """
+        def merge(results):
+            close_dates = {}
+            for result in results:
+                close_dates.update(result)
+            return close_dates
+
+        return Future.gather([
+            self.schedule(self.get_stories_close_date, chunk, closed_status_names)
+            for chunk in self.get_activity_chunks(ids)
+        ], merge)
+
+
+class AsyncZebraRemote(AsyncRemote, ZebraRemote):
+    pass
@@ -0,0 +1,94 @@
+import cookielib
+import hashlib
+import os
+import threading
+
+
+class Session(object):
+    """
+    Login state and cookies of a backend, shared by all remotes and threads of the process.
+    Logging in is done by a single thread, the others wait for it to be done.
+    Cookies can be persisted to disk so that the next run doesn't have to log in again
+    """
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+
+    def __init__(self, cookie_file=None):
+        """
+        :param cookie_file:string where to persist cookies, None to keep them in memory only
+        """
+        self.cookie_file = cookie_file
+        self.cookiejar = cookielib.CookieJar() if cookie_file is None else cookielib.LWPCookieJar(cookie_file)
+        self.logged_in = False
+        # set when the backend doesn't accept session authentication (credentials are then sent with each request)
+        self.disabled = False
+        # incremented on each login, so that threads noticing the same expiry only log in again once
+        self.generation = 0
+        self._lock = threading.Lock()
+
+        if cookie_file is not None:
+            try:
+                self.cookiejar.load(ignore_discard=True)
+                # the restored session is checked by the first request
+                self.logged_in = len(self.cookiejar) > 0
+            except (IOError, cookielib.LoadError):
+                pass
+
+    @classmethod
+    def get_shared_session(cls, name, base_url, username, directory=None):
+        """
+        Get the session shared by the whole process for this backend and user (created on first call)
+
+        :param name:string backend name
+        :param base_url:string backend base url
+        :param username:string
+        :param directory:string where to persist the session cookies, None to keep them in memory only
+        :return:Session
+        """
+        key = (name, base_url, username, directory)
+        with Session._sessions_lock:
+            if key not in Session._sessions:
+                cookie_file = None
+                if directory is not None:
+                    if not os.path.isdir(directory):
+                        os.makedirs(directory)
+                    key_hash = hashlib.sha1('%s %s %s' % (name, base_url, username)).hexdigest()
+                    cookie_file = os.path.join(directory, 'session-%s.txt' % key_hash)
+                Session._sessions[key] = cls(cookie_file)
+            return Session._sessions[key]
+
+    def login(self, login_function):
+        """
+        Log in, unless it was already done
+
+        :param login_function:callable doing the actual login (raises an error on failure)
+        :return:int session generation (see invalidate)
+        """
+        with self._lock:
+            if not self.logged_in:
+                login_function()
+                self.logged_in = True
+                self.generation += 1
+                self.save()
+            return self.generation
+
+    def invalidate(self, generation):
+        """
+        Forget an expired session (the next call to login will log in again)
+
+        :param generation:int generation of the session that was found expired (as returned by login)
+        """
+        with self._lock:
+            # already logged in again by another thread
+            if generation != self.generation:
+                return
+            self.logged_in = False
+            self.cookiejar.clear()
+
+    def save(self):
+        if self.cookie_file is None:
+            return
+
+        # session cookies are usually not meant to be saved (hence ignore_discard)
+        self.cookiejar.save(ignore_discard=True)
+        os.chmod(self.cookie_file, 0600)
@@ -0,0 +1,110 @@
+import codecs
+import json
+import re
+
+
+class JsonArrayStream(object):
+    """
+    Iterates over the items of a json array while the document is being read, without loading
+    the whole document in memory. The array is found by its key (first occurrence in the document)
+    """
+    whitespace = re.compile(r'\s*')
+    scalar_end = re.compile(r'[,\]\}\s]')
+
+    def __init__(self, fp, key, chunk_size=64 * 1024, encoding='utf-8'):
+        """
+        :param fp:file file-like json document (ie. http response)
+        :param key:string key of the array to iterate over
+        :param chunk_size:int nb of bytes read at once
+        :param encoding:string document encoding
+        """
+        self.fp = fp
+        self.key_pattern = re.compile(r'"%s"\s*:' % re.escape(key))
+        self.chunk_size = chunk_size
+        self.text_decoder = codecs.getincrementaldecoder(encoding)()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = u''
+        self.pos = 0
+        self.eof = False
+
+    def __iter__(self):
+        if not self._seek_key():
+            return
+
+        self._skip_whitespace()
+        if self._current() != u'[':
+            # single value instead of a list
+            value = self._decode()
+            self._drain()
+            if value is not None:
+                yield value
+            return
+        self.pos += 1
+
+        while True:
+            self._skip_whitespace()
+            char = self._current()
+            if char == u']' or char is None:
+                self._drain()
+                return
+            if char == u',':
+                self.pos += 1
+                continue
+
+            yield self._decode()
+
+    def _drain(self):
+        """
+        Read the rest of the document: a response read until its end can be cached,
+        and its connection reused
+        """
+        while not self.eof:
+            self.eof = len(self.fp.read(self.chunk_size)) == 0
+
+    def _read(self):
+        """Read the next chunk, dropping what was already consumed from the buffer"""
+        data = self.fp.read(self.chunk_size)
+        if len(data) == 0:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(data, self.eof)
+        self.pos = 0
+
+    def _seek_key(self):
+        while True:
+            match = self.key_pattern.search(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.end()
+                return True
+            if self.eof:
+                return False
+
+            # keep the end of the buffer, the key could be split between 2 chunks
+            self.pos = max(self.pos, len(self.buffer) - 256)
+            self._read()
+
+    def _skip_whitespace(self):
+        while True:
+            self.pos = self.whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return
+            self._read()
+
+    def _current(self):
+        return self.buffer[self.pos] if self.pos < len(self.buffer) else None
+
+    def _decode(self):
+        """Decode the json value starting at the current position, reading more data until it is complete"""
+        while True:
+            # numbers (and literals) can only be decoded once their end was read
+            if not self.eof and self.buffer[self.pos] not in u'{["' and \
+                    self.scalar_end.search(self.buffer, self.pos) is None:
+                self._read()
+                continue
+
+            try:
+                value, self.pos = self.json_decoder.raw_decode(self.buffer, self.pos)
+                return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self._read()
@@ -0,0 +1,50 @@
+import os
+import pickle
+import tempfile
+
+
+class SyncStore(object):
+    """
+    Local storage for incrementally synchronized data (one file per sprint and backend)
+    """
+    def __init__(self, directory, refresh=False):
+        """
+        :param directory:string where to store the synchronized data
+        :param refresh:bool ignore previously stored data (forces a full sync)
+        """
+        self.directory = directory
+        self.refresh = refresh
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def load(self, name):
+        """
+        Get previously saved data
+
+        :param name:string
+        :return:object|None None if nothing was saved (or if it can't be read anymore)
+        """
+        if self.refresh:
+            return None
+
+        try:
+            with open(self._get_path(name), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def save(self, name, data):
+        fd, path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(path, self._get_path(name))
+
+    def delete(self, name):
+        try:
+            os.remove(self._get_path(name))
+        except OSError:
+            pass
+
+    def _get_path(self, name):
+        return os.path.join(self.directory, '%s.p' % name)
@@ -1,6 +1,18 @@
 from lst.tests import (
+    burnup_test,
+    cache_test,
+    cassette_test,
+    concurrency_test,
+    connection_test,
+    fetch_test,
     helpers_test,
+    jira_manager_test,
+    load_test,
     parser_test,
+    processors_test,
+    remote_test,
+    stream_test,
+    zebra_manager_test,
 )
 from lst.tests.commands import (
     retrieve_jira_information_for_config_test,
@@ -18,7 +30,19 @@ def suite():
     suite.addTests(retrieve_user_id_test.suite())
     suite.addTests(check_hours_test.suite())
     suite.addTests(helpers_test.suite())
+    suite.addTests(connection_test.suite())
+    suite.addTests(cache_test.suite())
     suite.addTests(parser_test.suite())
+    suite.addTests(processors_test.suite())
+    suite.addTests(remote_test.suite())
+    suite.addTests(stream_test.suite())
+    suite.addTests(zebra_manager_test.suite())
+    suite.addTests(jira_manager_test.suite())
+    suite.addTests(concurrency_test.suite())
+    suite.addTests(fetch_test.suite())
+    suite.addTests(cassette_test.suite())
+    suite.addTests(burnup_test.suite())
+    suite.addTests(load_test.suite())
     return suite
 
 if __name__ == '__main__':
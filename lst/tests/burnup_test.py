@@ -0,0 +1,100 @@
+import datetime
+import unittest
+
+from lst.burnup import BurnupEngine
+from lst.helpers import DateHelper, MathHelper
+from lst.models import Sprint, SprintBurnupSeries
+from lst.models.jiraModels import Story, StoryCollection
+from lst.models.zebraModels import TimeSheet, TimeSheetCollection
+
+
+class BurnupEngineTest(unittest.TestCase):
+    """Unit tests for BurnupEngine"""
+
+    def setUp(self):
+        Story.closed_status_ids = [6]
+        self.days = DateHelper.get_all_days(datetime.date(2014, 3, 3), datetime.date(2014, 3, 9), True)
+
+    def get_timesheets(self, *entries):
+        timesheets = TimeSheetCollection()
+        for day, username, time in entries:
+            timesheet = TimeSheet()
+            timesheet.date = datetime.date(2014, 3, day)
+            timesheet.username = username
+            timesheet.time = time
+            timesheets.append(timesheet)
+        return timesheets
+
+    def get_stories(self, *stories):
+        collection = StoryCollection()
+        for day, story_points, business_value in stories:
+            story = Story()
+            story.status = 6
+            story.story_points = story_points
+            story.business_value = business_value
+            story.close_date = datetime.datetime(2014, 3, day, 16)
+            collection.append(story)
+        return collection
+
+    def testSeries(self):
+        """days without hours, closed story nor planned hours should be skipped, series stop at the end date"""
+        sprint = Sprint()
+        sprint.forced = {'2014-03-04': '2', '2014-03-07': 5}
+        sprint.planned = {'2014-03-03': 8, '2014-03-09': 4}
+        timesheets = self.get_timesheets((3, 'laurent', 4.0), (3, 'rolf', 2.0), (4, 'rolf', 3.0), (7, 'rolf', 1.0))
+        # stories closed on the 6th have no story points, the day is still shown
+        stories = self.get_stories((4, 3.0, 10.0), (4, 2.0, 0.0), (6, 0.0, 0.0))
+
+        engine = BurnupEngine.from_sprint(sprint, self.days, timesheets.get_index(), stories)
+        dates, series = engine.get_series(datetime.date(2014, 3, 7))
+
+        self.assertEquals([3, 4, 6, 7, 9], [d.day for d in dates])
+        self.assertEquals([6.0, 11.0, 11.0, 16.0], series['md'])
+        self.assertEquals([0.0, 5.0, 5.0, 5.0], series['sp'])
+        self.assertEquals([0.0, 10.0, 10.0, 10.0], series['bv'])
+        self.assertEquals([8, 8, 8, 8, 12], series['planned'])
+        self.assertEquals([6.0, 5.0, 0.0, 0.0, 5, 0.0, 0.0], engine.total_hours)
+
+    def testPercentSeries(self):
+        """series are scaled to their commited value, series without commitment are left out"""
+        sprint = Sprint()
+        sprint.forced = {'2014-03-04': '4'}
+        timesheets = self.get_timesheets((3, 'rolf', 4.0), (4, 'rolf', 4.0))
+        stories = self.get_stories((4, 5.0, 0.0))
+        series = SprintBurnupSeries()
+        series['md'].ideal_value = 16.0
+        series['sp'].ideal_value = 10.0
+        series['bv'].ideal_value = 0
+
+        engine = BurnupEngine.from_sprint(sprint, self.days, timesheets.get_index(), stories)
+        dates, percent_series = engine.get_percent_series(datetime.date(2014, 3, 9), series)
+
+        self.assertEquals([3, 4], [d.day for d in dates])
+        self.assertEquals(['md', 'sp'], percent_series.keys())
+        self.assertEquals([25.0, 75.0], percent_series['md'])
+        self.assertEquals([0.0, 50.0], percent_series['sp'])
+
+    def testLongRange(self):
+        """a release spanning months should be computed like a sprint"""
+        days = DateHelper.get_all_days(datetime.date(2014, 1, 1), datetime.date(2014, 12, 31), True)
+        engine = BurnupEngine(days, [1.0] * len(days), story_points=[0.5] * len(days))
+        dates, series = engine.get_series(datetime.date(2014, 6, 30))
+
+        self.assertEquals(365, len(dates))
+        self.assertEquals(181, len(series['md']))
+        self.assertEquals(181.0, series['md'][-1])
+        self.assertEquals(90.5, series['sp'][-1])
+
+    def testMath(self):
+        self.assertEquals([1, 3, 6], MathHelper.cumulate([1, 2, 3]))
+        self.assertEquals([0.0, 50.0, 100.0], MathHelper.get_values_as_percent([0.0, None, 5.0, 10.0], (0, 10)))
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(BurnupEngineTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import urllib2
+from StringIO import StringIO
+from mock import MagicMock
+
+from lst.cache import ResponseCache
+from lst.remote import Remote
+from lst.stream import JsonArrayStream
+
+
+class ResponseCacheTest(unittest.TestCase):
+    """Unit tests for cache.py"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResponseCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_response(self, body, headers=None, code=200):
+        response = urllib2.addinfourl(StringIO(body), MagicMock(), 'http://remote/url', code)
+        headers = {} if headers is None else headers
+        response.info().getheader = lambda name: headers.get(name)
+        return response
+
+    def testKeyWithoutCredentials(self):
+        """credentials and parameters order should not be part of the key"""
+        self.assertEquals(
+            ResponseCache.get_key('http://Jira//activity?b=2&a=1&os_username=me&os_password=secret'),
+            ResponseCache.get_key('http://jira/activity?a=1&b=2')
+        )
+        self.assertNotEquals(ResponseCache.get_key('http://jira/?a=1'), ResponseCache.get_key('http://jira/?a=2'))
+
+    def testStoreIsCommittedOnceRead(self):
+        """an entry should only exist once the response has been read until the end"""
+        key = ResponseCache.get_key('http://remote/url')
+        response = self.cache.store(key, 'http://remote/url', self.get_response('some data', {'ETag': '"abc"'}))
+        self.assertEquals('some', response.read(4))
+        self.assertIsNone(self.cache.get(key))
+        response.read(100)
+        response.read(100)
+
+        entry = self.cache.get(key)
+        self.assertEquals('some data', entry.open().read())
+        self.assertEquals({'If-None-Match': '"abc"'}, entry.get_validators())
+
+    def testStreamedResponseIsCommitted(self):
+        """a json report read by JsonArrayStream should be cached"""
+        key = ResponseCache.get_key('http://remote/url')
+        response = self.cache.store(key, 'http://remote/url', self.get_response('{"report": [1, 2]}\n'))
+        self.assertEquals([1, 2], list(JsonArrayStream(response, 'report', 4)))
+        response.close()
+
+        self.assertEquals('{"report": [1, 2]}\n', self.cache.get(key).open().read())
+        self.assertEquals([], [name for name in os.listdir(self.directory) if name.endswith('.tmp')])
+
+    def testEvictLeastRecentlyUsed(self):
+        """oldest entries should be removed when the cache is too big"""
+        for name in ['first', 'second', 'third']:
+            key = ResponseCache.get_key('http://remote/' + name)
+            self.cache.store(key, 'http://remote/' + name, self.get_response('x' * 400)).read()
+            os.utime(os.path.join(self.directory, key + '.body'), (time.time() - 10, time.time() - 10))
+            if name == 'first':
+                first_key = key
+        self.cache.touch(first_key)
+        self.cache.max_size = 1000
+        self.cache.evict()
+
+        self.assertIsNotNone(self.cache.get(first_key), 'recently used entry should be kept')
+        self.assertIsNone(self.cache.get(ResponseCache.get_key('http://remote/second')))
+
+    def testEvictTemporaryFiles(self):
+        """temporary files of interrupted downloads should be removed, the ones in progress kept"""
+        f, stale_path = self.cache.get_temporary_file()
+        f.close()
+        os.utime(stale_path, (time.time() - 7200, time.time() - 7200))
+        f, path = self.cache.get_temporary_file()
+        f.close()
+        self.cache.evict()
+
+        self.assertFalse(os.path.exists(stale_path))
+        self.assertTrue(os.path.exists(path))
+
+    def testRemoteRevalidation(self):
+        """a stale entry should be revalidated and served from cache on 304"""
+        remote = Remote('http://remote')
+        remote.cache = self.cache
+        remote.cache_ttl = 0
+        remote._request = MagicMock(return_value=self.get_response('data', {'Last-Modified': 'yesterday'}))
+        self.assertEquals('data', remote._open('url').read())
+
+        remote._request = MagicMock(return_value=self.get_response('', code=304))
+        self.assertEquals('data', remote._open('url').read())
+        self.assertEquals({'If-Modified-Since': 'yesterday'}, remote._request.call_args[1]['headers'])
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(ResponseCacheTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
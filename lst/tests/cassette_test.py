@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import urllib2
+import BaseHTTPServer
+
+from lst.cassette import Cassette
+from lst.remote import Remote
+
+
+class RecordedRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status = 404 if self.path.startswith('/missing') else 200
+        self._respond(status, 'GET %s' % self.path)
+
+    def do_POST(self):
+        self._respond(200, 'POST %s' % self.rfile.read(int(self.headers['Content-Length'])))
+
+    def _respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Set-Cookie', 'JSESSIONID=live-session; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CassetteTest(unittest.TestCase):
+    """Unit tests for cassette.py"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), RecordedRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.remote = Remote('http://127.0.0.1:%d' % self.server.server_address[1])
+
+    def tearDown(self):
+        Remote.cassette = None
+        Remote.connection_pool.close_all()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def testRecordThenReplay(self):
+        """recorded exchanges should be replayed without any network access"""
+        Remote.cassette = Cassette(self.directory, Cassette.RECORD)
+        self.assertEquals('GET /data?a=1&b=2', self.remote._request('data?a=1&b=2').read())
+        self.assertEquals('POST username=me&password=secret', self.remote._request('login', 'username=me&password=secret').read())
+        self.assertRaises(Exception, self.remote._request, 'missing')
+
+        # the server only handles one connection at a time: the pooled one must be closed first
+        Remote.connection_pool.close_all()
+        self.server.shutdown()
+        Remote.cassette = Cassette(self.directory, Cassette.REPLAY)
+        response = self.remote._request('data?b=2&a=1')
+        self.assertEquals('GET /data?a=1&b=2', response.read(), 'parameters order should not matter')
+        self.assertEquals('text/plain', response.info().getheader('Content-Type'))
+        self.assertEquals(
+            'POST username=me&password=secret',
+            self.remote._request('login', 'username=me&password=other').read(),
+            'credentials should not be part of the key'
+        )
+        self.assertRaises(Exception, self.remote._request, 'missing')
+        self.assertRaises(Exception, self.remote._request, 'never-recorded')
+
+    def testSecretsAreNotRecorded(self):
+        """session cookies should not be recorded, json credentials should not be part of the key"""
+        Remote.cassette = Cassette(self.directory, Cassette.RECORD)
+        self.remote._request('data').read()
+        for name in os.listdir(self.directory):
+            self.assertNotIn('live-session', open(os.path.join(self.directory, name)).read())
+
+        login = json.dumps({'username': 'me', 'password': 'secret'})
+        other_login = json.dumps({'password': 'other', 'username': 'you'})
+        self.assertEquals(
+            Cassette.get_key(self.remote._get_request('rest/auth/1/session', login)),
+            Cassette.get_key(self.remote._get_request('rest/auth/1/session', other_login))
+        )
+
+    def testReplayLatency(self):
+        """replayed responses should be delayed by the given latency"""
+        Remote.cassette = Cassette(self.directory, Cassette.RECORD)
+        self.remote._request('data').read()
+
+        Remote.cassette = Cassette(self.directory, Cassette.REPLAY, '0.2')
+        start = time.time()
+        self.remote._request('data').read()
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+        request = urllib2.Request(self.remote.base_url + '/data')
+        self.assertEquals(Cassette.get_key(request), Cassette.get_key(self.remote._get_request('data')))
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(CassetteTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
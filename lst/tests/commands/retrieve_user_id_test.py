@@ -1,5 +1,7 @@
+import sys
 import unittest
-from mock import Mock, MagicMock
+from StringIO import StringIO
+from mock import Mock, MagicMock, patch
 
 from lst.tests.mock_helper import MockHelper
 
@@ -14,6 +16,7 @@ class RetrieveUserIdTest(unittest.TestCase):
         {'employee_lastname': 'prodon', 'employee_firstname': 'laurent', 'id': 1},
         {'employee_lastname': 'mao', 'employee_firstname': 'rolf', 'id': 2},
         {'employee_lastname': 'tsetung', 'employee_firstname': 'mao', 'id': 3},
+        {'employee_lastname': u'M\xfcller', 'employee_firstname': 'hans', 'id': 4},
     ]
 
     def testSingleUser(self):
@@ -61,6 +64,49 @@ class RetrieveUserIdTest(unittest.TestCase):
 
         self.assertEquals((expected_result, ['prodon', 'tsetung']), output_mock.call_args[0])
 
+    def testSuggestions(self):
+        """similar names should be suggested for unknown last names"""
+
+        # mock user arguments
+        mock_helper = MockHelper()
+        mock_helper.lastname = ['prodom']
+
+        # mock the zebra manager and its return values
+        zebra_manager = mock_helper.get_zebra_manager()
+        zebra_manager.get_all_users = MagicMock(return_value=self.mock_users)
+
+        command = RetrieveUserIdCommand()
+        command.get_zebra_manager = MagicMock(return_value=zebra_manager)
+
+        # run the command
+        output_mock = command._output = Mock()
+        suggestions_mock = command._output_suggestions = Mock()
+        command.run(mock_helper)
+
+        self.assertEquals(([], ['prodom']), output_mock.call_args[0])
+        self.assertEquals(('prodom', [self.mock_users[0]]), suggestions_mock.call_args[0])
+
+    def testNonAsciiName(self):
+        """non ascii last names given on the command line should be found and printed"""
+
+        # mock user arguments (utf-8 encoded, as read from the command line)
+        mock_helper = MockHelper()
+        mock_helper.lastname = ['m\xc3\xbcller', 'm\xc3\xbcler']
+
+        # mock the zebra manager and its return values
+        zebra_manager = mock_helper.get_zebra_manager()
+        zebra_manager.get_all_users = MagicMock(return_value=self.mock_users)
+
+        command = RetrieveUserIdCommand()
+        command.get_zebra_manager = MagicMock(return_value=zebra_manager)
+
+        # run the command
+        with patch.object(sys, 'stdout', StringIO()) as output:
+            command.run(mock_helper)
+
+        self.assertIn(u'did you mean: M\xfcller (hans)', output.getvalue())
+        self.assertIn(u'found M\xfcller (hans) with id 4', output.getvalue())
+
     def testIOProblem(self):
         """should raise an IOError"""
 
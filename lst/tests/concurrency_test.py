@@ -0,0 +1,93 @@
+import sys
+import threading
+import time
+import unittest
+
+from lst.concurrency import Future, TaskQueue
+
+
+class TaskQueueTest(unittest.TestCase):
+    """Unit tests for TaskQueue in concurrency.py"""
+
+    def testConcurrencyIsLimited(self):
+        """no more than max_concurrency calls should run at the same time, all scheduled calls should complete"""
+        tasks = TaskQueue(3)
+        lock = threading.Lock()
+        counters = {'running': 0, 'max': 0}
+
+        def call(value):
+            with lock:
+                counters['running'] += 1
+                counters['max'] = max(counters['max'], counters['running'])
+            time.sleep(0.01)
+            with lock:
+                counters['running'] -= 1
+            return value * 2
+
+        futures = [tasks.schedule(call, i) for i in range(30)]
+
+        self.assertEquals([i * 2 for i in range(30)], [future.get(5) for future in futures])
+        self.assertEquals(3, counters['max'])
+
+    def testCallbacksCanWait(self):
+        """a callback waiting for calls scheduled on the same queue should not block it"""
+        tasks = TaskQueue(1)
+        future = tasks.schedule(lambda: 1).then(lambda value: tasks.schedule(lambda: value + 1).get(5))
+        self.assertEquals(2, future.get(5))
+
+    def testInitializers(self):
+        """initializers should run before each call, with the ident of the thread which scheduled it"""
+        idents = []
+        tasks = TaskQueue(2, [idents.append])
+        Future.gather([tasks.schedule(lambda: None) for i in range(3)]).get(5)
+        self.assertEquals([threading.current_thread().ident] * 3, idents)
+
+
+class FutureTest(unittest.TestCase):
+    """Unit tests for Future in concurrency.py"""
+
+    def resolve_later(self, future, value):
+        timer = threading.Timer(0.05, future.set_result, (value,))
+        timer.start()
+
+    def testGatherAndThen(self):
+        """gathered results should keep their order, chained functions get the result"""
+        futures = [Future() for i in range(3)]
+        gathered = Future.gather(futures, sum).then(lambda total: total * 10)
+        for i, future in enumerate(reversed(futures)):
+            self.resolve_later(future, i + 1)
+
+        self.assertEquals(60, gathered.get(5))
+        self.assertEquals([], Future.gather([]).get())
+
+        inner = Future()
+        flattened = Future.gather([]).then(lambda value: inner)
+        self.resolve_later(inner, 'inner')
+        self.assertEquals('inner', flattened.get(5), 'a future returned by then should be waited for')
+
+    def testErrors(self):
+        """errors should be raised by get, and propagated to gathered and chained futures"""
+        failing = Future()
+        try:
+            raise ValueError('oops')
+        except ValueError:
+            failing.set_exception(sys.exc_info())
+        succeeding = Future()
+        succeeding.set_result(1)
+
+        self.assertRaises(ValueError, failing.get)
+        self.assertRaises(ValueError, Future.gather([succeeding, failing]).get)
+        self.assertRaises(ValueError, failing.then(lambda value: value).get)
+        self.assertRaises(ZeroDivisionError, succeeding.then(lambda value: value / 0).get)
+        self.assertRaises(RuntimeError, Future().get, 0.2)
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TaskQueueTest))
+    suite.addTest(loader.loadTestsFromTestCase(FutureTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
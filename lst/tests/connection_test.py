@@ -0,0 +1,170 @@
+import threading
+import unittest
+import zlib
+import BaseHTTPServer
+from StringIO import StringIO
+import urllib2
+from mock import MagicMock, patch
+
+from lst.connection import ConnectionPool, KeepAliveHandler
+from lst.remote import Remote
+
+
+class KeepAliveRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = 'client port %d' % self.client_address[1]
+        if self.path.endswith('/big'):
+            body += ' ' * 20000
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    """Unit tests for connection.py"""
+
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), KeepAliveRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base_url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        Remote.connection_pool.close_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testConnectionIsReused(self):
+        """consecutive requests should go through the same tcp connection"""
+        remote = Remote(self.base_url)
+        first = remote._request('first').read()
+        second = remote._request('second').read()
+        self.assertEquals(first, second)
+
+    def testSharedInstance(self):
+        """the same remote instance should be returned for the same backend"""
+        remote = Remote.get_shared_instance(self.base_url)
+        self.assertIs(remote, Remote.get_shared_instance(self.base_url))
+        self.assertIsNot(remote, Remote.get_shared_instance(self.base_url + '/other'))
+
+    def testConnectionReleasedOnClose(self):
+        """a response closed before its end should still give its connection back to the pool"""
+        remote = Remote(self.base_url)
+        response = remote._request('big')
+        first = response.read(16)
+        response.close()
+
+        self.assertEquals(1, sum([len(idle) for idle in Remote.connection_pool._idle.values()]))
+        self.assertEquals(first, remote._request('big').read(16))
+
+    def testProxyTunnel(self):
+        """https requests through a proxy should tunnel to the target host, with the proxy credentials"""
+        pool = MagicMock()
+        pool.get = MagicMock(side_effect=ValueError('stop'))
+        request = urllib2.Request('https://example.com/path')
+        request.timeout = 5
+        # as urllib2.ProxyHandler does
+        request.get_type()
+        request.get_host()
+        request.set_proxy('proxy:3128', 'https')
+        request.add_header('Proxy-Authorization', 'Basic xx')
+
+        self.assertRaises(ValueError, KeepAliveHandler(pool).https_open, request)
+        pool.get.assert_called_with('https', 'proxy:3128', 5, ('example.com', {'Proxy-Authorization': 'Basic xx'}))
+
+        connection = ConnectionPool().connect('https', 'proxy:3128', 5, ('example.com', {}))
+        self.assertEquals('example.com', connection._tunnel_host)
+
+
+class CompressedRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    body = ''.join(['line %d of a verbose response\n' % i for i in range(5000)])
+
+    def do_GET(self):
+        encoding = self.path.strip('/')
+        if encoding == 'accept-encoding':
+            body = self.headers.get('Accept-Encoding', '')
+            encoding = None
+        elif encoding == 'gzip':
+            compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(self.body) + compressor.flush()
+        elif encoding == 'deflate':
+            body = zlib.compress(self.body)
+        elif encoding == 'raw-deflate':
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+            body = compressor.compress(self.body) + compressor.flush()
+            encoding = 'deflate'
+        else:
+            body = self.body
+            encoding = None
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CompressionTest(unittest.TestCase):
+    """Unit tests for CompressionHandler in connection.py"""
+
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), CompressedRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.remote = Remote('http://127.0.0.1:%d' % self.server.server_address[1])
+
+    def tearDown(self):
+        Remote.debug = False
+        Remote.connection_pool.close_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testAcceptEncoding(self):
+        """compressed responses should be asked for"""
+        self.assertEquals('gzip, deflate', self.remote._request('accept-encoding').read())
+
+    def testDecompression(self):
+        """compressed responses should be decompressed while they are read"""
+        for encoding in ['gzip', 'deflate', 'raw-deflate', 'identity']:
+            response = self.remote._request(encoding)
+            self.assertIsNone(response.info().getheader('Content-Encoding'))
+            self.assertEquals('line 0 of a verbose response\n', response.readline())
+            self.assertEquals('line 1', response.read(6))
+            self.assertEquals(CompressedRequestHandler.body[35:], response.read(), encoding)
+
+    def testDebugOutput(self):
+        """transfer sizes should be printed in debug mode"""
+        Remote.debug = True
+        with patch('sys.stdout', new_callable=StringIO) as output:
+            self.remote._request('gzip').read()
+
+        self.assertRegexpMatches(
+            output.getvalue(),
+            r'remote response: \d+ bytes received \(gzip\), %d bytes decompressed' % len(CompressedRequestHandler.body)
+        )
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(ConnectionPoolTest))
+    suite.addTest(loader.loadTestsFromTestCase(CompressionTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -0,0 +1,453 @@
+"""
+Local stand-in for Jira and Zebra, serving synthetic data generated from a seed.
+Used for load and concurrency testing (see load_test.py), it can also be started on its own:
+
+    python -m lst.tests.fake_server --stories 5000 --timesheets 500000 --latency 0.05
+
+then point the jira and zebra urls of your .lst-secret.yml to the printed url
+"""
+import argparse
+import datetime
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import urlparse
+import zlib
+import BaseHTTPServer
+import Cookie
+import SocketServer
+from xml.sax.saxutils import escape
+
+
+class FakeDataSet(object):
+    """
+    Synthetic stories and timesheets of one sprint, always the same for a given seed
+    """
+    project_id = 12345
+    project_key = 'XX'
+    sprint_name = 'Load+Test'
+    nice_identifier = '(NICE)'
+    closed_status = (6, 'closed')
+    open_status = (1, 'Open')
+    story_points_field = 'customfield_10040'
+    business_value_field = 'customfield_10064'
+
+    def __init__(self, seed=1, stories=100, timesheets=1000, users=10,
+                 start_date=datetime.date(2014, 3, 3), end_date=datetime.date(2014, 3, 14)):
+        """
+        :param seed:int
+        :param stories:int nb of stories in the sprint
+        :param timesheets:int nb of timesheet entries in the sprint
+        :param users:int nb of zebra users
+        :param start_date:date sprint start
+        :param end_date:date sprint end
+        """
+        self.seed = seed
+        self.nb_timesheets = timesheets
+        self.start_date = start_date
+        self.end_date = end_date
+        self.days = (end_date - start_date).days + 1
+
+        rng = random.Random(seed)
+        self.users = [
+            {'id': i + 1, 'employee_firstname': 'first%d' % (i + 1), 'employee_lastname': 'last%d' % (i + 1)}
+            for i in range(users)
+        ]
+
+        # (key, title, status, story points, business value, close datetime)
+        self.stories = []
+        for i in range(1, stories + 1):
+            is_closed = rng.random() < 0.6
+            close_date = None
+            if is_closed:
+                close_date = datetime.datetime.combine(
+                    start_date + datetime.timedelta(days=rng.randrange(self.days)),
+                    datetime.time(rng.randrange(8, 18), rng.randrange(60))
+                )
+            self.stories.append((
+                '%s-%d' % (self.project_key, i),
+                'Story %d%s' % (i, ' ' + self.nice_identifier if rng.random() < 0.1 else ''),
+                self.closed_status if is_closed else self.open_status,
+                float(rng.choice([1, 2, 3, 5, 8])),
+                float(rng.choice([0, 100, 200, 300])),
+                close_date,
+            ))
+        self.story_index = dict([(story[0], story) for story in self.stories])
+
+    def iter_timesheets(self, start_date=None, end_date=None):
+        """
+        Generate the timesheet entries (zebra report format) between two dates
+
+        :param start_date:date
+        :param end_date:date
+        :return:generator of dicts
+        """
+        rng = random.Random(self.seed + 1)
+        for i in range(self.nb_timesheets):
+            date = self.start_date + datetime.timedelta(days=i * self.days // self.nb_timesheets)
+            user = rng.choice(self.users)
+            time_spent = rng.choice(['0.50', '1.00', '2.00', '4.00'])
+            story = rng.randrange(1, len(self.stories) + 1) if len(self.stories) > 0 else 0
+            if (start_date is not None and date < start_date) or (end_date is not None and date > end_date):
+                continue
+
+            yield {
+                'tid': str(i + 1),
+                'date': date.strftime('%Y-%m-%d 00:00:00'),
+                'time': time_spent,
+                'username': user['employee_firstname'],
+                'project': 'Project %s' % self.project_key,
+                'description': '%s-%d working on it' % (self.project_key, story),
+            }
+
+
+class FakeRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    chunk_size = 64 * 1024
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        fake = self.server.fake
+        # lst joins base urls and paths with an extra slash (which urlsplit would take for a host)
+        path, _, query = self.path.partition('?')
+        path = '/' + '/'.join([p for p in path.split('/') if p != ''])
+        query = urlparse.parse_qs(query)
+        body = None
+        if self.headers.get('Content-Length') is not None:
+            body = self.rfile.read(int(self.headers['Content-Length']))
+
+        routes = [
+            ('/rest/auth/1/session', self._jira_login),
+            ('/sr/', self._search_request),
+            ('/activity', self._activity),
+            ('/login/user/', self._login),
+            ('/timesheet/report/', self._timesheet_report),
+            ('/user/', self._users),
+        ]
+
+        with fake.slots:
+            fake.on_request(path)
+            try:
+                fake.wait()
+                if fake.is_error():
+                    return self._respond(500, 'text/plain', ['Internal Server Error'])
+
+                for prefix, route in routes:
+                    if path.startswith(prefix):
+                        return route(path, query, body)
+                self._respond(404, 'text/plain', ['Not Found'])
+            finally:
+                fake.on_response()
+
+    def _jira_login(self, path, query, body):
+        if not self.server.fake.jira_sessions:
+            return self._respond(404, 'text/plain', ['Not Found'])
+
+        session_id = self.server.fake.get_session_id()
+        self._respond(
+            200,
+            'application/json',
+            [json.dumps({'session': {'name': 'JSESSIONID', 'value': str(session_id)}})],
+            {'Set-Cookie': 'JSESSIONID=%d; path=/' % session_id}
+        )
+
+    def _is_jira_authenticated(self, query):
+        # jira serves anonymous requests as the 'anonymous' user (denied here, as for private projects)
+        cookie = Cookie.SimpleCookie(self.headers.get('Cookie') or '')
+        if 'JSESSIONID' in cookie and self.server.fake.is_session_valid(cookie['JSESSIONID'].value):
+            return True
+        if 'os_username' in query and 'os_password' in query:
+            return True
+        self._respond(401, 'text/plain', ['Unauthorized'], {'X-AUSERNAME': 'anonymous'})
+        return False
+
+    def _search_request(self, path, query, body):
+        if not self._is_jira_authenticated(query):
+            return
+        dataset = self.server.fake.dataset
+        max_results = int(query.get('tempMax', ['1000'])[0])
+        start = int(query.get('pager/start', ['0'])[0])
+        stories = dataset.stories[start:start + max_results]
+
+        def generate():
+            yield '<?xml version="1.0" encoding="UTF-8"?>\n<rss version="0.92"><channel><title>Fake JIRA</title>'
+            yield '<issue start="%d" end="%d" total="%d" />' % (start, start + len(stories), len(dataset.stories))
+            for key, title, status, story_points, business_value, close_date in stories:
+                yield (
+                    '<item><title>[%(key)s] %(title)s</title><key id="%(id)s">%(key)s</key>'
+                    '<summary>%(title)s</summary><status id="%(status_id)d">%(status)s</status>'
+                    '<project id="%(project_id)d" key="%(project_key)s">Project %(project_key)s</project>'
+                    '<fixVersion>%(sprint)s</fixVersion><customfields>'
+                    '<customfield id="%(sp_field)s"><customfieldvalues><customfieldvalue>%(sp)s</customfieldvalue>'
+                    '</customfieldvalues></customfield>'
+                    '<customfield id="%(bv_field)s"><customfieldvalues><customfieldvalue>%(bv)s</customfieldvalue>'
+                    '</customfieldvalues></customfield>'
+                    '</customfields></item>'
+                ) % {
+                    'key': key,
+                    'id': key.split('-')[1],
+                    'title': escape(title),
+                    'status_id': status[0],
+                    'status': status[1],
+                    'project_id': dataset.project_id,
+                    'project_key': dataset.project_key,
+                    'sprint': dataset.sprint_name.replace('+', ' '),
+                    'sp_field': dataset.story_points_field,
+                    'sp': story_points,
+                    'bv_field': dataset.business_value_field,
+                    'bv': business_value,
+                }
+            yield '</channel></rss>'
+
+        self._respond(200, 'text/xml;charset=UTF-8', generate())
+
+    def _activity(self, path, query, body):
+        if not self._is_jira_authenticated(query):
+            return
+        dataset = self.server.fake.dataset
+        streams = query.get('streams', [''])[0].split()
+        ids = streams[2:] if streams[:2] == ['issue-key', 'IS'] else []
+
+        def generate():
+            yield '<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom" ' \
+                  'xmlns:activity="http://activitystrea.ms/spec/1.0/">'
+            for id in ids:
+                story = dataset.story_index.get(id.upper())
+                if story is None or story[5] is None:
+                    continue
+                yield (
+                    '<entry><title type="html">someone changed the status to %(status)s on %(key)s</title>'
+                    '<published>%(published)s</published><category term="%(status)s"/>'
+                    '<activity:object><title type="text">%(key)s</title></activity:object></entry>'
+                    '<entry><title type="html">someone commented on %(key)s</title>'
+                    '<published>%(published)s</published>'
+                    '<activity:target><title type="text">%(key)s</title></activity:target></entry>'
+                ) % {
+                    'key': story[0],
+                    'status': story[2][1],
+                    'published': story[5].strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                }
+            yield '</feed>'
+
+        self._respond(200, 'application/atom+xml;charset=UTF-8', generate())
+
+    def _login(self, path, query, body):
+        self._respond(
+            200,
+            'application/json',
+            [json.dumps({'command': {'success': True}})],
+            {'Set-Cookie': 'zebra_session=%d; path=/' % self.server.fake.get_session_id()}
+        )
+
+    def _timesheet_report(self, path, query, body):
+        if not self._is_logged_in():
+            return
+        dataset = self.server.fake.dataset
+        start_date = self._parse_date(query.get('start', [None])[0])
+        end_date = self._parse_date(query.get('end', [None])[0])
+
+        def generate():
+            yield '{"command": {"reports": {"report": ['
+            separator = ''
+            for entry in dataset.iter_timesheets(start_date, end_date):
+                yield separator + json.dumps(entry)
+                separator = ','
+            yield ']}}}'
+
+        self._respond(200, 'application/json', generate())
+
+    def _users(self, path, query, body):
+        if not self._is_logged_in():
+            return
+        users = self.server.fake.dataset.users
+        self._respond(200, 'application/json', [json.dumps({'command': {'users': {'user': users}}})])
+
+    def _is_logged_in(self):
+        # zebra sends the login page to anonymous users (or when their session expired)
+        cookie = Cookie.SimpleCookie(self.headers.get('Cookie') or '')
+        if 'zebra_session' in cookie and self.server.fake.is_session_valid(cookie['zebra_session'].value):
+            return True
+        self._respond(200, 'text/html', ['<html><body>Please login</body></html>'])
+        return False
+
+    def _parse_date(self, date):
+        if date is None:
+            return None
+        return datetime.datetime.strptime(date, '%Y-%m-%d').date()
+
+    def _respond(self, status, content_type, parts, headers=None):
+        """
+        Send a chunked response (bodies are generated while they are sent)
+
+        :param parts:iterable of strings
+        """
+        compressor = None
+        if self.server.fake.compression and 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        if compressor is not None:
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        buffer = []
+        size = 0
+        for part in parts:
+            buffer.append(part)
+            size += len(part)
+            if size >= self.chunk_size:
+                self._write_chunk(''.join(buffer), compressor)
+                buffer = []
+                size = 0
+        self._write_chunk(''.join(buffer), compressor, True)
+        self.wfile.write('0\r\n\r\n')
+
+    def _write_chunk(self, data, compressor=None, last=False):
+        if compressor is not None:
+            data = compressor.compress(data) + (compressor.flush() if last else '')
+        if len(data) > 0:
+            self.wfile.write('%x\r\n%s\r\n' % (len(data), data))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients closing their connection without reading the whole response (ie. on errors) are expected
+        if isinstance(sys.exc_info()[1], socket.error):
+            return
+        BaseHTTPServer.HTTPServer.handle_error(self, request, client_address)
+
+
+class FakeServer(object):
+    """
+    Fake Jira and Zebra backend (both are served on the same url)
+    """
+    def __init__(self, dataset, latency=0, error_rate=0, max_concurrency=100, compression=True,
+                 jira_sessions=True, host='127.0.0.1', port=0):
+        """
+        :param dataset:FakeDataSet
+        :param latency:float nb of seconds added to each response
+        :param error_rate:float part of the requests answered with an error 500 (0 to 1)
+        :param max_concurrency:int max nb of requests handled at the same time, others wait for a free slot
+        :param compression:bool gzip responses when the client accepts it
+        :param jira_sessions:bool accept jira session authentication (otherwise credentials have to be sent with each request)
+        """
+        self.dataset = dataset
+        self.compression = compression
+        self.jira_sessions = jira_sessions
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.host = host
+        self.port = port
+        self.server = None
+
+        self._lock = threading.Lock()
+        self._random = random.Random(dataset.seed + 2)
+        self._session_id = 0
+        self._first_valid_session_id = 1
+        self.stats = {'requests': {}, 'running': 0, 'max_running': 0}
+
+    def start(self):
+        """
+        :return:string server url
+        """
+        self.server = ThreadingHTTPServer((self.host, self.port), FakeRequestHandler)
+        self.server.fake = self
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        return self.get_url()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_url(self):
+        return 'http://%s:%d' % self.server.server_address
+
+    def wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def is_error(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def get_session_id(self):
+        with self._lock:
+            self._session_id += 1
+            return self._session_id
+
+    def is_session_valid(self, session_id):
+        with self._lock:
+            return session_id.isdigit() and self._first_valid_session_id <= int(session_id) <= self._session_id
+
+    def expire_sessions(self):
+        """Make all current sessions expire (clients have to log in again)"""
+        with self._lock:
+            self._first_valid_session_id = self._session_id + 1
+
+    def on_request(self, path):
+        endpoint = '/'.join(path.split('/')[:2])
+        with self._lock:
+            self.stats['requests'][endpoint] = self.stats['requests'].get(endpoint, 0) + 1
+            self.stats['running'] += 1
+            self.stats['max_running'] = max(self.stats['max_running'], self.stats['running'])
+
+    def on_response(self):
+        with self._lock:
+            self.stats['running'] -= 1
+
+
+def add_server_arguments(parser):
+    parser.add_argument('--seed', type=int, default=1, help='seed of the generated data')
+    parser.add_argument('--stories', type=int, default=5000, help='nb of stories in the sprint')
+    parser.add_argument('--timesheets', type=int, default=500000, help='nb of timesheet entries in the sprint')
+    parser.add_argument('--latency', type=float, default=0.05, help='nb of seconds added to each response')
+    parser.add_argument('--error-rate', type=float, default=0, help='part of the requests failing (0 to 1)')
+    parser.add_argument('--max-concurrency', type=int, default=16, help='max nb of requests handled at once')
+    parser.add_argument('--no-compression', action='store_true', help="don't gzip responses")
+
+
+def get_server(args, port=0):
+    dataset = FakeDataSet(args.seed, args.stories, args.timesheets)
+    return FakeServer(
+        dataset, args.latency, args.error_rate, args.max_concurrency, not args.no_compression, port=port
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Jira and Zebra server')
+    add_server_arguments(parser)
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    server = get_server(args, args.port)
+    print 'Fake Jira and Zebra listening on %s (ctrl-c to stop)' % server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print 'Requests: %s' % server.stats['requests']
+
+if __name__ == '__main__':
+    main()
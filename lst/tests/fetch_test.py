@@ -0,0 +1,81 @@
+import sys
+import threading
+import time
+import unittest
+from StringIO import StringIO
+
+from lst.errors import FetchError
+from lst.fetch import FetchOrchestrator
+from lst.helpers import ConcurrencyHelper
+
+
+class FetchOrchestratorTest(unittest.TestCase):
+    """Unit tests for fetch.py"""
+
+    def setUp(self):
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def slow_task(self, value):
+        print 'slow task started'
+        time.sleep(0.2)
+        print 'slow task ended'
+        return value
+
+    def fast_task(self, value):
+        # output from worker threads should be kept in the task output
+        def work(item):
+            print 'fast task item %d' % item
+            return item
+        return ConcurrencyHelper.map(work, value, 2)
+
+    def failing_task(self, message):
+        raise ValueError(message)
+
+    def testTasksRunConcurrently(self):
+        """tasks should run at the same time, and their output be printed in order"""
+        start = time.time()
+        results = FetchOrchestrator() \
+            .add('Slow', self.slow_task, 'slow') \
+            .add('Fast', self.fast_task, [1, 2]) \
+            .add('Slow bis', self.slow_task, 'slow bis') \
+            .run()
+
+        self.assertLess(time.time() - start, 0.35)
+        self.assertEquals({'Slow': 'slow', 'Fast': [1, 2], 'Slow bis': 'slow bis'}, results)
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEquals(['Start fetching Slow', 'slow task started', 'slow task ended', 'End Slow'], lines[:4])
+        self.assertEquals(['Start fetching Fast', 'End Fast'], [lines[4], lines[7]])
+        self.assertEquals(['fast task item 1', 'fast task item 2'], sorted(lines[5:7]))
+
+    def testWorkerInitializer(self):
+        """an initializer should run before each call, with the ident of the calling thread"""
+        idents = []
+        self.assertEquals([1, 2, 3], ConcurrencyHelper.map(lambda item: item, [1, 2, 3], 2, initializer=idents.append))
+        self.assertEquals([threading.current_thread().ident] * 3, idents)
+
+    def testErrors(self):
+        """a single error should be raised as is, multiple errors should all be reported"""
+        orchestrator = FetchOrchestrator().add('Fast', self.fast_task, [1]).add('Failing', self.failing_task, 'oops')
+        self.assertRaises(ValueError, orchestrator.run)
+
+        orchestrator.add('Other', self.failing_task, 'oh no')
+        try:
+            orchestrator.run()
+            self.fail('a FetchError should be raised')
+        except FetchError as e:
+            self.assertIn('Failing: oops', str(e))
+            self.assertIn('Other: oh no', str(e))
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(FetchOrchestratorTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -79,6 +79,16 @@ class ZebraHelperTest(unittest.TestCase):
     def testGetActivityId(self):
         self.assertEquals('basepath/timesheet/123', ZebraHelper.get_activity_url('basepath', 123))
 
+    def testParseDate(self):
+        """zebra dates should be decoded without dateutil (days <= 12 included), other formats with dateutil"""
+        self.assertEquals(datetime.date(2013, 5, 4), ZebraHelper.parse_date('2013-05-04 00:00:00'))
+        self.assertEquals(datetime.date(2013, 5, 24), ZebraHelper.parse_date('2013-05-24'))
+        self.assertIs(ZebraHelper.parse_date('2013-05-24'), ZebraHelper.parse_date('2013-05-24'))
+        with mock.patch('dateutil.parser.parse') as parse:
+            ZebraHelper.parse_date('2013-05-22 00:00:00')
+            self.assertFalse(parse.called)
+        self.assertEquals(datetime.date(2013, 5, 4), ZebraHelper.parse_date('04.05.2013'))
+
 
 class JiraHelperTest(unittest.TestCase):
     """Unit test for JiraHelper in helpers.py"""
@@ -88,6 +98,15 @@ class JiraHelperTest(unittest.TestCase):
             'my+sprint+name',
             JiraHelper.sanitize_sprint_name('my sprint name')
         )
+
+    def testParseDate(self):
+        """activity stream dates should be decoded year first (days <= 12 included), with their time zone"""
+        date = JiraHelper.parse_date('2013-05-04T09:15:46.000Z')
+        self.assertEquals(datetime.datetime(2013, 5, 4, 9, 15, 46), date.replace(tzinfo=None))
+        self.assertEquals(datetime.timedelta(0), date.utcoffset())
+        date = JiraHelper.parse_date('2013-05-04T09:15:46+02:00')
+        self.assertEquals(datetime.datetime(2013, 5, 4, 7, 15, 46), (date - date.utcoffset()).replace(tzinfo=None))
+        self.assertEquals(datetime.datetime(2013, 5, 4, 9, 15), JiraHelper.parse_date('2013-05-04 09:15'))
         self.assertEquals(
             'MySprintName',
             JiraHelper.sanitize_sprint_name('MySprintName')
@@ -0,0 +1,269 @@
+import datetime
+import pickle
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from mock import MagicMock
+
+from lst.tests.mock_helper import MockHelper
+
+from lst.models import AppContainer
+from lst.models.jiraModels import Story, StoryCollection
+from lst.remote import AsyncJiraRemote
+from lst.sync import SyncStore
+
+
+class JiraManagerTest(unittest.TestCase):
+    """Unit tests for JiraManager"""
+
+    def setUp(self):
+        self.mock_helper = MockHelper()
+        AppContainer.secret.get_jira = MagicMock(side_effect=lambda key, default=None: default)
+
+    def testParseStories(self):
+        """should parse all items of a jira xml response"""
+        jira_manager = self.mock_helper.get_jira_manager()
+        stories = jira_manager.parse_stories(open('lst/tests/jira_project.xml'), nice_identifier='(NICE)')
+
+        self.assertEquals(1, len(stories))
+        self.assertEquals('XX-112', stories[0].id)
+        self.assertEquals(6, stories[0].status)
+        self.assertEquals('10636', stories[0].project_id)
+        self.assertEquals('Sprint name', stories[0].sprint_name)
+        self.assertFalse(stories[0].is_nice)
+
+    def testParseSummary(self):
+        """the summary should be used to find nice to have stories when there is no title"""
+        xml = StringIO('<rss><channel><item><key>XX-1</key><summary>Story (NICE)</summary></item></channel></rss>')
+        self.assertTrue(self.mock_helper.get_jira_manager().parse_stories(xml, nice_identifier='(NICE)')[0].is_nice)
+
+    def testParseStoriesIgnored(self):
+        """ignored stories should be left out"""
+        jira_manager = self.mock_helper.get_jira_manager()
+        self.assertEquals(0, len(jira_manager.parse_stories(open('lst/tests/jira_project.xml'), ignored=['XX-112'])))
+
+    def get_page(self, start, end, total):
+        items = ''.join([
+            '<item><key>XX-%d</key><title>Story %d</title><status id="1">Open</status></item>' % (i, i)
+            for i in range(start, end)
+        ])
+        return StringIO(
+            '<rss><channel><issue start="%d" end="%d" total="%d"/>%s</channel></rss>' % (start, end, total, items)
+        )
+
+    def testPagination(self):
+        """all pages should be fetched and merged in order, with their warnings"""
+        jira_manager = self.mock_helper.get_jira_manager()
+        fields = jira_manager._get_field_projection()
+        remote = AsyncJiraRemote('http://jira', 'user', 'pass')
+        remote.get_stream = MagicMock(side_effect=lambda url: {
+            'url' + fields: self.get_page(0, 4, 10),
+            'url' + fields + '&pager/start=4': self.get_page(4, 8, 10),
+            # XX-7 moved to the last page while paginating
+            'url' + fields + '&pager/start=8': self.get_page(7, 10, 10),
+        }[url])
+        jira_manager._get_async_jira_remote = MagicMock(return_value=remote)
+        jira_manager._print_warnings = MagicMock()
+
+        stories = jira_manager.get_stories_by_url('url', ignored=['XX-5'])
+        self.assertEquals(['XX-%d' % i for i in range(10) if i != 5], [s.id for s in stories])
+        warnings = jira_manager._print_warnings.call_args[0][0]
+        self.assertEquals(['XX-5'], warnings['ignored'])
+        self.assertEquals([s.id for s in stories], warnings['story_points'])
+
+    def testStoryIds(self):
+        """only the keys of all pages should be requested"""
+        jira_manager = self.mock_helper.get_jira_manager()
+        remote = MagicMock()
+        remote.get_stream = MagicMock(side_effect=lambda url: {
+            'url&field=key': self.get_page(0, 4, 6),
+            'url&field=key&pager/start=4': self.get_page(4, 6, 6),
+        }[url])
+        jira_manager._get_jira_remote = MagicMock(return_value=remote)
+
+        self.assertEquals(set(['XX-%d' % i for i in range(6)]), jira_manager.get_story_ids_by_url('url'))
+
+    def testFieldProjection(self):
+        """only the fields read by the parser should be requested, with configurable custom fields"""
+        AppContainer.secret.get_jira = MagicMock(side_effect=lambda key, default=None: {
+            'story_points_field': 10001,
+        }.get(key, default))
+        jira_manager = self.mock_helper.get_jira_manager()
+        self.assertEquals(
+            '&field=key&field=summary&field=status&field=project&field=fixVersions'
+            '&field=customfield_10001&field=customfield_10064',
+            jira_manager._get_field_projection()
+        )
+
+    def testCustomFields(self):
+        """story points and business value should be read from the configured custom fields"""
+        AppContainer.secret.get_jira = MagicMock(side_effect=lambda key, default=None: {
+            'story_points_field': 'customfield_1',
+            'business_value_field': 'customfield_2',
+        }.get(key, default))
+        xml = StringIO(
+            '<rss><channel><item><key>XX-1</key><status id="1">Open</status><customfields>'
+            '<customfield id="customfield_2"><customfieldvalues><customfieldvalue>20</customfieldvalue>'
+            '</customfieldvalues></customfield><customfield id="customfield_1"><customfieldvalues>'
+            '<customfieldvalue>3</customfieldvalue></customfieldvalues></customfield>'
+            '</customfields></item></channel></rss>'
+        )
+        story = self.mock_helper.get_jira_manager().parse_stories(xml)[0]
+        self.assertEquals(3, story.story_points)
+        self.assertEquals(20, story.business_value)
+
+    def testWarnings(self):
+        """ignored stories and missing values should be collected instead of printed one by one"""
+        jira_manager = self.mock_helper.get_jira_manager()
+        warnings = {}
+        stories = list(jira_manager.iter_stories(self.get_page(0, 4, 4), ignored=['XX-2'], warnings=warnings))
+
+        self.assertEquals(['XX-0', 'XX-1', 'XX-3'], [s.id for s in stories])
+        self.assertEquals(['XX-2'], warnings['ignored'])
+        self.assertEquals(['XX-0', 'XX-1', 'XX-3'], warnings['story_points'])
+        self.assertEquals(['XX-0', 'XX-1', 'XX-3'], warnings['business_value'])
+        self.assertEquals('XX-0, XX-1 and 1 more', jira_manager._format_ids(warnings['story_points'], 2))
+
+
+class JiraManagerSyncTest(unittest.TestCase):
+    """Unit tests for incremental syncs in JiraManager"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mock_helper = MockHelper()
+        AppContainer.sync_store = SyncStore(self.directory)
+        AppContainer.secret.get_jira = MagicMock(side_effect=lambda key, default=None: {
+            'incremental': True,
+        }.get(key, default))
+        Story.closed_status_ids = [6]
+
+        self.sprint = self.mock_helper.get_sprint()
+        self.sprint.jira_data = {'project_id': 1, 'sprint_name': 'sprint+1'}
+
+    def tearDown(self):
+        AppContainer.sync_store = None
+        shutil.rmtree(self.directory)
+
+    def get_stories(self, *stories):
+        collection = StoryCollection()
+        for id, status in stories:
+            story = Story()
+            story.id = id
+            story.status = status
+            collection.append(story)
+        return collection
+
+    def close_stories(self, stories):
+        for story in stories:
+            story.close_date = datetime.datetime(2014, 3, 3)
+        return [story for story in stories if story.id != 'XX-3']
+
+    def testIncrementalSync(self):
+        """only updated stories should be fetched, and only status changes post processed"""
+        jira_manager = self.mock_helper.get_jira_manager()
+        post_processor = MagicMock()
+        post_processor.post_process_all = MagicMock(side_effect=self.close_stories)
+
+        jira_manager.get_stories_by_url = MagicMock(return_value=self.get_stories(('XX-1', 6), ('XX-2', 1), ('XX-3', 6)))
+        jira_manager.get_story_ids_by_url = MagicMock()
+        stories = jira_manager._get_stories_for_sprint(self.sprint, post_processor)
+        self.assertEquals(['XX-1', 'XX-2'], [s.id for s in stories], 'XX-3 should be discarded')
+        self.assertNotIn('updated', jira_manager.get_stories_by_url.call_args[0][0])
+        self.assertFalse(jira_manager.get_story_ids_by_url.called, 'a full sync has all the sprint stories')
+
+        # second run: XX-1 got updated (same status), XX-2 got closed, XX-4 is new
+        jira_manager.get_stories_by_url = MagicMock(return_value=self.get_stories(('XX-1', 6), ('XX-2', 6), ('XX-4', 1)))
+        jira_manager.get_story_ids_by_url = MagicMock(return_value=set(['XX-1', 'XX-2', 'XX-3']))
+        stories = jira_manager._get_stories_for_sprint(self.sprint, post_processor)
+        self.assertIn("updated+%3E%3D+'-", jira_manager.get_stories_by_url.call_args[0][0])
+        self.assertEquals(['XX-2', 'XX-4'], [s.id for s in post_processor.post_process_all.call_args[0][0]])
+        self.assertEquals(['XX-1', 'XX-2', 'XX-4'], [s.id for s in stories])
+        self.assertEquals(datetime.datetime(2014, 3, 3), stories[0].close_date, 'close date should be kept if status did not change')
+        self.assertNotIn('updated', jira_manager.get_story_ids_by_url.call_args[0][0])
+
+        # third run: XX-1 moved to another sprint, XX-4 got deleted
+        jira_manager.get_stories_by_url = MagicMock(return_value=StoryCollection())
+        jira_manager.get_story_ids_by_url = MagicMock(return_value=set(['XX-2', 'XX-3']))
+        stories = jira_manager._get_stories_for_sprint(self.sprint, post_processor)
+        self.assertEquals(['XX-2'], [s.id for s in stories])
+
+        # fourth run: the closed statuses of the sprint changed, all stories are post processed again
+        self.sprint.jira_data['closed_statuses'] = {6: 'closed', 1: 'open'}
+        jira_manager.get_stories_by_url = MagicMock(return_value=self.get_stories(('XX-2', 6), ('XX-3', 1)))
+        jira_manager._get_stories_for_sprint(self.sprint, post_processor)
+        self.assertNotIn('updated', jira_manager.get_stories_by_url.call_args[0][0])
+        self.assertEquals(['XX-2', 'XX-3'], [s.id for s in post_processor.post_process_all.call_args[0][0]])
+
+
+class StoryCollectionTest(unittest.TestCase):
+    """Unit tests for the totals kept by StoryCollection"""
+
+    def setUp(self):
+        Story.closed_status_ids = [6]
+
+    def get_story(self, id, status, story_points, business_value, close_day=None, is_nice=False):
+        story = Story()
+        story.id = id
+        story.status = status
+        story.story_points = story_points
+        story.business_value = business_value
+        story.close_date = None if close_day is None else datetime.datetime(2014, 3, close_day, 17)
+        story.is_nice = is_nice
+        return story
+
+    def testTotals(self):
+        """totals should follow added, replaced and removed stories, and not change when read again"""
+        stories = StoryCollection([
+            self.get_story('XX-1', 6, 3, 100, 3),
+            self.get_story('XX-2', 6, 5, 50, 3),
+            self.get_story('XX-3', 1, 8, 20),
+            self.get_story('XX-4', 6, 2, 10, 4, is_nice=True),
+        ])
+        for i in range(2):
+            self.assertEquals(16, stories.get_commited('sp'))
+            self.assertEquals(170, stories.get_commited('bv'))
+            self.assertEquals(10, stories.get_achieved_story_points())
+            self.assertEquals(160, stories.get_achieved_business_value())
+        self.assertEquals({'sp': 8, 'bv': 150}, stories.get_achievement_for_day('2014-03-03'))
+
+        stories[2] = self.get_story('XX-3', 6, 8, 20, 4)
+        stories.remove(stories[0])
+        self.assertEquals(13, stories.get_commited_story_points())
+        self.assertEquals(15, stories.get_achieved_story_points())
+        self.assertEquals({'sp': 5, 'bv': 50}, stories.get_achievement_for_day('2014-03-03'))
+        self.assertEquals({'sp': 10, 'bv': 30}, stories.get_achievement_for_day('2014-03-04'))
+
+        del stories[:1]
+        stories.append(self.get_story('XX-5', 1, 1, 1))
+        self.assertIsNone(stories.get_achievement_for_day('2014-03-03'))
+        self.assertEquals(9, stories.get_commited_story_points())
+
+    def testChanges(self):
+        """closed statuses changes and refreshed stories should be taken into account, even once unpickled"""
+        story = self.get_story('XX-1', 1, 3, 100)
+        stories = StoryCollection([story])
+        self.assertEquals(0, stories.get_achieved_story_points())
+
+        Story.closed_status_ids = [1]
+        self.assertEquals(3, stories.get_achieved_story_points())
+
+        story.close_date = datetime.datetime(2014, 3, 5)
+        stories.refresh(story)
+        self.assertEquals({'sp': 3, 'bv': 100}, stories.get_achievement_for_day('2014-03-05'))
+
+        stories = pickle.loads(pickle.dumps(stories, pickle.HIGHEST_PROTOCOL))
+        self.assertEquals(3, stories.get_achieved_story_points())
+        self.assertEquals(1, len(stories))
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(JiraManagerTest))
+    suite.addTest(loader.loadTestsFromTestCase(JiraManagerSyncTest))
+    suite.addTest(loader.loadTestsFromTestCase(StoryCollectionTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -0,0 +1,216 @@
+"""
+Load test harness: runs lst commands end to end against the fake Jira/Zebra server (see fake_server.py)
+
+    python -m lst.tests.load_test --stories 5000 --timesheets 500000 --latency 0.05
+
+each command is run in its own process (with a temporary home directory holding the config files),
+then its duration and the requests it made are printed
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from lst.tests.fake_server import FakeDataSet, FakeServer, add_server_arguments, get_server
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+SPRINT_NAME = 'load_test'
+
+CONFIG = """sprints:
+    %(sprint)s:
+        commited_man_days: %(man_days)d
+        zebra:
+            client_id: 1
+            activities: '*'
+            users: '*'
+            start_date: %(start_date)s
+            end_date: %(end_date)s
+            commit_prefix: '%(prefix)s-'
+        jira:
+            project_id: %(project_id)d
+            sprint_name: "%(sprint_name)s"
+            nice_identifier: "%(nice_identifier)s"
+"""
+
+SECRET = """zebra:
+    url: "%(url)s"
+    username: load
+    password: test
+jira:
+    url: "%(url)s"
+    username: load
+    password: test
+output_dir: %(output_dir)s
+cache_dir: %(cache_dir)s
+"""
+
+
+def get_commands(dataset):
+    """
+    :param dataset:FakeDataSet
+    :return:list of (name, command line arguments)
+    """
+    return [
+        ('sprint-burnup', ['sprint-burnup', SPRINT_NAME, '-d', dataset.end_date.strftime('%d.%m.%Y')]),
+        ('result-per-story', ['result-per-story', SPRINT_NAME]),
+        ('check-hours', [
+            'check-hours', '-d', dataset.start_date.strftime('%d.%m.%Y'), dataset.end_date.strftime('%d.%m.%Y')
+        ]),
+        ('get-user-id', ['get-user-id', dataset.users[0]['employee_lastname']]),
+        ('get-last-zebra-day', ['get-last-zebra-day', SPRINT_NAME]),
+    ]
+
+
+def write_config(home, server):
+    """
+    Write the lst config files pointing to the fake server
+
+    :param home:string home directory
+    :param server:FakeServer
+    """
+    dataset = server.dataset
+    output_dir = os.path.join(home, 'output')
+    os.makedirs(output_dir)
+
+    with open(os.path.join(home, '.lst.yml'), 'w') as f:
+        f.write(CONFIG % {
+            'sprint': SPRINT_NAME,
+            'man_days': max(1, dataset.nb_timesheets / 8),
+            'start_date': dataset.start_date,
+            'end_date': dataset.end_date,
+            'prefix': dataset.project_key,
+            'project_id': dataset.project_id,
+            'sprint_name': dataset.sprint_name,
+            'nice_identifier': dataset.nice_identifier,
+        })
+    with open(os.path.join(home, '.lst-secret.yml'), 'w') as f:
+        f.write(SECRET % {
+            'url': server.get_url(),
+            'output_dir': output_dir,
+            'cache_dir': os.path.join(home, 'cache'),
+        })
+
+
+def run_command(home, arguments):
+    """
+    Run lst in its own process
+
+    :param home:string home directory holding the config files
+    :param arguments:list command line arguments
+    :return:tuple (return code, output, duration in seconds)
+    """
+    env = dict(os.environ)
+    env['HOME'] = home
+    env['PYTHONPATH'] = ROOT_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    # graphs are written with the locale encoding
+    env.setdefault('LANG', 'C.UTF-8')
+
+    start = time.time()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, 'bin', 'lst')] + arguments,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT
+    )
+    output = process.communicate()[0]
+
+    return process.returncode, output, time.time() - start
+
+
+def run(server, commands, extra_arguments=None):
+    """
+    Run commands against a fake server
+
+    :param server:FakeServer started server
+    :param commands:list of (name, command line arguments) (see get_commands)
+    :param extra_arguments:list arguments added to each command (ie. --no-cache)
+    :return:list of dicts (name, code, output, duration, requests)
+    """
+    results = []
+    home = tempfile.mkdtemp()
+    try:
+        write_config(home, server)
+        for name, arguments in commands:
+            server.stats['requests'] = {}
+            code, output, duration = run_command(home, arguments + (extra_arguments or []))
+            results.append({
+                'name': name,
+                'code': code,
+                'output': output,
+                'duration': duration,
+                'requests': dict(server.stats['requests']),
+            })
+    finally:
+        shutil.rmtree(home)
+
+    return results
+
+
+class LoadTest(unittest.TestCase):
+    """Runs all commands against a small fake dataset (use main() for real load tests)"""
+
+    def setUp(self):
+        self.server = FakeServer(FakeDataSet(seed=1, stories=30, timesheets=300), max_concurrency=4)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def testCommands(self):
+        """every command should run successfully against the fake server"""
+        results = run(self.server, get_commands(self.server.dataset), ['--no-cache'])
+
+        for result in results:
+            self.assertEquals(0, result['code'], '%s failed:\n%s' % (result['name'], result['output']))
+        outputs = dict([(result['name'], result['output']) for result in results])
+        self.assertIn('Your graph is available at', outputs['sprint-burnup'])
+        self.assertGreater(results[0]['requests']['/activity'], 0, 'close dates should be fetched')
+        self.assertIn('found last1 (first1) with id 1', outputs['get-user-id'])
+        self.assertIn('last date for sprint %s: 2014-03-14' % SPRINT_NAME, outputs['get-last-zebra-day'])
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(LoadTest))
+    return suite
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run lst commands against a fake Jira/Zebra server')
+    add_server_arguments(parser)
+    parser.add_argument('--command', action='append', help='command to run (default: all)')
+    parser.add_argument('--cache', action='store_true', help='use the http cache (disabled by default)')
+    args = parser.parse_args()
+
+    server = get_server(args)
+    print 'Generating data and starting fake server on %s' % server.start()
+    commands = [c for c in get_commands(server.dataset) if args.command is None or c[0] in args.command]
+
+    try:
+        results = run(server, commands, None if args.cache else ['--no-cache'])
+    finally:
+        server.stop()
+
+    print ''
+    print '{:<20} {:>10} {:>8}  {}'.format('command', 'seconds', 'status', 'requests')
+    for result in results:
+        print '{:<20} {:>10.2f} {:>8}  {}'.format(
+            result['name'],
+            result['duration'],
+            'ok' if result['code'] == 0 else 'failed',
+            ', '.join(['%s: %d' % item for item in sorted(result['requests'].items())])
+        )
+    for result in results:
+        if result['code'] != 0:
+            print ''
+            print '%s output:' % result['name']
+            print result['output']
+
+if __name__ == '__main__':
+    main()
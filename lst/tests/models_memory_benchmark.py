@@ -0,0 +1,128 @@
+"""
+Memory benchmark of timesheets: memory used by 1M TimeSheet objects, compared to the previous model
+(classic class with a __dict__, a datetime per entry and a copy of the username and project strings per entry)
+and to the columnar TimeSheetCollection
+
+    python -m lst.tests.models_memory_benchmark --timesheets 1000000
+
+each model is measured in its own process, from the growth of its resident memory
+"""
+import argparse
+import datetime
+import resource
+import subprocess
+import sys
+
+from lst.models.zebraModels import TimeSheet, TimeSheetCollection
+
+USERS = 200
+PROJECTS = 50
+DAYS = 365
+MODELS = ['legacy', 'current', 'columnar']
+
+
+class LegacyTimeSheet:
+    """
+    TimeSheet before it was slotted
+    """
+    def __init__(self):
+        self.username = None
+        self.time = 0
+        self.date = None
+        self.project = None
+        self.id = 0
+        self.description = None
+
+
+def build(model, nb_timesheets):
+    """
+    Build timesheets the way ZebraManager._parse_entry does (each parsed string is a new object)
+
+    :param model:string legacy, current or columnar
+    :param nb_timesheets:int
+    :return:list|TimeSheetCollection
+    """
+    first_day = datetime.date(2014, 1, 1).toordinal()
+    timesheets = TimeSheetCollection() if model == 'columnar' else []
+    for i in xrange(nb_timesheets):
+        username = u'user%d' % (i % USERS)
+        project = u'project %d' % (i % PROJECTS)
+        day = datetime.date.fromordinal(first_day + i % DAYS)
+
+        if model == 'columnar':
+            timesheets.add(
+                username.encode('utf-8'),
+                float(i % 8 + 1),
+                day.toordinal(),
+                project.encode('utf-8'),
+                i,
+                'XX-%d some work' % (i % 1000)
+            )
+            continue
+        elif model == 'legacy':
+            timesheet = LegacyTimeSheet()
+            timesheet.username = str(username.encode('utf-8'))
+            timesheet.project = project.encode('utf-8')
+            timesheet.date = datetime.datetime(day.year, day.month, day.day)
+        else:
+            timesheet = TimeSheet()
+            timesheet.username = intern(str(username.encode('utf-8')))
+            timesheet.project = intern(project.encode('utf-8'))
+            timesheet.date = day
+        timesheet.time = float(i % 8 + 1)
+        timesheet.id = i
+        timesheet.description = 'XX-%d some work' % (i % 1000)
+        timesheets.append(timesheet)
+
+    return timesheets
+
+
+def get_rss():
+    """
+    :return:int resident memory in bytes (Linux)
+    """
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def measure(model, nb_timesheets):
+    """
+    :param model:string legacy, current or columnar
+    :param nb_timesheets:int
+    :return:int nb of bytes used by the timesheets
+    """
+    before = get_rss()
+    timesheets = build(model, nb_timesheets)
+    used = get_rss() - before
+    del timesheets
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the memory used by timesheets')
+    parser.add_argument('--timesheets', type=int, default=1000000, help='nb of timesheets (default: 1000000)')
+    parser.add_argument('--model', choices=MODELS, help='measure a single model in this process')
+    args = parser.parse_args()
+
+    if args.model is not None:
+        print measure(args.model, args.timesheets)
+        return
+
+    results = {}
+    for model in MODELS:
+        results[model] = int(subprocess.check_output([
+            sys.executable, '-m', 'lst.tests.models_memory_benchmark',
+            '--timesheets', str(args.timesheets), '--model', model
+        ]))
+
+    print '%d timesheets (%d users, %d projects, %d days)' % (args.timesheets, USERS, PROJECTS, DAYS)
+    print '{:<10} {:>10} {:>12}'.format('model', 'MB', 'bytes/entry')
+    for model in MODELS:
+        print '{:<10} {:>10.1f} {:>12.1f}'.format(
+            model, results[model] / 1024.0 / 1024, float(results[model]) / args.timesheets
+        )
+    for model in MODELS[1:]:
+        print '%s saves %.0f%%' % (model, 100 - 100.0 * results[model] / results['legacy'])
+
+if __name__ == '__main__':
+    main()
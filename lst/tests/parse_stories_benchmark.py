@@ -0,0 +1,162 @@
+"""
+Microbenchmark of the per-item cost of JiraManager._parse_item, compared to the previous implementation
+(one find() per field, XPath predicates for custom fields, ignored stories looked up in a list)
+
+    python -m lst.tests.parse_stories_benchmark --items 5000 --ignored 200
+"""
+import argparse
+import sys
+import time
+import xml.etree.cElementTree as ET
+from StringIO import StringIO
+
+from mock import MagicMock
+
+from lst.models import AppContainer
+from lst.models.jiraModels import Story
+from lst.tests.mock_helper import MockHelper
+
+
+def get_items(nb_items, nb_custom_fields, story_points_field, business_value_field):
+    """
+    Generate xml items looking like the ones returned by Jira
+
+    :param nb_items:int
+    :param nb_custom_fields:int nb of other custom fields per item
+    :param story_points_field:string
+    :param business_value_field:string
+    :return:list of Element
+    """
+    items = []
+    for i in range(nb_items):
+        fields = ''.join([
+            '<customfield id="customfield_%d"><customfieldvalues><customfieldvalue>%d</customfieldvalue>'
+            '</customfieldvalues></customfield>' % (20000 + j, j)
+            for j in range(nb_custom_fields)
+        ])
+        # every 10th story has no story points
+        if i % 10 != 0:
+            fields += (
+                '<customfield id="%s"><customfieldvalues><customfieldvalue>%d</customfieldvalue>'
+                '</customfieldvalues></customfield>' % (story_points_field, i % 13)
+            )
+        fields += (
+            '<customfield id="%s"><customfieldvalues><customfieldvalue>%d</customfieldvalue>'
+            '</customfieldvalues></customfield>' % (business_value_field, i % 100)
+        )
+        items.append(
+            '<item><title>[XX-%(i)d] Story %(i)d</title><key>XX-%(i)d</key><summary>Story %(i)d</summary>'
+            '<status id="%(status)d">Open</status><project id="10636" key="XX">Project</project>'
+            '<fixVersion>Sprint name</fixVersion><customfields>%(fields)s</customfields></item>' % {
+                'i': i,
+                'status': 1 + i % 6,
+                'fields': fields,
+            }
+        )
+
+    channel = ET.fromstring('<rss><channel>%s</channel></rss>' % ''.join(items)).find('channel')
+    return list(channel)
+
+
+def legacy_parse_item(s, nice_identifier, ignored, custom_fields):
+    """
+    JiraManager._parse_item before it was rewritten as a single walk over the item children
+    """
+    story_points_field, business_value_field = custom_fields
+
+    story = Story()
+    story.id = s.find('key').text
+
+    if ignored is not None and story.id in ignored:
+        print 'story {} is ignored'.format(story.id)
+        return None
+
+    if nice_identifier is not None:
+        title = s.find('title') if s.find('title') is not None else s.find('summary')
+        story.is_nice = title.text.find(nice_identifier) != -1
+
+    story.status = int(s.find('status').get('id'))
+
+    try:
+        story.business_value = float(
+            s.find(
+                './customfields/customfield/[@id="' + business_value_field + '"]/customfieldvalues/customfieldvalue'
+            ).text
+        )
+    except AttributeError:
+        print 'Story {} has no business value defined, 0 taken as default'.format(story.id)
+
+    try:
+        story.story_points = float(
+            s.find(
+                './customfields/customfield/[@id="' + story_points_field + '"]/customfieldvalues/customfieldvalue'
+            ).text
+        )
+    except AttributeError:
+        print 'Story {} has no story points defined, 0 taken as default'.format(story.id)
+
+    if s.find('project') is not None and s.find('project').get('id') is not None:
+        story.project_id = s.find('project').get('id')
+        story.project_name = s.find('project').text
+    if s.find('fixVersion') is not None:
+        story.sprint_name = s.find('fixVersion').text
+
+    return story
+
+
+def measure(function, items, repeat):
+    """
+    :param function:callable called with each item
+    :param items:list of Element
+    :param repeat:int
+    :return:float best per-item duration in microseconds
+    """
+    best = None
+    output = sys.stdout
+    for i in range(repeat):
+        # what the legacy parser prints is not part of the measure, but its cost is
+        sys.stdout = StringIO()
+        try:
+            start = time.time()
+            for item in items:
+                function(item)
+            duration = time.time() - start
+        finally:
+            sys.stdout = output
+        best = duration if best is None else min(best, duration)
+
+    return best * 1000000 / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the per-item cost of Jira stories parsing')
+    parser.add_argument('--items', type=int, default=5000, help='nb of items to parse (default: 5000)')
+    parser.add_argument('--custom-fields', type=int, default=10, help='other custom fields per item (default: 10)')
+    parser.add_argument('--ignored', type=int, default=100, help='nb of ignored stories (default: 100)')
+    parser.add_argument('--repeat', type=int, default=5, help='nb of runs, the best one is kept (default: 5)')
+    args = parser.parse_args()
+
+    mock_helper = MockHelper()
+    AppContainer.secret.get_jira = MagicMock(side_effect=lambda key, default=None: default)
+    jira_manager = mock_helper.get_jira_manager()
+    custom_fields = jira_manager.get_custom_fields()
+    items = get_items(args.items, args.custom_fields, *custom_fields)
+    ignored = ['XX-%d' % i for i in range(0, args.items, max(1, args.items / max(1, args.ignored)))][:args.ignored]
+
+    ignored_set = set(ignored)
+    custom_field_attributes = jira_manager._get_custom_field_attributes()
+    legacy = measure(lambda item: legacy_parse_item(item, '(NICE)', ignored, custom_fields), items, args.repeat)
+    current = measure(
+        lambda item: jira_manager._parse_item(item, '(NICE)', ignored_set, custom_field_attributes, {}),
+        items,
+        args.repeat
+    )
+
+    print '%d items, %d other custom fields each, %d ignored stories' % (len(items), args.custom_fields, len(ignored))
+    print '{:<10} {:>12}'.format('parser', 'us/item')
+    print '{:<10} {:>12.2f}'.format('legacy', legacy)
+    print '{:<10} {:>12.2f}'.format('current', current)
+    print 'speedup: %.1fx' % (legacy / current)
+
+if __name__ == '__main__':
+    main()
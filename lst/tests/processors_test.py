@@ -0,0 +1,48 @@
+import unittest
+from mock import MagicMock
+
+from lst.models.jiraModels import Story
+from lst.processors import CloseDateProcessor
+
+
+class CloseDateProcessorTest(unittest.TestCase):
+    """Unit tests for CloseDateProcessor in processors.py"""
+
+    def setUp(self):
+        Story.closed_status_ids = [6]
+
+    def get_story(self, id, status):
+        story = Story()
+        story.id = id
+        story.status = status
+        return story
+
+    def testPostProcessAllKeepsOrder(self):
+        """stories should keep their order and those without close date should be discarded"""
+        close_dates = {'XX-1': '2013-05-24', 'XX-4': '2013-05-22'}
+        jira_manager = MagicMock()
+        jira_manager.get_stories_close_date = MagicMock(return_value=close_dates)
+
+        stories = [
+            self.get_story('XX-1', 6),
+            self.get_story('XX-2', 6),
+            self.get_story('XX-3', 1),
+            self.get_story('XX-4', 6),
+        ]
+        processor = CloseDateProcessor(['closed'], jira_manager, workers=3)
+        result = processor.post_process_all(stories)
+
+        self.assertEquals(['XX-1', 'XX-3', 'XX-4'], [s.id for s in result])
+        self.assertEquals('2013-05-24', result[0].close_date)
+        self.assertIsNone(result[1].close_date, 'open stories should not be looked up')
+        jira_manager.get_stories_close_date.assert_called_once_with(['XX-1', 'XX-2', 'XX-4'], ['closed'], 3)
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(CloseDateProcessorTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
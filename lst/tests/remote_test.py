@@ -0,0 +1,219 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from StringIO import StringIO
+from mock import MagicMock, patch
+
+from lst.remote import Remote, JiraRemote, AsyncJiraRemote, ZebraRemote, AsyncZebraRemote
+from lst.session import Session
+from lst.tests.fake_server import FakeDataSet, FakeServer
+
+
+class JiraRemoteTest(unittest.TestCase):
+    """Unit tests for JiraRemote in remote.py"""
+
+    def get_remote(self, fixture):
+        remote = JiraRemote('http://jira', 'user', 'pass')
+        remote._fetch = MagicMock(return_value=StringIO(open(fixture).read()))
+        return remote
+
+    def testGetStoriesCloseDate(self):
+        """should map each story of a batched activity stream to its close date"""
+        remote = self.get_remote('lst/tests/jira_activity.xml')
+        close_dates = remote.get_stories_close_date(['XX-112', 'XX-113', 'XX-114'], ['Closed', 'For PO Review'])
+
+        self.assertEquals(['XX-112', 'XX-113'], sorted(close_dates.keys()), 'XX-114 was never closed')
+        self.assertEquals(datetime(2013, 5, 24, 9, 15, 46), close_dates['XX-112'].replace(tzinfo=None))
+        self.assertEquals(datetime(2013, 5, 23, 16, 10), close_dates['XX-113'].replace(tzinfo=None))
+        self.assertIn('streams=issue-key+IS+XX-112+XX-113+XX-114', remote._fetch.call_args[0][0])
+
+    def testCloseDateIsYearFirst(self):
+        """close dates with a day <= 12 should not be read day first"""
+        remote = self.get_remote('lst/tests/jira_activity.xml')
+        activity = open('lst/tests/jira_activity.xml').read().replace('2013-05-23T16:10', '2013-05-04T16:10')
+        remote._fetch = MagicMock(return_value=StringIO(activity))
+
+        close_date = remote.get_story_close_date('XX-113', ['For PO Review'])
+        self.assertEquals(datetime(2013, 5, 4, 16, 10), close_date.replace(tzinfo=None))
+
+    def testFullFeed(self):
+        """stories left without close date by a full feed should be queried alone"""
+        remote = self.get_remote('lst/tests/jira_activity.xml')
+        remote.activity_results_per_story = 2
+        single = '<feed xmlns="http://www.w3.org/2005/Atom"><entry><published>2013-05-02T10:00:00.000Z</published>' \
+                 '<category term="Closed"/></entry></feed>'
+        remote._fetch = MagicMock(side_effect=[StringIO(open('lst/tests/jira_activity.xml').read()), StringIO(single)])
+
+        # the feed holds 4 entries (2 per story): the closing entry of XX-113 could have been pushed out of it
+        close_dates = remote.get_stories_close_date(['XX-112', 'XX-113'], ['Closed'])
+        self.assertEquals(datetime(2013, 5, 24, 9, 15, 46), close_dates['XX-112'].replace(tzinfo=None))
+        self.assertEquals(datetime(2013, 5, 2, 10), close_dates['XX-113'].replace(tzinfo=None))
+        self.assertEquals(2, remote._fetch.call_count)
+        self.assertIn('maxResults=2&streams=issue-key+IS+XX-113', remote._fetch.call_args[0][0])
+
+    def testGetActivityChunks(self):
+        """should split story ids in groups that fit in a single request"""
+        ids = ['XX-%d' % i for i in range(45)]
+        chunks = JiraRemote.get_activity_chunks(ids)
+        self.assertEquals([20, 20, 5], [len(chunk) for chunk in chunks])
+        self.assertEquals(ids, [id for chunk in chunks for id in chunk], 'order should be kept')
+
+
+class AsyncJiraRemoteTest(unittest.TestCase):
+    """Unit tests for AsyncJiraRemote in remote.py"""
+
+    def testConcurrencyIsLimited(self):
+        """no more than max_concurrency calls should run at the same time, all scheduled calls should complete"""
+        remote = AsyncJiraRemote('http://jira', 'user', 'pass')
+        remote.set_max_concurrency(3)
+        lock = threading.Lock()
+        counters = {'running': 0, 'max': 0}
+
+        def call(value):
+            with lock:
+                counters['running'] += 1
+                counters['max'] = max(counters['max'], counters['running'])
+            time.sleep(0.01)
+            with lock:
+                counters['running'] -= 1
+            return value * 2
+
+        futures = [remote.schedule(call, i) for i in range(30)]
+
+        self.assertEquals([i * 2 for i in range(30)], [future.get(5) for future in futures])
+        self.assertEquals(3, counters['max'])
+
+    def testGetStoriesCloseDateAsync(self):
+        """should query each chunk of stories, then merge their close dates"""
+        remote = AsyncJiraRemote('http://jira', 'user', 'pass')
+        remote.get_stories_close_date = MagicMock(side_effect=lambda ids, names: dict([(id, names[0]) for id in ids]))
+        ids = ['XX-%d' % i for i in range(45)]
+
+        close_dates = remote.get_stories_close_date_async(ids, ['Closed']).get(5)
+
+        self.assertEquals(3, remote.get_stories_close_date.call_count)
+        self.assertEquals(dict([(id, 'Closed') for id in ids]), close_dates)
+
+    def testErrorIsRaisedOnGet(self):
+        """an error in a scheduled call should be raised when its result is requested"""
+        remote = AsyncJiraRemote('http://jira', 'user', 'pass')
+        remote.set_max_concurrency(1)
+        remote.get_data = MagicMock(side_effect=[Exception('Unable to connect to Jira'), 'data'])
+
+        self.assertRaises(Exception, remote.get_data_async('/some/url').get, 5)
+        self.assertEquals('data', remote.get_data_async('/some/url').get(5), 'the slot should be given back')
+
+
+class ZebraSessionTest(unittest.TestCase):
+    """Unit tests for the zebra session handling of ZebraRemote"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = FakeServer(FakeDataSet(stories=1, timesheets=1))
+        self.url = self.server.start()
+
+    def tearDown(self):
+        ZebraRemote.session_directory = None
+        Remote.connection_pool.close_all()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def get_logins(self):
+        return self.server.stats['requests'].get('/login', 0)
+
+    def get_users_concurrently(self, remotes):
+        results = []
+        threads = [threading.Thread(target=lambda r=remote: results.append(r.get_data('user/.json'))) for remote in remotes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def testLoginOnce(self):
+        """remotes and threads should share a single login"""
+        remote = ZebraRemote(self.url, 'user', 'pass')
+        remotes = [remote] * 5 + [ZebraRemote(self.url, 'user', 'pass'), AsyncZebraRemote(self.url, 'user', 'pass')]
+
+        self.assertEquals(7, len(self.get_users_concurrently(remotes)))
+        self.assertEquals(1, self.get_logins())
+
+    def testReloginOnExpiry(self):
+        """an expired session should be noticed, and a new login done (once for all threads)"""
+        remote = ZebraRemote(self.url, 'user', 'pass')
+        remote.get_data('user/.json')
+        self.server.expire_sessions()
+
+        results = self.get_users_concurrently([remote] * 5)
+        self.assertEquals(5, len([result for result in results if 'users' in result['command']]))
+        self.assertEquals(2, self.get_logins())
+
+    def testPersistedSession(self):
+        """a persisted session should be reused by the next run"""
+        ZebraRemote.session_directory = self.directory
+        ZebraRemote(self.url, 'user', 'pass').get_data('user/.json')
+
+        # next run
+        Session._sessions = {}
+        ZebraRemote(self.url, 'user', 'pass').get_data('user/.json')
+        self.assertEquals(1, self.get_logins())
+
+
+class JiraSessionTest(unittest.TestCase):
+    """Unit tests for the jira session handling of JiraRemote"""
+
+    def start_server(self, jira_sessions=True):
+        self.server = FakeServer(FakeDataSet(stories=5, timesheets=1), jira_sessions=jira_sessions)
+        self.remote = JiraRemote(self.server.start(), 'user', 'pass')
+        self.url = '/sr/jira.issueviews:searchrequest-xml/temp/SearchRequest.xml?jqlQuery=x&tempMax=1000'
+
+    def tearDown(self):
+        Remote.connection_pool.close_all()
+        self.server.stop()
+
+    def get_stories(self):
+        return len(self.remote.get_data(self.url).findall('./channel/item'))
+
+    def testSessionIsReused(self):
+        """a single session should be opened, and credentials never sent"""
+        self.start_server()
+        request = MagicMock(wraps=self.remote._request)
+        self.remote._request = request
+
+        self.assertEquals([5] * 3, [self.get_stories() for i in range(3)])
+        self.assertEquals(1, self.server.stats['requests']['/rest'])
+        self.assertEquals([], [call for call in request.call_args_list if 'os_password' in call[0][0]])
+
+    def testExpiredSession(self):
+        """an expired session should be replaced by a new one"""
+        self.start_server()
+        self.get_stories()
+        self.server.expire_sessions()
+
+        self.assertEquals(5, self.get_stories())
+        self.assertEquals(2, self.server.stats['requests']['/rest'])
+        self.assertFalse(self.remote.session.disabled)
+
+    def testFallbackToCredentials(self):
+        """credentials should be sent with each request if jira doesn't accept sessions"""
+        self.start_server(jira_sessions=False)
+        with patch('sys.stdout', new_callable=StringIO):
+            self.assertEquals([5] * 2, [self.get_stories() for i in range(2)])
+        self.assertTrue(self.remote.session.disabled)
+        self.assertEquals(1, self.server.stats['requests']['/rest'], 'no new session should be tried')
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(JiraRemoteTest))
+    suite.addTest(loader.loadTestsFromTestCase(AsyncJiraRemoteTest))
+    suite.addTest(loader.loadTestsFromTestCase(ZebraSessionTest))
+    suite.addTest(loader.loadTestsFromTestCase(JiraSessionTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -0,0 +1,43 @@
+import unittest
+from StringIO import StringIO
+
+from lst.stream import JsonArrayStream
+
+
+class JsonArrayStreamTest(unittest.TestCase):
+    """Unit tests for stream.py"""
+
+    def testItemsAreStreamed(self):
+        """all items should be decoded, whatever the chunk size"""
+        for chunk_size in [1, 7, 64, 64 * 1024]:
+            entries = list(JsonArrayStream(open('lst/tests/check_hours.json'), 'report', chunk_size))
+            self.assertEquals(['2', '1', '3'], [e['tid'] for e in entries], 'chunk size %d' % chunk_size)
+            self.assertEquals(u'B Project 2', entries[0]['project'])
+
+    def testItemsAreReadLazily(self):
+        """items should be available before the whole document is read"""
+        document = StringIO('{"a": {"report": [{"tid": "1"}, {"tid": "2"}, ' + ' ' * 10000 + '{"tid": ""}]}}')
+        stream = iter(JsonArrayStream(document, 'report', 16))
+        self.assertEquals({'tid': '1'}, next(stream))
+        self.assertLess(document.tell(), 100)
+
+    def testDocumentIsReadUntilTheEnd(self):
+        """the document should be read until its end once all items are iterated over"""
+        document = StringIO('{"report": [{"tid": "1"}], "total": "' + 'x' * 1000 + '"}')
+        self.assertEquals([{'tid': '1'}], list(JsonArrayStream(document, 'report', 16)))
+        self.assertEquals('', document.read())
+
+    def testMissingKeyOrSingleValue(self):
+        self.assertEquals([], list(JsonArrayStream(StringIO('{"command": {"reports": []}}'), 'report')))
+        self.assertEquals([{u'tid': u'1'}], list(JsonArrayStream(StringIO('{"report": {"tid": "1"}}'), 'report')))
+        self.assertEquals([1, 2.5, u'\xe9'], list(JsonArrayStream(StringIO('{"report": [1, 2.5 ,"\xc3\xa9"]}'), 'report', 1)))
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(JsonArrayStreamTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -0,0 +1,99 @@
+"""
+Benchmark of Zebra report parsing: dates decoded by dateutil (as before) or by ZebraHelper.parse_date
+
+    python -m lst.tests.zebra_dates_benchmark --rows 100000 --days 60
+"""
+import argparse
+import datetime
+import json
+import sys
+import time
+from StringIO import StringIO
+
+import dateutil.parser
+from mock import patch
+
+from lst.helpers import ZebraHelper
+from lst.tests.mock_helper import MockHelper
+
+
+def get_report(nb_rows, nb_days):
+    """
+    :param nb_rows:int
+    :param nb_days:int nb of distinct dates
+    :return:string json report, as sent by zebra
+    """
+    first_day = datetime.date(2014, 1, 1).toordinal()
+    entries = [{
+        'tid': str(i + 1),
+        'date': datetime.date.fromordinal(first_day + i % nb_days).strftime('%Y-%m-%d 00:00:00'),
+        'time': '%.2f' % (i % 8 + 1),
+        'username': 'user%d' % (i % 200),
+        'project': 'project %d' % (i % 50),
+        'description': 'XX-%d some work' % (i % 1000),
+    } for i in range(nb_rows)]
+
+    return json.dumps({'command': {'reports': {'report': entries}}})
+
+
+def legacy_parse_date(date_string):
+    """
+    How ZebraManager decoded dates before ZebraHelper.parse_date
+    """
+    return dateutil.parser.parse(date_string, dayfirst=True)
+
+
+def measure(function, repeat):
+    """
+    :param function:callable
+    :param repeat:int
+    :return:float best duration in seconds
+    """
+    best = None
+    output = sys.stdout
+    for i in range(repeat):
+        ZebraHelper._parsed_dates.clear()
+        sys.stdout = StringIO()
+        try:
+            start = time.time()
+            function()
+            duration = time.time() - start
+        finally:
+            sys.stdout = output
+        best = duration if best is None else min(best, duration)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure Zebra report parsing with both date decoders')
+    parser.add_argument('--rows', type=int, default=100000, help='nb of report rows (default: 100000)')
+    parser.add_argument('--days', type=int, default=60, help='nb of distinct dates (default: 60)')
+    parser.add_argument('--repeat', type=int, default=3, help='nb of runs, the best one is kept (default: 3)')
+    args = parser.parse_args()
+
+    report = get_report(args.rows, args.days)
+    dates = [entry['date'] for entry in json.loads(report)['command']['reports']['report']]
+    zebra_manager = MockHelper().get_zebra_manager()
+
+    def parse_report():
+        zebra_manager._parse_timesheet_stream(StringIO(report))
+
+    def parse_report_legacy():
+        with patch.object(ZebraHelper, 'parse_date', staticmethod(legacy_parse_date)):
+            parse_report()
+
+    results = [
+        ('dates (dateutil)', measure(lambda: [legacy_parse_date(d) for d in dates], args.repeat)),
+        ('dates (parse_date)', measure(lambda: [ZebraHelper.parse_date(d) for d in dates], args.repeat)),
+        ('report (dateutil)', measure(parse_report_legacy, args.repeat)),
+        ('report (parse_date)', measure(parse_report, args.repeat)),
+    ]
+
+    print '%d rows, %d distinct dates' % (args.rows, args.days)
+    print '{:<22} {:>10} {:>10}'.format('', 'seconds', 'us/row')
+    for name, duration in results:
+        print '{:<22} {:>10.3f} {:>10.2f}'.format(name, duration, duration * 1000000 / args.rows)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import datetime
+import json
+import pickle
+import re
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from mock import MagicMock
+
+from lst.tests.mock_helper import MockHelper
+
+from lst.models import AppContainer
+from lst.models.zebraModels import TimeSheet, TimeSheetCollection, UserDirectory
+from lst.sync import SyncStore
+
+
+class ZebraManagerSyncTest(unittest.TestCase):
+    """Unit tests for incremental syncs in ZebraManager"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mock_helper = MockHelper()
+        AppContainer.sync_store = SyncStore(self.directory)
+        AppContainer.secret.get_zebra = MagicMock(side_effect=lambda key, default=None: {
+            'incremental': True,
+            'sync_window': 2,
+        }.get(key, default))
+
+        today = datetime.date.today()
+        self.sprint = self.mock_helper.get_sprint()
+        self.sprint.zebra_data = {
+            'client_id': 1,
+            'users': '*',
+            'activities': '*',
+            'start_date': today - datetime.timedelta(days=10),
+            'end_date': today + datetime.timedelta(days=4),
+        }
+
+    def tearDown(self):
+        AppContainer.sync_store = None
+        shutil.rmtree(self.directory)
+
+    def get_entry(self, tid, days_ago, time='1.00'):
+        date = datetime.date.today() - datetime.timedelta(days=days_ago)
+        return {
+            'tid': str(tid),
+            'date': date.strftime('%Y-%m-%d 00:00:00'),
+            'time': time,
+            'username': 'laurent',
+            'project': 'project',
+            'description': 'activity %d' % tid,
+        }
+
+    def testIncrementalSync(self):
+        """only the last days should be fetched again, and entries deduplicated on tid"""
+        zebra_manager = self.mock_helper.get_zebra_manager()
+        zebra_manager._get_report_entries = MagicMock(return_value=[
+            self.get_entry(1, 9), self.get_entry(2, 5), self.get_entry(3, 1),
+        ])
+        self.assertEquals(3, len(zebra_manager.get_timesheets_for_sprint(self.sprint)))
+        self.assertIn('&start=' + str(self.sprint.get_zebra_data('start_date')),
+                      zebra_manager._get_report_entries.call_args[0][0])
+
+        # second run: entry 3 was updated, entry 4 is new
+        zebra_manager._get_report_entries = MagicMock(return_value=[
+            self.get_entry(3, 1, '4.00'), self.get_entry(4, 0),
+        ])
+        timesheets = zebra_manager.get_timesheets_for_sprint(self.sprint)
+        start = datetime.date.today() - datetime.timedelta(days=2)
+        self.assertIn('&start=' + str(start), zebra_manager._get_report_entries.call_args[0][0])
+        self.assertEquals([1, 2, 3, 4], [t.id for t in timesheets])
+        self.assertEquals(4.0, timesheets[2].time)
+
+    def testReportStreamIsClosed(self):
+        """the report response should be closed once parsed"""
+        response = MagicMock(wraps=StringIO(json.dumps({'command': {'reports': {'report': [self.get_entry(1, 3)]}}})))
+        timesheets = self.mock_helper.get_zebra_manager()._parse_timesheet_stream(response)
+
+        self.assertEquals(1, len(timesheets))
+        self.assertTrue(response.close.called)
+
+    def testCompactTimesheets(self):
+        """timesheets should keep their date as an ordinal, share their strings, and still be picklable"""
+        zebra_manager = self.mock_helper.get_zebra_manager()
+        zebra_manager._get_report_entries = MagicMock(return_value=[self.get_entry(1, 3), self.get_entry(2, 3)])
+        timesheets = pickle.loads(pickle.dumps(
+            zebra_manager.get_timesheets_for_sprint(self.sprint), pickle.HIGHEST_PROTOCOL
+        ))
+
+        date = datetime.date.today() - datetime.timedelta(days=3)
+        self.assertEquals(date, timesheets[0].date)
+        self.assertEquals(date.toordinal(), timesheets[0].ordinal)
+        self.assertEquals(date.strftime('%Y-%m-%d'), timesheets[1].readable_date())
+        self.assertIs(timesheets[0].username, timesheets[1].username)
+        self.assertFalse(hasattr(timesheets[0], '__dict__'))
+
+
+class UserDirectoryTest(unittest.TestCase):
+    """Unit tests for the zebra user directory"""
+
+    users = [
+        {'employee_lastname': 'Prodon', 'employee_firstname': 'Laurent', 'id': 1, 'username': 'lprodon'},
+        {'employee_lastname': 'Mao', 'employee_firstname': 'Rolf', 'id': 2},
+        {'employee_lastname': 'Tsetung', 'employee_firstname': 'Mao', 'id': 3},
+        {'employee_lastname': 'Prodi', 'employee_firstname': 'Romano', 'id': 4},
+        {'employee_lastname': u'M\xfcller', 'employee_firstname': 'Hans', 'id': 5},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mock_helper = MockHelper()
+        AppContainer.sync_store = SyncStore(self.directory)
+        AppContainer.secret.get_zebra = MagicMock(side_effect=lambda key, default=None: default)
+
+    def tearDown(self):
+        AppContainer.sync_store = None
+        shutil.rmtree(self.directory)
+
+    def testLookups(self):
+        """users should be found by exact name, id, username, prefix or similar name"""
+        directory = UserDirectory(self.users)
+
+        self.assertEquals([self.users[0]], directory.find_by_lastname(' PRODON'))
+        self.assertEquals([self.users[4]], directory.find_by_lastname('m\xc3\xbcller'), 'command line names are utf-8')
+        self.assertEquals([self.users[4]], directory.find_by_prefix('M\xc3\xbc'))
+        self.assertEquals([self.users[2]], directory.find_by_firstname('mao'))
+        self.assertEquals(self.users[1], directory.get_by_id('2'))
+        self.assertEquals(self.users[0], directory.get_by_username('lprodon'))
+        self.assertEquals(self.users[1], directory.get_by_username('rolf'))
+        self.assertEquals([self.users[3], self.users[0]], directory.find_by_prefix('prod'))
+        self.assertEquals([], directory.find_by_prefix('x'))
+        self.assertEquals(self.users[0], directory.find_similar('prodom')[0])
+        self.assertEquals(self.users[2], directory.find_similar('tsetong')[0])
+
+    def testDirectoryIsStored(self):
+        """the directory should only be downloaded again once expired"""
+        zebra_manager = self.mock_helper.get_zebra_manager()
+        zebra_manager.get_all_users = MagicMock(return_value=self.users)
+
+        self.assertEquals(5, len(zebra_manager.get_user_directory()))
+        self.assertEquals(5, len(zebra_manager.get_user_directory()))
+        self.assertEquals(1, zebra_manager.get_all_users.call_count)
+
+        AppContainer.secret.get_zebra = MagicMock(side_effect=lambda key, default=None: 0 if key == 'users_ttl' else default)
+        zebra_manager.get_user_directory()
+        self.assertEquals(2, zebra_manager.get_all_users.call_count)
+
+
+class TimeSheetCollectionTest(unittest.TestCase):
+    """Unit tests for the columnar timesheet collection"""
+
+    def get_timesheet(self, id, day, username, project, time, description):
+        timesheet = TimeSheet()
+        timesheet.id = id
+        timesheet.date = datetime.date(2014, 3, day)
+        timesheet.username = username
+        timesheet.project = project
+        timesheet.time = time
+        timesheet.description = description
+        return timesheet
+
+    def setUp(self):
+        self.timesheets = TimeSheetCollection([
+            self.get_timesheet(1, 4, 'laurent', 'lst', 2.0, 'XX-12 parser'),
+            self.get_timesheet(2, 3, 'rolf', 'lst', 1.5, 'meeting'),
+            self.get_timesheet(3, 4, 'rolf', 'other', 4.0, 'XX-12 tests'),
+            self.get_timesheet(4, 4, 'laurent', 'lst', 1.0, 'XX-7'),
+        ])
+
+    def testListApi(self):
+        """timesheets should still be available as objects, by index, slice or iteration"""
+        self.assertEquals(4, len(self.timesheets))
+        self.assertEquals([1, 2, 3, 4], [t.id for t in self.timesheets])
+        self.assertEquals('XX-7', self.timesheets[-1].description)
+        self.assertEquals(datetime.date(2014, 3, 3), self.timesheets[1].date)
+        self.assertEquals(['rolf', 'rolf'], [t.username for t in self.timesheets[1:3]])
+        self.assertEquals(['laurent', 'rolf'], self.timesheets.users)
+        self.assertRaises(IndexError, lambda: self.timesheets[4])
+
+    def testGroupings(self):
+        """groupings should give the same results as summing timesheet objects"""
+        days = self.timesheets.group_by_day()
+        self.assertEquals(['2014-03-04', '2014-03-03'], days.keys())
+        self.assertEquals(7.0, days['2014-03-04'].time)
+        self.assertEquals({'laurent': 3.0, 'rolf': 4.0}, days['2014-03-04'].get_entries_per_user())
+        self.assertEquals([1, 3, 4], [t.id for t in days['2014-03-04'].entries])
+
+        projects = self.timesheets.group_by_project()
+        self.assertEquals([1, 2, 4], [t.id for t in projects['lst']])
+        self.assertEquals([3], [t.id for t in projects['other']])
+        self.assertEquals(3, len(projects['lst']))
+        self.assertEquals(4, projects['lst'][-1].id)
+        self.assertEquals([2, 4], [t.id for t in projects['lst'][1:]])
+
+        self.assertEquals(
+            {'12': 6.0, '7': 1.0, 'other': 1.5},
+            self.timesheets.group_by_story_id(re.compile(r'^XX-(\d+)'))
+        )
+
+    def testIndex(self):
+        """the index should expose all groupings, including combined ones"""
+        index = self.timesheets.get_index(re.compile(r'^XX-(\d+)'))
+
+        self.assertEquals(['2014-03-04', '2014-03-03'], index.hours_per_day.keys())
+        self.assertEquals({'laurent': 3.0, 'rolf': 4.0}, index.hours_per_user_per_day['2014-03-04'])
+        self.assertEquals({'lst': 4.5, 'other': 4.0}, index.hours_per_project)
+        self.assertEquals({'12': 6.0, '7': 1.0}, index.hours_per_story_per_day['2014-03-04'])
+        self.assertEquals({'other': 1.5}, index.hours_per_story_per_day['2014-03-03'])
+        self.assertEquals(['lst', 'other'], index.get_projects().keys())
+        self.assertEquals({}, self.timesheets.get_index().hours_per_story)
+
+    def testIndexIsLazy(self):
+        """grouping by project should neither group days nor match stories"""
+        regex = re.compile(r'^XX-(\d+)')
+        index = self.timesheets.get_index(regex)
+
+        self.assertEquals(['lst', 'other'], index.get_projects().keys())
+        self.assertIsNone(index._days)
+        self.assertIsNone(index._stories)
+        self.assertEquals(self.timesheets.group_by_story_id(regex), index.hours_per_story)
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(ZebraManagerSyncTest))
+    suite.addTest(loader.loadTestsFromTestCase(UserDirectoryTest))
+    suite.addTest(loader.loadTestsFromTestCase(TimeSheetCollectionTest))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite())